@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rational 与 fractions.Fraction 的性能对比
+模拟生成题目时的典型运算：构造操作数、两步四则运算、比较和格式化
+"""
+
+import argparse
+import random
+import timeit
+from fractions import Fraction
+
+from rational import Rational
+
+def make_operands(max_range, count, seed=0):
+    """按 generate_number 的分布生成操作数"""
+    rng = random.Random(seed)
+    operands = []
+    for _ in range(count):
+        if rng.random() < 0.5:
+            operands.append((rng.randint(1, max_range - 1), 1))
+        else:
+            denominator = rng.randint(2, max_range - 1)
+            operands.append((rng.randint(1, denominator - 1), denominator))
+    return operands
+
+def workload(cls, operands):
+    """构造、运算、比较并读取分子分母"""
+    total = 0
+    for i in range(0, len(operands) - 2, 3):
+        a = cls(*operands[i])
+        b = cls(*operands[i + 1])
+        c = cls(*operands[i + 2])
+        if a < b:
+            a, b = b, a
+        t = (a - b) * c + a / c
+        total += t.numerator % 7 + t.denominator % 7
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description='Rational 与 Fraction 的性能对比')
+    parser.add_argument('-r', type=int, nargs='+', default=[10, 100, 1000], help='数值范围')
+    parser.add_argument('-n', type=int, default=30000, help='每轮的操作数个数')
+    parser.add_argument('--repeat', type=int, default=5, help='重复次数，取最快一次')
+    args = parser.parse_args()
+
+    print(f"{'范围':>8} {'Fraction(ms)':>14} {'Rational(ms)':>14} {'加速比':>8}")
+    for max_range in args.r:
+        operands = make_operands(max_range, args.n)
+        assert workload(Fraction, operands) == workload(Rational, operands)
+        times = {}
+        for cls in (Fraction, Rational):
+            times[cls] = min(timeit.repeat(lambda: workload(cls, operands),
+                                           number=1, repeat=args.repeat))
+        speedup = times[Fraction] / times[Rational]
+        print(f"{max_range:>8} {times[Fraction] * 1000:>14.1f} "
+              f"{times[Rational] * 1000:>14.1f} {speedup:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
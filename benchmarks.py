@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能基准测试
+在 -n、-r 网格上测量生成题目、表达式求值、解析和格式化分数、批改答案以及完整命令行的
+吞吐量（条/秒）和峰值内存，结果保存为 JSON，并可与基线结果比较，超过阈值视为性能回退
+
+基线与机器相关：benchmark_baseline.json 是在 -n 1000 10000 -r 10 100 网格上记录的参考结果，
+在其他机器上比较前先用同一网格重新记录一份：
+  python benchmarks.py -n 1000 10000 -r 10 100 -o benchmark_baseline.json
+之后检查回退：
+  python benchmarks.py -n 1000 10000 -r 10 100 --baseline benchmark_baseline.json
+不提供 --baseline 时只记录结果，不做比较；基线中没有的 (测试项, n, r) 组合不比较
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from expression import compile_expression
+from myapp_final import (MathExerciseGenerator, check_answers, evaluate_expression,
+                         parse_fraction, write_exercises)
+from rational import Rational
+
+DEFAULT_COUNTS = [1000, 10000, 100000, 1000000]
+DEFAULT_RANGES = [10, 100, 1000, 10000]
+
+# 吞吐量下降、峰值内存上升超过该比例视为回退
+DEFAULT_THRESHOLD = 0.10
+DEFAULT_MEMORY_THRESHOLD = 0.25
+
+# 基线耗时短于该值（秒）的测试项计时噪声太大，不比较吞吐量
+MIN_SECONDS = 0.05
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'myapp_final.py')
+
+
+class Workload:
+    """
+    一组 (n, r) 参数下的输入数据
+    题目和文件只准备一次，各测试项共享
+    """
+
+    def __init__(self, count, max_range, workdir, seed=0):
+        self.count = count
+        self.max_range = max_range
+        self.workdir = workdir
+        self.seed = seed
+        self._exercises = None
+        self._files = None
+
+    @property
+    def exercises(self):
+        """(表达式, 结果) 列表"""
+        if self._exercises is None:
+            generator = MathExerciseGenerator(self.max_range, rng=random.Random(self.seed))
+            self._exercises = generator.generate_exercises(self.count)
+        return self._exercises
+
+    @property
+    def answers(self):
+        generator = MathExerciseGenerator(self.max_range)
+        return [generator.format_number(result) for _, result in self.exercises]
+
+    @property
+    def files(self):
+        """题目文件和答案文件的路径"""
+        if self._files is None:
+            exercise_file = os.path.join(self.workdir, 'Exercises.txt')
+            answer_file = os.path.join(self.workdir, 'Answers.txt')
+            write_exercises(self.exercises, MathExerciseGenerator(self.max_range),
+                            exercise_file, answer_file)
+            self._files = exercise_file, answer_file
+        return self._files
+
+
+# 各测试项：setup(workload) 返回被测函数的参数，run(*args) 返回处理的条数
+
+def _setup_generate(workload):
+    return workload.count, workload.max_range, workload.seed
+
+def _run_generate(count, max_range, seed):
+    generator = MathExerciseGenerator(max_range, rng=random.Random(seed))
+    return len(generator.generate_exercises(count))
+
+def _setup_evaluate(workload):
+    # 清空编译缓存，每轮都从冷缓存开始
+    compile_expression.cache_clear()
+    return ([expr for expr, _ in workload.exercises],)
+
+def _run_evaluate(exprs):
+    for expr in exprs:
+        evaluate_expression(expr)
+    return len(exprs)
+
+def _setup_parse(workload):
+    return (workload.answers,)
+
+def _run_parse(answers):
+    for answer in answers:
+        parse_fraction(answer)
+    return len(answers)
+
+def _setup_format(workload):
+    # 每轮使用新构造的结果，避免复用已约分的对象
+    return ([Rational(result.numerator * 3, result.denominator * 3)
+             for _, result in workload.exercises],)
+
+def _run_format(results):
+    format_number = MathExerciseGenerator(10).format_number
+    for result in results:
+        format_number(result)
+    return len(results)
+
+def _setup_check(workload):
+    compile_expression.cache_clear()
+    return workload.files
+
+def _run_check(exercise_file, answer_file):
+    return check_answers(exercise_file, answer_file).total
+
+def _setup_cli(workload):
+    return workload.count, workload.max_range, workload.seed, workload.workdir
+
+def _run_cli(count, max_range, seed, workdir):
+    """运行命令行，返回 (题目数, 子进程峰值常驻内存字节数)"""
+    process = subprocess.Popen([sys.executable, SCRIPT, '-n', str(count), '-r', str(max_range),
+                                '--seed', str(seed)],
+                               cwd=workdir, stdout=subprocess.DEVNULL)
+    peak = None
+    if hasattr(os, 'wait4'):
+        # 单独统计这个子进程的资源占用，Linux 上 ru_maxrss 的单位为 KB
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        peak = usage.ru_maxrss * 1024
+    else:
+        process.wait()
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, process.args)
+    with open(os.path.join(workdir, 'Exercises.txt'), 'rb') as f:
+        return sum(1 for _ in f), peak
+
+CASES = {
+    'generate_exercises': (_setup_generate, _run_generate),
+    'evaluate_expression': (_setup_evaluate, _run_evaluate),
+    'parse_fraction': (_setup_parse, _run_parse),
+    'format_number': (_setup_format, _run_format),
+    'check_answers': (_setup_check, _run_check),
+    'cli': (_setup_cli, _run_cli),
+}
+
+
+def measure(name, workload, repeat=3):
+    """
+    运行一个测试项
+    先重复 repeat 次取最快一次的耗时，再单独运行一次用 tracemalloc 测量峰值内存
+    （命令行测试项的峰值内存为子进程的最大常驻内存）
+    """
+    setup, run = CASES[name]
+    best = None
+    items = 0
+    peak = None
+    for _ in range(repeat):
+        args = setup(workload)
+        start = time.perf_counter()
+        items = run(*args)
+        seconds = time.perf_counter() - start
+        if name == 'cli':
+            # 命令行在子进程中运行，峰值内存取子进程的常驻内存
+            items, peak = items
+        best = seconds if best is None else min(best, seconds)
+
+    if name != 'cli':
+        args = setup(workload)
+        tracemalloc.start()
+        try:
+            run(*args)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return {
+        'case': name,
+        'n': workload.count,
+        'r': workload.max_range,
+        'items': items,
+        'seconds': best,
+        'per_second': items / best if best else None,
+        'peak_bytes': peak,
+    }
+
+
+def run_benchmarks(counts, ranges, cases=tuple(CASES), repeat=3, seed=0, log=print):
+    """在 counts × ranges 网格上运行各测试项，返回结果字典"""
+    results = []
+    for max_range in ranges:
+        for count in counts:
+            with tempfile.TemporaryDirectory() as workdir:
+                workload = Workload(count, max_range, workdir, seed=seed)
+                for name in cases:
+                    record = measure(name, workload, repeat=repeat)
+                    results.append(record)
+                    if log:
+                        log(_format_record(record))
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'repeat': repeat,
+            'seed': seed,
+        },
+        'results': results,
+    }
+
+
+def _format_record(record):
+    peak = record['peak_bytes']
+    peak_text = f"{peak / 1048576:.1f}" if peak is not None else '-'
+    return (f"{record['case']:<20} {record['n']:>8} {record['r']:>6} "
+            f"{record['seconds']:>9.3f} {record['per_second']:>12.0f} {peak_text:>10}")
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD,
+            memory_threshold=DEFAULT_MEMORY_THRESHOLD, min_seconds=MIN_SECONDS):
+    """
+    与基线比较，返回回退列表
+    每项为 (测试项, n, r, 指标, 基线值, 当前值)，指标为 'per_second' 或 'peak_bytes'
+    """
+    baseline_index = {(r['case'], r['n'], r['r']): r for r in baseline['results']}
+    regressions = []
+    for record in current['results']:
+        base = baseline_index.get((record['case'], record['n'], record['r']))
+        if base is None:
+            continue
+        if base['per_second'] and base['seconds'] >= min_seconds and \
+                record['per_second'] is not None and \
+                record['per_second'] < base['per_second'] * (1 - threshold):
+            regressions.append((record['case'], record['n'], record['r'], 'per_second',
+                                base['per_second'], record['per_second']))
+        if base['peak_bytes'] and record['peak_bytes'] is not None and \
+                record['peak_bytes'] > base['peak_bytes'] * (1 + memory_threshold):
+            regressions.append((record['case'], record['n'], record['r'], 'peak_bytes',
+                                base['peak_bytes'], record['peak_bytes']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='小学四则运算题目生成器的性能基准测试')
+    parser.add_argument('-n', type=int, nargs='+', default=DEFAULT_COUNTS, help='题目数')
+    parser.add_argument('-r', type=int, nargs='+', default=DEFAULT_RANGES, help='数值范围')
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES),
+                        help='要运行的测试项')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数，取最快一次')
+    parser.add_argument('--seed', type=int, default=0, help='随机数种子')
+    parser.add_argument('-o', '--output', default='benchmark.json', help='结果文件（不纳入版本库）')
+    parser.add_argument('--baseline',
+                        help='基线结果文件（如 benchmark_baseline.json），提供后检查性能回退')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='吞吐量允许下降的比例')
+    parser.add_argument('--memory-threshold', type=float, default=DEFAULT_MEMORY_THRESHOLD,
+                        help='峰值内存允许上升的比例')
+    args = parser.parse_args()
+
+    print(f"{'测试项':<17} {'n':>8} {'r':>6} {'耗时(s)':>7} {'吞吐量(条/s)':>8} {'峰值(MB)':>7}")
+    current = run_benchmarks(args.n, args.r, args.cases, repeat=args.repeat, seed=args.seed)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(current, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到 {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold, args.memory_threshold)
+        for case, count, max_range, metric, base, value in regressions:
+            print(f"性能回退：{case} n={count} r={max_range} {metric} {base:.0f} -> {value:.0f}")
+        if regressions:
+            sys.exit(1)
+        print("未发现性能回退")
+    else:
+        print("未提供 --baseline，未检查性能回退")
+
+if __name__ == "__main__":
+    main()
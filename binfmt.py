@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+题目与答案的二进制格式
+文件由定长文件头和定长记录组成，第 i 道题目的记录位于 HEADER.size + i * RECORD.size，
+因此不需要单独的偏移索引即可随机访问；读取时用 mmap 映射文件，按记录直接解包，不解析文本
+
+文件头：魔数 b'QCEX'、版本、记录长度、题目数、数值范围
+记录：形式、两个运算符编码、三个操作数（int32 分子、分母，两个操作数的题目第三个为 0/0）、
+      答案（int64 分子、分母，分母为 0 表示没有答案）
+形式：BINARY   x op1 y
+      FLAT     x op1 y op2 z
+      LEFT     (x op1 y) op2 z
+      RIGHT    x op1 (y op2 z)
+"""
+
+import argparse
+import mmap
+import struct
+from functools import lru_cache
+
+from expression import OPERATOR_ALIASES, parse_literal, tokenize
+from rational import Rational
+
+MAGIC = b'QCEX'
+VERSION = 1
+
+HEADER = struct.Struct('<4sHHQI4x')
+RECORD = struct.Struct('<4B6i2q')
+
+BINARY, FLAT, LEFT, RIGHT = range(4)
+OPERATORS = ['+', '-', '×', '÷']
+OP_CODES = {op: code for code, op in enumerate(OPERATORS)}
+
+# 每次写入、解包的记录数
+WRITE_CHUNK = 4096
+READ_CHUNK = 4096
+
+
+# 含别名（* /）的运算符编码
+ALIAS_CODES = {alias: OP_CODES[op] for alias, op in OPERATOR_ALIASES.items()}
+
+
+@lru_cache(maxsize=65536)
+def _operand(token):
+    """字面量 -> 约分后的 (分子, 分母)，同一范围内的字面量很少，按文本缓存"""
+    value = parse_literal(token)
+    return value.numerator, value.denominator
+
+
+def encode_expression(expr):
+    """
+    表达式 -> (形式, 运算符编码 1, 运算符编码 2, 操作数的分子分母 (n1, d1, n2, d2, n3, d3))
+    只支持两个或三个操作数、至多一对括号的题目，否则抛出 ValueError
+    """
+    tokens = tokenize(expr.strip())
+    try:
+        if len(tokens) == 3:
+            x, op1, y = tokens
+            return (BINARY, ALIAS_CODES[op1], 0,
+                    _operand(x) + _operand(y) + (0, 0))
+        if len(tokens) == 5:
+            shape = FLAT
+            x, op1, y, op2, z = tokens
+        elif len(tokens) == 7 and tokens[0] == '(' and tokens[4] == ')':
+            shape = LEFT
+            _, x, op1, y, _, op2, z = tokens
+        elif len(tokens) == 7 and tokens[2] == '(' and tokens[6] == ')':
+            shape = RIGHT
+            x, op1, _, y, op2, z, _ = tokens
+        else:
+            raise ValueError
+        return (shape, ALIAS_CODES[op1], ALIAS_CODES[op2],
+                _operand(x) + _operand(y) + _operand(z))
+    except (KeyError, ValueError, ZeroDivisionError):
+        raise ValueError(f"无法用二进制格式表示的题目：{expr}") from None
+
+
+def _literal(numerator, denominator):
+    if denominator == 1:
+        return str(numerator)
+    return f"{numerator}/{denominator}"
+
+
+def render_record(record):
+    """由记录渲染表达式文本"""
+    shape, op1, op2, _, n1, d1, n2, d2, n3, d3 = record[:10]
+    x = _literal(n1, d1)
+    y = _literal(n2, d2)
+    op1 = OPERATORS[op1]
+    if shape == BINARY:
+        return f"{x} {op1} {y}"
+    z = _literal(n3, d3)
+    op2 = OPERATORS[op2]
+    if shape == FLAT:
+        return f"{x} {op1} {y} {op2} {z}"
+    if shape == LEFT:
+        return f"({x} {op1} {y}) {op2} {z}"
+    return f"{x} {op1} ({y} {op2} {z})"
+
+
+def format_answer(numerator, denominator):
+    """与 MathExerciseGenerator.format_number 相同的格式（分子分母已约分）"""
+    if denominator == 1:
+        return str(numerator)
+    if numerator >= denominator:
+        whole, remainder = divmod(numerator, denominator)
+        return f"{whole}'{remainder}/{denominator}"
+    return f"{numerator}/{denominator}"
+
+
+def pack_exercise(expr, result):
+    """把一道题目和答案打包为一条记录"""
+    shape, op1, op2, operands = encode_expression(expr)
+    if result is None:
+        answer = (0, 0)
+    else:
+        result = Rational.from_number(result)
+        answer = (result.numerator, result.denominator)
+    try:
+        return RECORD.pack(shape, op1, op2, 0, *operands, *answer)
+    except struct.error:
+        raise ValueError(f"数值超出二进制格式的范围：{expr}") from None
+
+
+def is_binary(path):
+    """文件是否为二进制题目文件"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def write_binary(exercises, path, max_range=0):
+    """把 (表达式, 结果) 迭代器写为二进制题目文件，返回写出的题目数"""
+    count = 0
+    with open(path, 'wb') as f:
+        # 先写占位的文件头，写完记录后回填题目数
+        f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, 0, max_range))
+        chunk = []
+        for expr, result in exercises:
+            chunk.append(pack_exercise(expr, result))
+            if len(chunk) >= WRITE_CHUNK:
+                f.write(b''.join(chunk))
+                count += len(chunk)
+                chunk.clear()
+        f.write(b''.join(chunk))
+        count += len(chunk)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, count, max_range))
+    return count
+
+
+class BinaryExercises:
+    """
+    用 mmap 读取二进制题目文件
+    records() 直接在映射的内存上解包记录，不复制文件内容
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空文件无法映射
+            self._file.close()
+            raise ValueError(f"{path} 不是二进制题目文件") from None
+        try:
+            magic, version, record_size, count, max_range = HEADER.unpack_from(self._mmap, 0)
+        except struct.error:
+            magic = None
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            self.close()
+            raise ValueError(f"{path} 不是二进制题目文件或版本不受支持")
+        if HEADER.size + count * RECORD.size > len(self._mmap):
+            self.close()
+            raise ValueError(f"{path} 已损坏：记录数与文件长度不符")
+        self.count = count
+        self.max_range = max_range
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    def record(self, index):
+        """第 index 道题目（从 0 开始）的记录"""
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return RECORD.unpack_from(self._mmap, HEADER.size + index * RECORD.size)
+
+    def records(self, start=0, stop=None):
+        """逐条产出 [start, stop) 范围内的记录"""
+        stop = self.count if stop is None else min(stop, self.count)
+        # 按块解包，产出记录时不持有对映射内存的引用，迭代到一半也可以关闭文件
+        for chunk_start in range(start, stop, READ_CHUNK):
+            chunk_stop = min(chunk_start + READ_CHUNK, stop)
+            with memoryview(self._mmap) as view:
+                body = view[HEADER.size + chunk_start * RECORD.size:
+                            HEADER.size + chunk_stop * RECORD.size]
+                chunk = list(RECORD.iter_unpack(body))
+                body.release()
+            yield from chunk
+
+    def expression(self, index):
+        return render_record(self.record(index))
+
+    def answer(self, index):
+        """第 index 道题目的答案（Rational），没有答案时返回 None"""
+        numerator, denominator = self.record(index)[10:]
+        return Rational._raw(numerator, denominator) if denominator else None
+
+    def iter_exercises(self):
+        """逐个产出 (表达式, 结果)"""
+        for record in self.records():
+            numerator, denominator = record[10:]
+            yield render_record(record), (Rational._raw(numerator, denominator) if denominator else None)
+
+
+def text_to_binary(exercise_file, answer_file, output, max_range=0):
+    """
+    文本格式 -> 二进制格式，返回题目数
+    答案文件为 None 或某行无法解析时重新计算答案
+    """
+    from itertools import chain, repeat
+
+    from expression import evaluate
+    from myapp_final import extract_answer, extract_expression, parse_fraction
+
+    def exercises():
+        with open(exercise_file, 'r', encoding='utf-8') as ef:
+            af = open(answer_file, 'r', encoding='utf-8') if answer_file else None
+            try:
+                answer_lines = chain(af, repeat(None)) if af else repeat(None)
+                for exercise_line, answer_line in zip(ef, answer_lines):
+                    if not exercise_line.strip():
+                        continue
+                    expr = extract_expression(exercise_line)
+                    try:
+                        result = parse_fraction(extract_answer(answer_line))
+                    except (TypeError, ValueError, ZeroDivisionError, IndexError, AttributeError):
+                        try:
+                            result = evaluate(expr)
+                        except ZeroDivisionError:
+                            result = None
+                    yield expr, result
+            finally:
+                if af:
+                    af.close()
+
+    return write_binary(exercises(), output, max_range)
+
+
+def binary_to_text(path, exercise_file='Exercises.txt', answer_file='Answers.txt'):
+    """二进制格式 -> 文本格式（与命令行生成的格式相同），返回题目数"""
+    count = 0
+    buffer_size = 1 << 20
+    with BinaryExercises(path) as exercises, \
+         open(exercise_file, 'w', encoding='utf-8', buffering=buffer_size) as ef, \
+         open(answer_file, 'w', encoding='utf-8', buffering=buffer_size) as af:
+        for count, record in enumerate(exercises.records(), 1):
+            ef.write(f"{count}. {render_record(record)} =\n")
+            numerator, denominator = record[10:]
+            af.write(f"{count}. {format_answer(numerator, denominator) if denominator else ''}\n")
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='题目文件的文本格式与二进制格式互相转换')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    to_binary = subparsers.add_parser('to-binary', help='文本格式 -> 二进制格式')
+    to_binary.add_argument('-e', required=True, help='题目文件')
+    to_binary.add_argument('-a', help='答案文件，不提供时重新计算答案')
+    to_binary.add_argument('-o', default='Exercises.bin', help='输出的二进制文件')
+    to_binary.add_argument('-r', type=int, default=0, help='记录在文件头中的数值范围')
+
+    to_text = subparsers.add_parser('to-text', help='二进制格式 -> 文本格式')
+    to_text.add_argument('input', help='二进制文件')
+    to_text.add_argument('-e', default='Exercises.txt', help='输出的题目文件')
+    to_text.add_argument('-a', default='Answers.txt', help='输出的答案文件')
+
+    args = parser.parse_args()
+    if args.command == 'to-binary':
+        count = text_to_binary(args.e, args.a, args.o, args.r)
+        print(f"已将 {count} 道题目转换为 {args.o}")
+    else:
+        count = binary_to_text(args.input, args.e, args.a)
+        print(f"已将 {count} 道题目转换为 {args.e} 和 {args.a}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量生成练习卷
+清单（JSON 或 JSON Lines）中每一项描述一份练习卷：名称、题目数、数值范围、种子和约束条件，
+全部练习卷在同一个进程中生成，同一范围共享字面量表和结果索引；
+group 相同（且范围相同）的练习卷共享查重指纹，彼此之间也不会出现重复的题目
+结果写到输出目录（由线程池并行写出）或一个 zip 文件，每份练习卷为 <名称>/Exercises.txt 和 Answers.txt
+
+清单格式：
+  [{"name": "class1_alice", "n": 20, "r": 10, "seed": 1}, ...]
+或
+  {"defaults": {"n": 20, "r": 10}, "worksheets": [{"name": "class1_alice"}, ...]}
+或每行一个 JSON 对象。可选字段：group、integer_answers、max_answer、max_denominator、operators
+"""
+
+import json
+import os
+import random
+import re
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from binfmt import format_answer
+from dedup import DedupIndex
+from myapp_final import MathExerciseGenerator, parse_fraction
+from rational import Rational
+
+# 字段别名
+ALIASES = {'count': 'n', 'range': 'r'}
+
+FIELDS = {'name', 'n', 'r', 'seed', 'group', 'integer_answers', 'max_answer', 'max_denominator',
+          'operators'}
+
+_UNSAFE = re.compile(r'[^\w.\-]+')
+
+
+class Worksheet:
+    """
+    一份练习卷的规格
+    generate() 之后 exercises 为 (表达式, 结果) 列表、count 为实际题目数；写出后释放 exercises
+    """
+
+    def __init__(self, name, n, r, seed=None, group=None, integer_answers=False, max_answer=None,
+                 max_denominator=None, operators=None):
+        if not isinstance(n, int) or n < 0:
+            raise ValueError(f"练习卷 {name} 的题目数无效：{n}")
+        if not isinstance(r, int) or r < 1:
+            raise ValueError(f"练习卷 {name} 的数值范围无效：{r}")
+        self.name = name
+        self.n = n
+        self.r = r
+        self.seed = seed
+        self.group = group
+        self.constraints = None
+        if integer_answers or max_answer is not None or max_denominator is not None or operators:
+            from constraints import Constraints
+            if isinstance(max_answer, str):
+                max_answer = parse_fraction(max_answer)
+            self.constraints = Constraints(integer_answers, max_answer, max_denominator, operators)
+        self.exercises = None
+        self.count = 0
+
+    def generate(self, index, default_seed=None):
+        """用给定的查重指纹集合生成题目，返回实际生成的题目数"""
+        seed = self.seed if self.seed is not None else f"{default_seed}:{self.name}"
+        rng = random.Random(seed)
+        if self.constraints is not None:
+            from constraints import ConstrainedGenerator
+            generator = ConstrainedGenerator(self.r, self.constraints, rng=rng, index=index)
+        else:
+            generator = MathExerciseGenerator(self.r, rng=rng, index=index)
+        self.exercises = list(generator.iter_exercises(self.n))
+        self.count = len(self.exercises)
+        return self.count
+
+    def render(self):
+        """渲染题目文件和答案文件的内容"""
+        exercise_lines = []
+        answer_lines = []
+        for i, (expr, result) in enumerate(self.exercises, 1):
+            result = Rational.from_number(result)
+            exercise_lines.append(f"{i}. {expr} =\n")
+            answer_lines.append(f"{i}. {format_answer(result.numerator, result.denominator)}\n")
+        return ''.join(exercise_lines), ''.join(answer_lines)
+
+
+def load_manifest(path):
+    """读取清单，返回 Worksheet 列表；名称缺省为 worksheet_<序号>，重名或字段无效时抛出 ValueError"""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        # JSON Lines
+        data = [json.loads(line) for line in text.splitlines() if line.strip()]
+    defaults = {}
+    if isinstance(data, dict):
+        defaults = data.get('defaults', {})
+        data = data.get('worksheets', [])
+
+    worksheets = []
+    names = set()
+    for i, item in enumerate(data, 1):
+        spec = {ALIASES.get(key, key): value for key, value in {**defaults, **item}.items()}
+        unknown = set(spec) - FIELDS
+        if unknown:
+            raise ValueError(f"清单第 {i} 项含有未知字段：{', '.join(sorted(unknown))}")
+        name = _UNSAFE.sub('_', str(spec.pop('name', f"worksheet_{i:04d}"))).strip('.') or f"worksheet_{i:04d}"
+        if name in names:
+            raise ValueError(f"清单中的练习卷名称重复：{name}")
+        names.add(name)
+        if 'n' not in spec or 'r' not in spec:
+            raise ValueError(f"练习卷 {name} 缺少题目数 n 或数值范围 r")
+        worksheets.append(Worksheet(name, **spec))
+    return worksheets
+
+
+def generate_worksheets(worksheets, seed=None, unique=False):
+    """
+    依次生成全部练习卷（生成器），产出生成完毕的 Worksheet
+    group 相同且范围相同的练习卷共享查重指纹；unique 为 True 时没有 group 的练习卷按范围共享；
+    没有指定种子的练习卷使用由 seed 和名称确定的种子，seed 为 None 时随机选取
+    """
+    if seed is None:
+        seed = random.randrange(2 ** 63)
+    indexes = {}
+    for worksheet in worksheets:
+        group = worksheet.group if worksheet.group is not None else ('*' if unique else None)
+        if group is None:
+            index = DedupIndex()
+        else:
+            index = indexes.setdefault((group, worksheet.r), DedupIndex())
+        worksheet.generate(index, seed)
+        yield worksheet
+
+
+def _write_files(directory, exercise_text, answer_text):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'Exercises.txt'), 'w', encoding='utf-8') as f:
+        f.write(exercise_text)
+    with open(os.path.join(directory, 'Answers.txt'), 'w', encoding='utf-8') as f:
+        f.write(answer_text)
+
+
+def write_worksheets(worksheets, output, workers=4):
+    """
+    写出练习卷：output 以 .zip 结尾时写入一个 zip 文件，否则写到该目录
+    写目录时由线程池并行渲染和写出，写完的练习卷随即释放题目列表；返回 Worksheet 列表
+    """
+    written = []
+    if output.endswith('.zip'):
+        with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for worksheet in worksheets:
+                exercise_text, answer_text = worksheet.render()
+                archive.writestr(f"{worksheet.name}/Exercises.txt", exercise_text)
+                archive.writestr(f"{worksheet.name}/Answers.txt", answer_text)
+                worksheet.exercises = None
+                written.append(worksheet)
+        return written
+
+    def write(worksheet):
+        _write_files(os.path.join(output, worksheet.name), *worksheet.render())
+        worksheet.exercises = None
+        return worksheet
+
+    os.makedirs(output, exist_ok=True)
+    with ThreadPoolExecutor(max(1, workers)) as pool:
+        pending = []
+        for worksheet in worksheets:
+            pending.append(pool.submit(write, worksheet))
+            # 限制已生成未写出的练习卷数量
+            if len(pending) >= 4 * max(1, workers):
+                written.append(pending.pop(0).result())
+        written.extend(future.result() for future in pending)
+    return written
+
+
+def run_manifest(manifest, output, seed=None, unique=False, workers=4):
+    """读取清单、生成并写出全部练习卷，返回 [(名称, 实际题目数, 要求的题目数)]"""
+    worksheets = load_manifest(manifest)
+    written = write_worksheets(generate_worksheets(worksheets, seed, unique), output, workers)
+    return [(worksheet.name, worksheet.count, worksheet.n) for worksheet in written]
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按班级批改：同一份题目文件，多份学生答案文件
+标准答案只计算一次（或直接读取 Answers.txt、二进制题目文件中的答案），
+再由进程池并发批改各份答案，每个学生写出一份成绩文件，
+最后汇总每个学生的得分和每道题目的错误率
+"""
+
+import csv
+import glob
+import os
+from array import array
+
+from binfmt import BinaryExercises, format_answer, is_binary
+from myapp_final import (MathExerciseGenerator, GradeResult, evaluate_expression, extract_answer,
+                         extract_expression, normalize_key_line, save_grade)
+from stats import timer
+
+# 子进程中的标准答案，由进程池的 initializer 设置，不随每个任务传递
+_key = None
+
+
+def answer_key(exercise_file, key_file=None):
+    """
+    计算标准答案，返回 (题目列表, 规范化的答案列表)，无法计算的题目答案为 None
+    提供 key_file 时直接读取，无法解析的行再重新计算
+    """
+    if is_binary(exercise_file):
+        exercises = []
+        answers = []
+        with BinaryExercises(exercise_file) as binary:
+            for expr, result in binary.iter_exercises():
+                exercises.append(expr)
+                answers.append(format_answer(result.numerator, result.denominator)
+                               if result is not None else None)
+        return exercises, answers
+
+    generator = MathExerciseGenerator(10)
+    exercises = []
+    answers = []
+    key = open(key_file, 'r', encoding='utf-8') if key_file else None
+    try:
+        with open(exercise_file, 'r', encoding='utf-8') as ef:
+            for line in ef:
+                expr = extract_expression(line)
+                expected = None
+                if key is not None:
+                    key_line = key.readline()
+                    expected = normalize_key_line(key_line, generator) if key_line else None
+                if expected is None:
+                    try:
+                        expected = generator.format_number(evaluate_expression(expr))
+                    except Exception:
+                        pass
+                exercises.append(expr)
+                answers.append(expected)
+    finally:
+        if key is not None:
+            key.close()
+    return exercises, answers
+
+
+def find_answer_files(source, exclude=()):
+    """source 为目录（取其中全部 .txt 文件）或通配符，返回排序后的答案文件列表"""
+    if os.path.isdir(source):
+        paths = glob.glob(os.path.join(source, '*.txt'))
+    else:
+        paths = glob.glob(source)
+    excluded = {os.path.abspath(path) for path in exclude if path}
+    return sorted(path for path in paths
+                  if os.path.isfile(path) and os.path.abspath(path) not in excluded)
+
+
+def student_names(paths):
+    """由文件名得到学生名，文件名相同时加上序号"""
+    names = []
+    seen = {}
+    for path in paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        seen[name] = seen.get(name, 0) + 1
+        names.append(name if seen[name] == 1 else f"{name}_{seen[name]}")
+    return names
+
+
+def _init_worker(key):
+    global _key
+    _key = key
+
+
+def grade_submission(key, answer_file):
+    """
+    按标准答案批改一份答案文件，返回 (GradeResult, 答错的题目下标)
+    答案文件比题目少的部分按答错计
+    """
+    result = GradeResult()
+    wrong = array('l')
+    with open(answer_file, 'r', encoding='utf-8') as af:
+        lines = iter(af)
+        for i, expected in enumerate(key):
+            line = next(lines, None)
+            is_correct = expected is not None and line is not None and extract_answer(line) == expected
+            result.add(is_correct)
+            if not is_correct:
+                wrong.append(i)
+    return result, wrong
+
+
+def _grade_task(task):
+    """子进程任务：批改一份答案并写出成绩文件"""
+    answer_file, grade_file = task
+    try:
+        result, wrong = grade_submission(_key, answer_file)
+    except (OSError, UnicodeDecodeError) as e:
+        return None, str(e)
+    save_grade(result, grade_file)
+    return (result.total, result.correct_count, wrong), None
+
+
+class ClassReport:
+    """全班的批改汇总：每个学生的得分和每道题目的答错人数"""
+
+    def __init__(self, exercises):
+        self.exercises = exercises
+        self.wrong_counts = array('l', [0]) * len(exercises)
+        self.students = []
+        self.failures = []
+
+    def add(self, name, total, correct, wrong):
+        self.students.append((name, total, correct))
+        counts = self.wrong_counts
+        for i in wrong:
+            counts[i] += 1
+
+    def error_rates(self):
+        """逐题产出 (题号, 题目, 答错人数, 错误率)"""
+        graded = len(self.students)
+        for i, (expr, count) in enumerate(zip(self.exercises, self.wrong_counts), 1):
+            yield i, expr, count, count / graded if graded else 0.0
+
+    def write(self, output_dir):
+        """写出 Summary.csv（每个学生）和 ErrorRates.csv（每道题目）"""
+        with open(os.path.join(output_dir, 'Summary.csv'), 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['学生', '正确', '错误', '正确率'])
+            for name, total, correct in self.students:
+                writer.writerow([name, correct, total - correct,
+                                 f"{correct / total:.4f}" if total else '0.0000'])
+        with open(os.path.join(output_dir, 'ErrorRates.csv'), 'w', encoding='utf-8', newline='',
+                  buffering=1 << 20) as f:
+            writer = csv.writer(f)
+            writer.writerow(['题号', '题目', '答错人数', '错误率'])
+            writer.writerows((i, expr, count, f"{rate:.4f}")
+                             for i, expr, count, rate in self.error_rates())
+
+
+def _collect(report, names, answer_files, outcomes):
+    """按顺序把各份答案的批改结果汇总到 report"""
+    for name, path, (outcome, error) in zip(names, answer_files, outcomes):
+        if outcome is None:
+            report.failures.append((path, error))
+        else:
+            report.add(name, *outcome)
+
+
+def grade_class(exercise_file, answer_files, output_dir='Grades', key_file=None, workers=1,
+                stats=None):
+    """
+    批改全班的答案文件，返回 ClassReport
+    每份答案的成绩写到 output_dir/Grade_<学生>.txt，汇总写到 Summary.csv 和 ErrorRates.csv
+    """
+    with timer(stats, 'evaluate'):
+        exercises, key = answer_key(exercise_file, key_file)
+    os.makedirs(output_dir, exist_ok=True)
+    names = student_names(answer_files)
+    tasks = [(path, os.path.join(output_dir, f"Grade_{name}.txt"))
+             for path, name in zip(answer_files, names)]
+
+    report = ClassReport(exercises)
+    with timer(stats, 'grade'):
+        if workers > 1 and len(tasks) > 1:
+            from multiprocessing import Pool
+            with Pool(workers, initializer=_init_worker, initargs=(key,)) as pool:
+                _collect(report, names, answer_files, pool.imap(_grade_task, tasks))
+        else:
+            _init_worker(key)
+            _collect(report, names, answer_files, map(_grade_task, tasks))
+    with timer(stats, 'write'):
+        report.write(output_dir)
+    if stats is not None:
+        stats.merge({'students': len(report.students), 'graded': len(report.students) * len(key),
+                     'correct': sum(correct for _, _, correct in report.students)})
+    return report
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按约束条件直接构造题目
+约束：答案为整数、答案上限、答案分母上限、可用的运算符
+预先为每种运算建立"结果 -> 操作数对"的索引（操作数为该范围内按数值去重的字面量），
+两个操作数的题目直接从结果满足约束的操作数对中抽取；
+三个操作数的题目先选外层运算和操作数 z，再确定括号内结果 t 的取值：
+  答案分母受限时抽取满足约束的答案 R，由 R 和 z 反推 t；
+  否则由答案上限得到 t 的取值区间，在按结果排序的索引中二分
+最后从索引中取出结果为 t 的操作数对，不需要先随机生成再逐个筛选
+构造出的题目满足约束且互不重复，但各道题目被抽中的概率不完全相同
+
+结果索引的大小是字面量个数的平方，只在字面量不超过 MAX_TERNARY_LITERALS 个（-r 35 以内）时建立；
+范围更大时不建索引，改为逐个求解：随机取第一个操作数 x，再由结果 t（或 t 的取值区间）
+解出第二个操作数 y，y 恰好是字面量（或在按数值排序的字面量中二分出 y 的区间）时成功
+字面量表无法预先建立（-r 超过约 725）或候选答案过多时，才由 MathExerciseGenerator
+随机生成后逐个筛选，约束较严时可能达不到要求的题目数，filter 不为 None 时调用方应提示
+"""
+
+import random
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from math import gcd
+
+from dedup import DedupIndex, canonical_key
+from expression import OPERATOR_ALIASES
+from myapp_final import MathExerciseGenerator, render_structure
+from problem_space import MAX_TERNARY_LITERALS, ProblemSpace, _apply, _bracket
+from rational import Rational
+
+OPERATORS = ['+', '-', '×', '÷']
+
+# 外层运算与括号内结果 t 的位置：+ 和 × 的右侧位置与左侧等价
+OUTER_SHAPES = [('+', 'left'), ('-', 'left'), ('-', 'right'),
+                ('×', 'left'), ('÷', 'left'), ('÷', 'right')]
+
+# 两个操作数的题目所占比例，与 generate_exercise 相同
+BINARY_SHARE = 1 / 3
+
+# 答案分母受限时最多枚举的候选答案数
+MAX_TARGETS = 1 << 20
+
+# 不建结果索引时（逐个求解或随机生成后筛选），平均每道题目最多尝试的次数
+RETRY_ATTEMPTS = 200
+
+
+class Constraints:
+    """
+    题目约束
+    integer_answer：答案为整数；max_answer：答案不超过该值；
+    max_denominator：答案（约分后）的分母不超过该值；operators：可用的运算符
+    """
+
+    def __init__(self, integer_answer=False, max_answer=None, max_denominator=None, operators=None):
+        self.integer_answer = integer_answer
+        self.max_answer = Rational.from_number(max_answer) if max_answer is not None else None
+        self.max_denominator = max_denominator
+        if operators is None:
+            self.operators = list(OPERATORS)
+        else:
+            try:
+                normalized = {OPERATOR_ALIASES[op] for op in operators if op not in ', '}
+            except KeyError as e:
+                raise ValueError(f"不支持的运算符：{e.args[0]}") from None
+            # 保持 + - × ÷ 的顺序，使相同种子的结果可复现
+            self.operators = [op for op in OPERATORS if op in normalized]
+        if not self.operators:
+            raise ValueError("至少需要一种运算符")
+        if self.max_answer is not None and self.max_answer < 0:
+            raise ValueError("答案上限不能为负数")
+        if max_denominator is not None and max_denominator < 1:
+            raise ValueError("答案分母上限必须为正整数")
+
+    @property
+    def limits_denominator(self):
+        return self.integer_answer or self.max_denominator is not None
+
+    def accepts(self, value):
+        """答案是否满足约束（答案已保证不为负数）"""
+        if self.max_answer is not None and value > self.max_answer:
+            return False
+        denominator = value.denominator
+        if self.integer_answer and denominator != 1:
+            return False
+        return self.max_denominator is None or denominator <= self.max_denominator
+
+    def targets(self, ceiling):
+        """按数值排序的全部候选答案（分母受限时才是有限集合），不超过 max_answer 和 ceiling"""
+        upper = ceiling if self.max_answer is None else min(ceiling, self.max_answer)
+        top = upper.numerator // upper.denominator
+        if self.integer_answer:
+            return [Rational._raw(n, 1) for n in range(top + 1)]
+        values = [Rational._raw(0, 1)]
+        for denominator in range(1, self.max_denominator + 1):
+            if len(values) > MAX_TARGETS:
+                raise ValueError("满足约束的答案过多，请指定更小的答案上限或分母上限")
+            for numerator in range(1, (top + 1) * denominator):
+                if gcd(numerator, denominator) == 1:
+                    value = Rational._raw(numerator, denominator)
+                    if value <= upper:
+                        values.append(value)
+        values.sort()
+        return values
+
+
+class ResultIndex:
+    """
+    一种运算的全部操作数对按结果分组
+    keys 为按数值排序的不同结果，pairs[t] 为结果为 t 的操作数对（i * L + j，L 为字面量个数），
+    cumulative[k] 为 keys[:k] 对应的操作数对总数
+    """
+
+    def __init__(self, op, values):
+        size = len(values)
+        pairs = {}
+        for i, x in enumerate(values):
+            # + 和 × 只取 i <= j，减法只取 i >= j（结果不为负数），字面量均为正数，除法取全部
+            if op in ('+', '×'):
+                columns = range(i, size)
+            elif op == '-':
+                columns = range(i + 1)
+            else:
+                columns = range(size)
+            for j in columns:
+                pairs.setdefault(_apply(op, x, values[j]), []).append(i * size + j)
+        self.op = op
+        self.pairs = pairs
+        self.keys = sorted(pairs)
+        cumulative = [0]
+        for key in self.keys:
+            cumulative.append(cumulative[-1] + len(pairs[key]))
+        self.cumulative = cumulative
+
+    def span(self, lo=None, hi=None, positive=False):
+        """结果在 [lo, hi] 内（positive 时还须大于 0）的 keys 下标区间 [start, stop)"""
+        keys = self.keys
+        start = 0 if lo is None else bisect_left(keys, lo)
+        if positive and start < len(keys) and keys[start] == 0:
+            start += 1
+        stop = len(keys) if hi is None else bisect_right(keys, hi)
+        return start, stop
+
+    def draw(self, start, stop, rng):
+        """在 keys[start:stop] 对应的操作数对中均匀抽取一个，返回打包的操作数对"""
+        cumulative = self.cumulative
+        rank = cumulative[start] + int(rng.random() * (cumulative[stop] - cumulative[start]))
+        k = bisect_right(cumulative, rank) - 1
+        return self.pairs[self.keys[k]][rank - cumulative[k]]
+
+
+class LiteralIndex:
+    """
+    某个范围内按数值去重、排序的字面量，以及各种运算的结果索引（首次使用时构建）
+    indexed 为 False 时字面量太多，不建结果索引；position 为 数值 -> 下标
+    """
+
+    def __init__(self, max_range):
+        space = ProblemSpace(max_range, shapes=('binary',))
+        self.max_range = max_range
+        self.texts = space.texts
+        self.values = space.values
+        self.position = {value: i for i, value in enumerate(self.values)}
+        self.indexed = len(self.values) <= MAX_TERNARY_LITERALS
+        self._results = {}
+
+    def results(self, op):
+        if op not in self._results:
+            self._results[op] = ResultIndex(op, self.values)
+        return self._results[op]
+
+
+@lru_cache(maxsize=8)
+def get_index(max_range):
+    """取得（必要时构建）指定范围的结果索引，同一范围只构建一次"""
+    return LiteralIndex(max_range)
+
+
+class ConstrainedGenerator:
+    """
+    按约束条件构造题目
+    接口与 MathExerciseGenerator 的 generate_exercise、iter_exercises 相同；
+    可传入 index（如 PersistentDedupIndex）用于查重；
+    字面量太多时不建结果索引，逐个求解操作数；字面量表无法建立或候选答案过多时
+    filter 为随机生成题目的 MathExerciseGenerator，逐个筛选满足约束的题目
+    """
+
+    def __init__(self, max_range, constraints, rng=None, index=None):
+        self.max_range = max_range
+        self.constraints = constraints
+        self.rng = rng if rng is not None else random
+        self.generated = index if index is not None else DedupIndex()
+        self.filter = None
+        self.binary = None
+        try:
+            self.index = get_index(max_range)
+            # 三个操作数的题目：答案分母受限时的候选答案，最大不超过两个操作数的最大结果
+            self.targets = None
+            if constraints.limits_denominator:
+                ceilings = self._ceilings()
+                self.targets = constraints.targets(max(ceilings[op] for op in constraints.operators))
+        except ValueError:
+            self.filter = MathExerciseGenerator(max_range, rng=self.rng)
+            return
+        self.outer_shapes = [(op, position) for op, position in OUTER_SHAPES
+                             if op in constraints.operators]
+
+        if not self.index.indexed:
+            # 逐个求解：两个操作数的题目按运算符分别只取不超过该运算最大结果的候选答案；
+            # 约束较宽时随机的答案往往解不出操作数，求解失败时再随机生成一道题目筛选
+            self.sampler = MathExerciseGenerator(max_range, rng=self.rng)
+            if self.targets is not None:
+                self.target_counts = {op: bisect_right(self.targets, ceilings[op])
+                                      for op in constraints.operators}
+            return
+
+        # 两个操作数的题目：结果满足约束的全部 (运算符, 操作数对)
+        self.binary = []
+        for op in constraints.operators:
+            results = self.index.results(op)
+            for key in results.keys:
+                if constraints.accepts(key):
+                    self.binary.extend((op, pair) for pair in results.pairs[key])
+        if not self.binary and self.targets == []:
+            raise ValueError("数值范围内没有满足约束的题目")
+
+    def _ceilings(self):
+        """各种运算两个操作数的最大结果（字面量均为正数），不需要建立结果索引"""
+        values = self.index.values
+        smallest, largest = values[0], values[-1]
+        return {'+': largest + largest, '-': largest - smallest,
+                '×': largest * largest, '÷': largest / smallest}
+
+    def _render(self, op, pair):
+        size = len(self.index.values)
+        i, j = divmod(pair, size)
+        texts = self.index.texts
+        return f"{texts[i]} {op} {texts[j]}"
+
+    def _binary_exercise(self):
+        op, pair = self.binary[int(self.rng.random() * len(self.binary))]
+        size = len(self.index.values)
+        i, j = divmod(pair, size)
+        values = self.index.values
+        return self._render(op, pair), _apply(op, values[i], values[j])
+
+    def _inner_bounds(self, outer_op, position, z):
+        """
+        答案分母不受限时，由答案上限得到括号内结果 t 的取值区间 (下限, 上限, t 是否须大于 0)，
+        None 为不限；区间为空时返回 None
+        """
+        limit = self.constraints.max_answer
+        if position == 'right':
+            if outer_op == '-':
+                # z - t >= 0，且 z - t <= limit
+                return None if limit is None else z - limit, z, False
+            # z ÷ t <= limit，t 不为 0
+            if limit == 0:
+                return None
+            return None if limit is None else z / limit, None, True
+        if outer_op == '+':
+            return None, None if limit is None else limit - z, False
+        if outer_op == '-':
+            return z, None if limit is None else limit + z, False
+        if outer_op == '×':
+            return None, None if limit is None else limit / z, False
+        return None, None if limit is None else limit * z, False
+
+    def _pair_with_result(self, op, t):
+        """结果为 t 的一个操作数对（打包），本次没有找到时返回 None"""
+        rng = self.rng
+        if self.index.indexed:
+            pairs = self.index.results(op).pairs.get(t)
+            if not pairs:
+                return None
+            return pairs[int(rng.random() * len(pairs))]
+        if t < 0:
+            return None
+        # 随机取 x，由 t 解出 y，y 须为字面量
+        values = self.index.values
+        i = int(rng.random() * len(values))
+        x = values[i]
+        if op == '+':
+            y = t - x
+        elif op == '-':
+            y = x - t
+        elif op == '×':
+            y = t / x
+        elif t == 0:
+            return None
+        else:
+            y = x / t
+        j = self.index.position.get(y)
+        if j is None:
+            return None
+        return i * len(values) + j
+
+    def _pair_in_span(self, op, lo, hi, positive):
+        """结果在 [lo, hi] 内（positive 时还须大于 0）的一个操作数对（打包），本次没有找到时返回 None"""
+        rng = self.rng
+        if self.index.indexed:
+            results = self.index.results(op)
+            start, stop = results.span(lo, hi, positive)
+            if start >= stop:
+                return None
+            return results.draw(start, stop, rng)
+        # 随机取 x，由 t 的区间得到 y 的区间 [y_lo, y_hi]，在按数值排序的字面量中二分
+        values = self.index.values
+        i = int(rng.random() * len(values))
+        x = values[i]
+        if op == '+':
+            y_lo = None if lo is None else lo - x
+            y_hi = None if hi is None else hi - x
+        elif op == '-':
+            # 括号内结果不为负数
+            y_lo = None if hi is None else x - hi
+            y_hi = x if lo is None or lo < 0 else x - lo
+        elif op == '×':
+            y_lo = None if lo is None else lo / x
+            y_hi = None if hi is None else hi / x
+        else:
+            if hi is not None and hi <= 0:
+                return None
+            y_lo = None if hi is None else x / hi
+            y_hi = None if lo is None or lo <= 0 else x / lo
+        start = 0 if y_lo is None else bisect_left(values, y_lo)
+        stop = len(values) if y_hi is None else bisect_right(values, y_hi)
+        if start >= stop:
+            return None
+        j = start + int(rng.random() * (stop - start))
+        if positive and _apply(op, x, values[j]) == 0:
+            return None
+        return i * len(values) + j
+
+    def _solved_binary_exercise(self):
+        """不建结果索引时构造两个操作数的题目"""
+        rng = self.rng
+        operators = self.constraints.operators
+        op = operators[int(rng.random() * len(operators))]
+        if self.targets is not None:
+            count = self.target_counts[op]
+            pair = self._pair_with_result(op, self.targets[int(rng.random() * count)])
+        else:
+            pair = self._pair_in_span(op, None, self.constraints.max_answer, False)
+        if pair is None:
+            return None
+        values = self.index.values
+        i, j = divmod(pair, len(values))
+        return self._render(op, pair), _apply(op, values[i], values[j])
+
+    def _ternary_exercise(self):
+        rng = self.rng
+        values = self.index.values
+        outer_op, position = self.outer_shapes[int(rng.random() * len(self.outer_shapes))]
+        inner_op = self.constraints.operators[int(rng.random() * len(self.constraints.operators))]
+        k = int(rng.random() * len(values))
+        z = values[k]
+
+        if self.targets is not None:
+            # 抽取满足约束的答案 R，反推括号内结果 t
+            target = self.targets[int(rng.random() * len(self.targets))]
+            if position == 'right':
+                if outer_op == '-':
+                    t = z - target
+                elif target == 0:
+                    return None
+                else:
+                    t = z / target
+            elif outer_op == '+':
+                t = target - z
+            elif outer_op == '-':
+                t = target + z
+            elif outer_op == '×':
+                t = target / z
+            else:
+                t = target * z
+            pair = self._pair_with_result(inner_op, t)
+            if pair is None:
+                return None
+        else:
+            bounds = self._inner_bounds(outer_op, position, z)
+            if bounds is None:
+                return None
+            pair = self._pair_in_span(inner_op, *bounds)
+            if pair is None:
+                return None
+            i, j = divmod(pair, len(values))
+            t = _apply(inner_op, values[i], values[j])
+
+        inner = self._render(inner_op, pair)
+        z_text = self.index.texts[k]
+        if position == 'left':
+            expr = f"{_bracket(inner, inner_op, outer_op, False)} {outer_op} {z_text}"
+            result = _apply(outer_op, t, z)
+        else:
+            expr = f"{z_text} {outer_op} {_bracket(inner, inner_op, outer_op, True)}"
+            result = _apply(outer_op, z, t)
+        return expr, result
+
+    def _filtered_exercise(self, generator):
+        try:
+            shape, op1, op2, _, texts, result = generator.generate_structure()
+        except ZeroDivisionError:
+            return None
+        operators = self.constraints.operators
+        if op1 not in operators or op2 is not None and op2 not in operators:
+            return None
+        if not self.constraints.accepts(result):
+            return None
+        return render_structure(shape, op1, op2, texts), result
+
+    def generate_exercise(self):
+        """构造一道满足约束的题目，本次尝试失败时返回 None"""
+        if self.filter is not None:
+            return self._filtered_exercise(self.filter)
+        if self.binary is None:
+            exercise = (self._solved_binary_exercise() if self.rng.random() < BINARY_SHARE
+                        else self._ternary_exercise())
+            if exercise is None:
+                return self._filtered_exercise(self.sampler)
+        elif self.binary and (self.targets == [] or self.rng.random() < BINARY_SHARE):
+            return self._binary_exercise()
+        else:
+            exercise = self._ternary_exercise()
+        if exercise is not None and not self.constraints.accepts(exercise[1]):
+            return None
+        return exercise
+
+    def iter_exercises(self, count):
+        """逐个产出至多 count 道互不重复的 (表达式, 结果)"""
+        produced = 0
+        attempts = 0
+        max_attempts = count * (10 if self.binary is not None else RETRY_ATTEMPTS)
+        while produced < count and attempts < max_attempts:
+            attempts += 1
+            exercise = self.generate_exercise()
+            if exercise is not None and self.generated.add(canonical_key(exercise[0])):
+                produced += 1
+                yield exercise
+
+    def generate_exercises(self, count):
+        return list(self.iter_exercises(count))
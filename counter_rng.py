@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基于计数器的随机数，第 k 道题目只由 (种子, 范围, k) 决定
+不必生成前面的题目即可直接得到第 k 道题目，任意区间都可以独立（并行）生成，
+丢失的部分题目或答案也可以按题号单独重新生成
+
+默认（流模式）第 k 道题目由第 k 条 splitmix64 随机数流按 generate_exercise 的方式生成，
+运算符和操作数个数的分布与普通模式相同，各题相互独立，不能保证不重复；
+distinct 为 True 时枚举题目空间（见 problem_space），用以种子为密钥的 Feistel 置换把 k
+映射为题目排名，各道题目互不重复，但题目在空间中均匀抽取，三个操作数的题目占绝大多数，
+与普通模式的分布不同；枚举题目空间较慢（范围 35 时约 6 秒），每个进程只构建一次，
+并行生成时子进程（fork）直接沿用主进程构建好的题目空间
+"""
+
+import random
+from functools import lru_cache
+
+MASK64 = (1 << 64) - 1
+GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+
+# 流模式下单道题目的最大重试次数（括号内结果为 0 又作为除数时重试）
+MAX_RETRIES = 100
+
+# 并行生成时每个子任务的题目数
+CHUNK_SIZE = 20000
+
+
+def splitmix64(x):
+    """splitmix64 的混合函数：64 位整数 -> 64 位整数（双射）"""
+    z = (x + GOLDEN_GAMMA) & MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+
+def stream_key(seed, max_range, k=None):
+    """由种子、范围（和题号）派生 64 位密钥"""
+    key = splitmix64(splitmix64(seed & MASK64) ^ max_range)
+    return key if k is None else splitmix64(key ^ k)
+
+
+class CounterRandom(random.Random):
+    """
+    splitmix64 随机数流，状态只有密钥和计数器
+    继承 random.Random，randint、choice 等方法都可以直接使用
+    """
+
+    def __init__(self, key):
+        super().__init__(key)
+
+    def seed(self, a=None, version=2):
+        self._key = (a or 0) & MASK64
+        self._counter = 0
+
+    def _next(self):
+        self._counter += 1
+        return splitmix64((self._key + self._counter * GOLDEN_GAMMA) & MASK64)
+
+    def random(self):
+        return (self._next() >> 11) * (1.0 / (1 << 53))
+
+    def getrandbits(self, k):
+        value = 0
+        bits = 0
+        while bits < k:
+            value = (value << 64) | self._next()
+            bits += 64
+        return value >> (bits - k)
+
+    def getstate(self):
+        return self._key, self._counter
+
+    def setstate(self, state):
+        self._key, self._counter = state
+
+
+class FeistelPermutation:
+    """
+    [0, size) 上由密钥确定的随机置换，perm[i] 为 O(1) 计算
+    在 2^(2h) >= size 的范围上做 4 轮 Feistel 变换，结果超出 size 时继续变换（cycle walking）
+    """
+
+    ROUNDS = 4
+
+    def __init__(self, size, key):
+        self.size = size
+        self.half_bits = max(1, (max(size - 1, 1).bit_length() + 1) // 2)
+        self.half_mask = (1 << self.half_bits) - 1
+        self.round_keys = [splitmix64(key ^ r) for r in range(self.ROUNDS)]
+
+    def _encrypt(self, x):
+        half_bits = self.half_bits
+        half_mask = self.half_mask
+        left, right = x >> half_bits, x & half_mask
+        for round_key in self.round_keys:
+            left, right = right, left ^ (splitmix64(round_key ^ right) & half_mask)
+        return (left << half_bits) | right
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.size:
+            raise IndexError(i)
+        x = self._encrypt(i)
+        while x >= self.size:
+            x = self._encrypt(x)
+        return x
+
+
+class CounterGenerator:
+    """
+    按题号直接生成题目：exercise_at(k) 只由 (seed, max_range, k) 决定
+    distinct 为 True 时枚举题目空间，题号 0 .. len(self)-1 的题目互不重复，
+    范围过大无法枚举时抛出 ValueError；范围小于 2 时没有可用的数，同样抛出 ValueError
+    """
+
+    def __init__(self, max_range, seed, distinct=False):
+        from myapp_final import MathExerciseGenerator
+        from problem_space import ProblemSpace
+
+        if max_range < 2:
+            raise ValueError(f"数值范围 {max_range} 内没有可用的数，至少为 2")
+        self.max_range = max_range
+        self.seed = seed
+        self.key = stream_key(seed, max_range)
+        self.space = ProblemSpace(max_range) if distinct else None
+        if self.space is not None:
+            self.permutation = FeistelPermutation(len(self.space), self.key)
+            self.generator = None
+        else:
+            self.permutation = None
+            self.generator = MathExerciseGenerator(max_range)
+
+    @property
+    def distinct(self):
+        return self.space is not None
+
+    def __len__(self):
+        """可以生成的题目数（流模式下没有上限）"""
+        if self.space is None:
+            raise TypeError("流模式下题目数没有上限")
+        return len(self.space)
+
+    def exercise_at(self, k):
+        """第 k 道题目（从 0 开始）的 (表达式, 结果)"""
+        if self.permutation is not None:
+            return self.space.unrank(self.permutation[k])
+        if k < 0:
+            raise IndexError(k)
+        generator = self.generator
+        generator.rng = CounterRandom(splitmix64(self.key ^ k))
+        for _ in range(MAX_RETRIES):
+            try:
+                return generator.generate_exercise()
+            except ZeroDivisionError:
+                # 同一条随机数流继续抽取，结果仍然确定
+                continue
+        raise RuntimeError(f"第 {k} 道题目生成失败")
+
+    def exercises(self, start, stop):
+        """逐个产出题号在 [start, stop) 内的题目"""
+        for k in range(start, stop):
+            yield self.exercise_at(k)
+
+
+@lru_cache(maxsize=8)
+def get_generator(max_range, seed, distinct=False):
+    """取得（必要时构建）指定范围和种子的 CounterGenerator，每个进程只构建一次"""
+    return CounterGenerator(max_range, seed, distinct)
+
+
+def _counter_chunk(task):
+    """子进程任务：生成一段题号的题目"""
+    max_range, seed, distinct, start, stop = task
+    return list(get_generator(max_range, seed, distinct).exercises(start, stop))
+
+
+def iter_counter_exercises(start, stop, max_range, seed, workers=1, chunk_size=CHUNK_SIZE,
+                           distinct=False):
+    """
+    按题号顺序产出 [start, stop) 内的题目，结果与进程数无关
+    distinct 时题目互不重复，题目空间无法枚举或题目不足时立即抛出 ValueError
+    """
+    # 先在主进程中构建，fork 出的子进程直接沿用 get_generator 的缓存
+    generator = get_generator(max_range, seed, distinct)
+    if generator.distinct and stop > len(generator):
+        raise ValueError(f"数值范围 {max_range} 内最多只有 {len(generator)} 道不同的题目")
+    if workers <= 1:
+        return generator.exercises(start, stop)
+    return _iter_parallel(start, stop, max_range, seed, distinct, workers, chunk_size)
+
+
+def _iter_parallel(start, stop, max_range, seed, distinct, workers, chunk_size):
+    from multiprocessing import Pool
+    tasks = [(max_range, seed, distinct, chunk_start, min(chunk_start + chunk_size, stop))
+             for chunk_start in range(start, stop, chunk_size)]
+    with Pool(workers) as pool:
+        for chunk in pool.imap(_counter_chunk, tasks):
+            yield from chunk
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+题目查重
+将表达式规范化（交换律、结合律）后压缩为 64 位指纹，
+并用紧凑的开放寻址表保存已生成的指纹
+"""
+
+import hashlib
+from array import array
+
+from expression import parse
+
+# 满足交换律和结合律的运算符
+COMMUTATIVE_OPERATORS = ('+', '×')
+
+
+def canonical_form(node):
+    """
+    生成语法树的规范化字符串
+    连续的加法（或乘法）展开为一组操作数并排序，
+    因此 1 + 2 与 2 + 1、(a + b) + c 与 a + (b + c) 得到相同结果
+    """
+    if not isinstance(node, tuple):
+        return f"{node.numerator}/{node.denominator}"
+
+    op, left, right = node
+    if op in COMMUTATIVE_OPERATORS:
+        operands = sorted(canonical_form(child) for child in _flatten(node, op))
+        return f"{op}({','.join(operands)})"
+    return f"{op}({canonical_form(left)},{canonical_form(right)})"
+
+
+def _flatten(node, op):
+    """展开同一运算符连接的所有操作数"""
+    if not isinstance(node, tuple) or node[0] != op:
+        return [node]
+    return _flatten(node[1], op) + _flatten(node[2], op)
+
+
+def canonical_key(expr):
+    """计算表达式的 64 位查重指纹（不会为 0）"""
+    return tree_key(parse(expr))
+
+
+def tree_key(node):
+    """计算语法树的 64 位查重指纹，叶子可以是任何带 numerator/denominator 的数"""
+    return form_key(canonical_form(node))
+
+
+def form_key(form):
+    """将规范化字符串压缩为 64 位指纹（不会为 0）"""
+    digest = hashlib.blake2b(form.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') or 1
+
+
+class DedupIndex:
+    """
+    基于线性探测的指纹集合
+    每个指纹只占数组中的 8 字节，负载因子不超过 1/2
+    """
+
+    def __init__(self, capacity=1024):
+        size = 16
+        while size < capacity * 2:
+            size *= 2
+        self._slots = array('Q', bytes(8 * size))
+        self._mask = size - 1
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, key):
+        slots = self._slots
+        mask = self._mask
+        i = key & mask
+        while True:
+            current = slots[i]
+            if current == key:
+                return True
+            if current == 0:
+                return False
+            i = (i + 1) & mask
+
+    def add(self, key):
+        """加入指纹，若为新指纹返回 True，已存在返回 False"""
+        slots = self._slots
+        mask = self._mask
+        i = key & mask
+        while True:
+            current = slots[i]
+            if current == key:
+                return False
+            if current == 0:
+                slots[i] = key
+                self._count += 1
+                if self._count * 2 > len(slots):
+                    self._grow()
+                return True
+            i = (i + 1) & mask
+
+    def add_expression(self, expr):
+        """按表达式查重并加入，若为新题目返回 True"""
+        return self.add(canonical_key(expr))
+
+    def _grow(self):
+        """扩容为原来的两倍并重新插入所有指纹"""
+        old_slots = self._slots
+        size = len(old_slots) * 2
+        self._slots = array('Q', bytes(8 * size))
+        self._mask = size - 1
+        slots = self._slots
+        mask = self._mask
+        for key in old_slots:
+            if key:
+                i = key & mask
+                while slots[i]:
+                    i = (i + 1) & mask
+                slots[i] = key
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+跨运行持久保存的题目查重指纹
+指纹保存在 sqlite 表中（指纹本身作为主键），前面可以加一个 Bloom 过滤器：
+过滤器判定"一定不存在"时不必查询数据库，内存占用只与过滤器容量有关（每个指纹约 10 比特）
+过滤器保存在旁边的 .bloom 文件中，启动时直接读入；与数据库不一致时从数据库重建
+本次运行新加入的指纹先放在内存中，攒够一批再写入数据库；
+过滤器文件只在 checkpoint() 和 close() 时整体写回，运行中途异常退出时下次启动会从数据库重建；
+每次写入数据库时在同一事务中把代数加 1，若代数不是自己上次的代数加 1，说明其他进程同时写入过，
+内存中的过滤器缺少它们的指纹，不再写回文件，下次启动时由代数不一致发现并从数据库重建
+"""
+
+import math
+import os
+import sqlite3
+import struct
+
+from dedup import DedupIndex, canonical_key
+
+# 每批写入数据库的指纹数
+FLUSH_SIZE = 50000
+
+# Bloom 过滤器的默认容量和误判率
+BLOOM_CAPACITY = 10 ** 7
+BLOOM_ERROR_RATE = 0.01
+
+BLOOM_MAGIC = b'QCBF'
+BLOOM_HEADER = struct.Struct('<4sQIQ')
+
+_SIGN_BIT = 1 << 63
+
+
+def _to_signed(key):
+    """sqlite 的整数是有符号 64 位"""
+    return key - (1 << 64) if key & _SIGN_BIT else key
+
+
+class BloomFilter:
+    """
+    Bloom 过滤器
+    指纹本身已是均匀的 64 位哈希值，用高低 32 位做双重哈希得到 k 个位置
+    """
+
+    def __init__(self, size_bits, hash_count, bits=None):
+        self.size_bits = size_bits
+        self.hash_count = hash_count
+        self.bits = bits if bits is not None else bytearray((size_bits + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity, error_rate=BLOOM_ERROR_RATE):
+        """按容量和误判率确定位数和哈希函数个数"""
+        capacity = max(capacity, 1)
+        size_bits = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        hash_count = max(1, round(size_bits / capacity * math.log(2)))
+        return cls(size_bits, hash_count)
+
+    def _positions(self, key):
+        h1 = key & 0xffffffff
+        h2 = (key >> 32) | 1
+        size = self.size_bits
+        return [(h1 + i * h2) % size for i in range(self.hash_count)]
+
+    def add(self, key):
+        bits = self.bits
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        bits = self.bits
+        for position in self._positions(key):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def save(self, path, generation):
+        """写入文件，generation 用于判断与数据库是否一致"""
+        temp = path + '.tmp'
+        with open(temp, 'wb') as f:
+            f.write(BLOOM_HEADER.pack(BLOOM_MAGIC, self.size_bits, self.hash_count, generation))
+            f.write(self.bits)
+        os.replace(temp, path)
+
+    @classmethod
+    def load(cls, path):
+        """读取文件，返回 (过滤器, generation)，文件不存在或损坏时返回 (None, None)"""
+        try:
+            with open(path, 'rb') as f:
+                header = f.read(BLOOM_HEADER.size)
+                magic, size_bits, hash_count, generation = BLOOM_HEADER.unpack(header)
+                if magic != BLOOM_MAGIC:
+                    return None, None
+                bits = bytearray((size_bits + 7) // 8)
+                if f.readinto(bits) != len(bits):
+                    return None, None
+        except (OSError, struct.error):
+            return None, None
+        return cls(size_bits, hash_count, bits), generation
+
+
+class PersistentDedupIndex:
+    """
+    持久化的指纹集合，接口与 DedupIndex 相同（add、in、len）
+    首次使用时才打开数据库和读入过滤器；用完后调用 close()（或用 with）把剩余指纹写入磁盘
+    bloom_capacity 为 None 时不使用过滤器，每次查重都查询数据库
+    """
+
+    def __init__(self, path, bloom_capacity=BLOOM_CAPACITY, error_rate=BLOOM_ERROR_RATE,
+                 flush_size=FLUSH_SIZE):
+        self.path = os.fspath(path)
+        self.bloom_path = self.path + '.bloom'
+        self.bloom_capacity = bloom_capacity
+        self.error_rate = error_rate
+        self.flush_size = flush_size
+        self._db = None
+        self._bloom = None
+        self._stored = 0
+        self._generation = 0
+        self._pending = DedupIndex()
+        self._pending_keys = []
+        self._bloom_dirty = False
+        self._bloom_stale = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # 延迟加载
+
+    def _open(self):
+        if self._db is not None:
+            return
+        db = sqlite3.connect(self.path)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("CREATE TABLE IF NOT EXISTS keys (key INTEGER PRIMARY KEY) WITHOUT ROWID")
+        db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+        db.commit()
+        self._db = db
+        self._stored = self._meta('count')
+        self._generation = self._meta('generation')
+        if self.bloom_capacity is not None:
+            self._load_bloom()
+
+    def _meta(self, name):
+        row = self._db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def _load_bloom(self):
+        bloom, generation = BloomFilter.load(self.bloom_path)
+        capacity = max(self.bloom_capacity, 2 * self._stored)
+        if bloom is None or generation != self._generation or \
+                self._stored > self.bloom_capacity and bloom.size_bits < \
+                BloomFilter.for_capacity(self._stored, self.error_rate).size_bits:
+            # 过滤器缺失、过期或容量不足：从数据库重建
+            bloom = BloomFilter.for_capacity(capacity, self.error_rate)
+            for (key,) in self._db.execute("SELECT key FROM keys"):
+                bloom.add(key & 0xffffffffffffffff)
+            bloom.save(self.bloom_path, self._generation)
+        self._bloom = bloom
+
+    # 集合接口
+
+    def __len__(self):
+        self._open()
+        return self._stored + len(self._pending_keys)
+
+    def _stored_contains(self, key):
+        if self._bloom is not None and key not in self._bloom:
+            return False
+        row = self._db.execute("SELECT 1 FROM keys WHERE key = ?", (_to_signed(key),)).fetchone()
+        return row is not None
+
+    def __contains__(self, key):
+        self._open()
+        return key in self._pending or self._stored_contains(key)
+
+    def add(self, key):
+        """加入指纹，若为新指纹（本次和以往的运行都没有出现过）返回 True"""
+        self._open()
+        if key in self._pending or self._stored_contains(key):
+            return False
+        self._pending.add(key)
+        self._pending_keys.append(key)
+        if len(self._pending_keys) >= self.flush_size:
+            self.flush()
+        return True
+
+    def add_expression(self, expr):
+        return self.add(canonical_key(expr))
+
+    def flush(self):
+        """把本次运行新加入的指纹写入数据库和内存中的过滤器"""
+        if self._db is None or not self._pending_keys:
+            return
+        keys = self._pending_keys
+        db = self._db
+        with db:
+            before = db.total_changes
+            db.executemany("INSERT OR IGNORE INTO keys (key) VALUES (?)",
+                           ((_to_signed(key),) for key in keys))
+            # 其他进程可能已经写入了相同的指纹，只计实际插入的行
+            db.execute("INSERT INTO meta (name, value) VALUES ('count', ?) "
+                       "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                       (db.total_changes - before,))
+            db.execute("INSERT INTO meta (name, value) VALUES ('generation', 1) "
+                       "ON CONFLICT (name) DO UPDATE SET value = value + 1")
+            self._stored = self._meta('count')
+            generation = self._meta('generation')
+        if generation != self._generation + 1:
+            self._bloom_stale = True
+        self._generation = generation
+        if self._bloom is not None:
+            for key in keys:
+                self._bloom.add(key)
+            self._bloom_dirty = True
+        self._pending = DedupIndex()
+        self._pending_keys = []
+
+    def checkpoint(self):
+        """写入剩余的指纹，并把过滤器写回文件"""
+        self.flush()
+        if self._bloom is not None and self._bloom_dirty and not self._bloom_stale:
+            self._bloom.save(self.bloom_path, self._generation)
+            self._bloom_dirty = False
+
+    def close(self):
+        if self._db is not None:
+            self.checkpoint()
+            self._db.close()
+            self._db = None
+            self._bloom = None
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按列存储的一批题目
+每道题目拆成形式、运算符编码、操作数分子分母和答案分子分母，分别存放在定长的 array 中，
+表达式字符串只在需要时渲染；形式和运算符编码与 binfmt 的记录一致，可以直接写成二进制文件
+每道题目约占 43 字节，而 (字符串, Rational) 元组通常要两三百字节
+"""
+
+from array import array
+from itertools import repeat
+
+from binfmt import (HEADER, MAGIC, OP_CODES, RECORD, VERSION, BinaryExercises, encode_expression,
+                    format_answer, render_record)
+from rational import Rational
+
+# 列名与类型：形式、运算符为 int8，操作数为 int32，答案为 int64
+COLUMNS = (
+    ('shapes', 'b'), ('op1', 'b'), ('op2', 'b'),
+    ('n1', 'i'), ('d1', 'i'), ('n2', 'i'), ('d2', 'i'), ('n3', 'i'), ('d3', 'i'),
+    ('answer_num', 'q'), ('answer_den', 'q'),
+)
+
+
+class ExerciseBatch:
+    """
+    一批题目
+    迭代产出 (表达式, Rational 结果)，与 generate_exercises 返回的列表元素相同；
+    支持 len、下标、切片、+ 拼接，答案分母为 0 表示没有答案
+    """
+
+    __slots__ = tuple(name for name, _ in COLUMNS)
+
+    def __init__(self, columns=None):
+        for name, typecode in COLUMNS:
+            setattr(self, name, columns[name] if columns else array(typecode))
+
+    @classmethod
+    def from_exercises(cls, exercises):
+        """由 (表达式, 结果) 迭代器构造"""
+        batch = cls()
+        batch.extend(exercises)
+        return batch
+
+    @classmethod
+    def from_binary(cls, path):
+        """读取 binfmt 格式的二进制题目文件"""
+        batch = cls()
+        with BinaryExercises(path) as exercises:
+            batch._extend_records(exercises.records())
+        return batch
+
+    @classmethod
+    def concat(cls, batches):
+        batch = cls()
+        for other in batches:
+            for name in cls.__slots__:
+                getattr(batch, name).extend(getattr(other, name))
+        return batch
+
+    def _columns(self):
+        return [getattr(self, name) for name in self.__slots__]
+
+    def _extend_records(self, records):
+        appends = [column.append for column in self._columns()]
+        for record in records:
+            # 记录的第 4 个字段为填充
+            values = record[:3] + record[4:]
+            for append, value in zip(appends, values):
+                append(value)
+
+    def extend_structures(self, structures):
+        """
+        追加 MathExerciseGenerator.generate_structure 产生的题目结构
+        (形式, 运算符 1, 运算符 2, 操作数, 操作数文本, 结果)，直接写入各列，不经过表达式文本
+        """
+        appends = [column.append for column in self._columns()]
+        (append_shape, append_op1, append_op2, append_n1, append_d1, append_n2, append_d2,
+         append_n3, append_d3, append_answer_num, append_answer_den) = appends
+        size = len(self.answer_den)
+        try:
+            for shape, op1, op2, operands, _, result in structures:
+                append_shape(shape)
+                append_op1(OP_CODES[op1])
+                append_op2(OP_CODES[op2] if op2 is not None else 0)
+                x, y = operands[0], operands[1]
+                append_n1(x.numerator)
+                append_d1(x.denominator)
+                append_n2(y.numerator)
+                append_d2(y.denominator)
+                if len(operands) == 3:
+                    z = operands[2]
+                    append_n3(z.numerator)
+                    append_d3(z.denominator)
+                else:
+                    append_n3(0)
+                    append_d3(0)
+                append_answer_num(result.numerator)
+                append_answer_den(result.denominator)
+                size += 1
+        except OverflowError:
+            # 回滚这道题目已经追加的列
+            for column in self._columns():
+                del column[size:]
+            raise ValueError("数值超出 ExerciseBatch 的范围") from None
+
+    def append(self, expr, result):
+        """追加一道题目，表达式须为 binfmt 支持的形式"""
+        self.extend(((expr, result),))
+
+    def extend(self, exercises):
+        """追加 (表达式, 结果) 迭代器中的题目"""
+        appends = [column.append for column in self._columns()]
+        for expr, result in exercises:
+            shape, op1, op2, operands = encode_expression(expr)
+            if result is None:
+                answer = (0, 0)
+            else:
+                result = Rational.from_number(result)
+                answer = (result.numerator, result.denominator)
+            try:
+                for append, value in zip(appends, (shape, op1, op2) + operands + answer):
+                    append(value)
+            except OverflowError:
+                # 回滚这道题目已经追加的列
+                size = len(self.answer_den)
+                for column in self._columns():
+                    del column[size:]
+                raise ValueError(f"数值超出 ExerciseBatch 的范围：{expr}") from None
+
+    def __len__(self):
+        return len(self.shapes)
+
+    def record(self, index):
+        """第 index 道题目的 binfmt 记录"""
+        shape, op1, op2, *rest = (column[index] for column in self._columns())
+        return (shape, op1, op2, 0, *rest)
+
+    def expression(self, index):
+        return render_record(self.record(index))
+
+    def answer(self, index):
+        """第 index 道题目的答案（Rational），没有答案时返回 None"""
+        denominator = self.answer_den[index]
+        return Rational._raw(self.answer_num[index], denominator) if denominator else None
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ExerciseBatch({name: getattr(self, name)[index] for name in self.__slots__})
+        if index < 0:
+            index += len(self)
+        return self.expression(index), self.answer(index)
+
+    def __add__(self, other):
+        if not isinstance(other, ExerciseBatch):
+            return NotImplemented
+        return ExerciseBatch.concat((self, other))
+
+    def records(self):
+        """逐条产出 binfmt 记录"""
+        shapes, op1, op2, *rest = self._columns()
+        return zip(shapes, op1, op2, repeat(0), *rest)
+
+    def expressions(self):
+        """逐个渲染表达式"""
+        for record in self.records():
+            yield render_record(record)
+
+    def answer_texts(self):
+        """逐个格式化答案（与 format_number 相同），没有答案时为空字符串"""
+        for numerator, denominator in zip(self.answer_num, self.answer_den):
+            yield format_answer(numerator, denominator) if denominator else ''
+
+    def __iter__(self):
+        for record in self.records():
+            denominator = record[11]
+            yield render_record(record), (Rational._raw(record[10], denominator) if denominator else None)
+
+    def __eq__(self, other):
+        if not isinstance(other, ExerciseBatch):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    @property
+    def nbytes(self):
+        """各列占用的字节数"""
+        return sum(column.itemsize * len(column) for column in self._columns())
+
+    def write_binary(self, path, max_range=0):
+        """直接由各列写出 binfmt 格式的二进制文件，不经过表达式文本，返回题目数"""
+        pack = RECORD.pack
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, len(self), max_range))
+            f.write(b''.join(pack(*record) for record in self.records()))
+        return len(self)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+四则运算表达式的词法分析与语法分析
+表达式只扫描一遍，用调度场算法编译为逆波兰程序并按表达式文本缓存，
+求值和构造语法树都基于编译结果
+"""
+
+import re
+from functools import lru_cache
+
+from rational import Rational
+
+# 依次为：数字（带分数、真分数、自然数）、运算符、括号，最后一组匹配无法识别的字符
+TOKEN_PATTERN = re.compile(r"(\d+'\d+/\d+|\d+/\d+|\d+)|([-+×÷*/])|([()])|(\S)")
+
+# 统一运算符写法
+OPERATOR_ALIASES = {'+': '+', '-': '-', '×': '×', '*': '×', '÷': '÷', '/': '÷'}
+
+PRECEDENCE = {'+': 1, '-': 1, '×': 2, '÷': 2}
+
+# 编译结果缓存的条目数
+CACHE_SIZE = 65536
+
+
+def parse_literal(s):
+    """解析数字字面量（自然数、真分数、带分数）"""
+    if s.isdigit():
+        return Rational._raw(int(s), 1)
+    elif "'" in s:
+        whole, frac_part = s.split("'")
+        numerator, denominator = frac_part.split('/')
+        denominator = int(denominator)
+        return Rational(int(whole) * denominator + int(numerator), denominator)
+    else:
+        numerator, denominator = s.split('/')
+        return Rational(int(numerator), int(denominator))
+
+
+def tokenize(expr):
+    """将表达式拆分为数字、运算符和括号"""
+    tokens = []
+    for number, op, paren, bad in TOKEN_PATTERN.findall(expr):
+        if bad:
+            raise ValueError(f"无法识别的表达式：{expr}")
+        tokens.append(number or op or paren)
+    return tokens
+
+
+def _compile(expr):
+    """
+    编译表达式为逆波兰程序
+    程序是一个元组，元素为 Rational（压栈）或运算符字符串（弹出两个数运算）
+    """
+    program = []
+    operators = []
+    expect_operand = True
+
+    for number, op, paren, bad in TOKEN_PATTERN.findall(expr):
+        if number:
+            if not expect_operand:
+                raise ValueError(f"缺少运算符：{expr}")
+            program.append(parse_literal(number))
+            expect_operand = False
+        elif op:
+            if expect_operand:
+                raise ValueError(f"意外的符号 {op}：{expr}")
+            op = OPERATOR_ALIASES[op]
+            # 左结合：弹出优先级不低于当前运算符的运算符
+            precedence = PRECEDENCE[op]
+            while operators and operators[-1] != '(' and \
+                    PRECEDENCE[operators[-1]] >= precedence:
+                program.append(operators.pop())
+            operators.append(op)
+            expect_operand = True
+        elif paren == '(':
+            if not expect_operand:
+                raise ValueError(f"缺少运算符：{expr}")
+            operators.append('(')
+        elif paren:
+            if expect_operand:
+                raise ValueError(f"意外的右括号：{expr}")
+            while operators and operators[-1] != '(':
+                program.append(operators.pop())
+            if not operators:
+                raise ValueError(f"括号不匹配：{expr}")
+            operators.pop()
+        else:
+            raise ValueError(f"无法识别的表达式：{expr}")
+
+    if expect_operand:
+        raise ValueError(f"表达式不完整：{expr}")
+    while operators:
+        op = operators.pop()
+        if op == '(':
+            raise ValueError(f"括号不匹配：{expr}")
+        program.append(op)
+    return tuple(program)
+
+
+# 按表达式文本缓存编译结果，批改时同一题目只编译一次
+compile_expression = lru_cache(maxsize=CACHE_SIZE)(_compile)
+
+
+def run(program):
+    """执行逆波兰程序，返回 Rational 结果"""
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    for item in program:
+        if item.__class__ is str:
+            right = pop()
+            left = pop()
+            if item == '+':
+                push(left + right)
+            elif item == '-':
+                push(left - right)
+            elif item == '×':
+                push(left * right)
+            else:
+                push(left / right)
+        else:
+            push(item)
+    return stack[0]
+
+
+def evaluate(expr):
+    """计算表达式的值，除数为 0 时抛出 ZeroDivisionError"""
+    return run(compile_expression(expr.strip()))
+
+
+def parse(expr):
+    """
+    解析表达式为语法树
+    叶子节点为 Rational，内部节点为 (运算符, 左子树, 右子树)
+    """
+    stack = []
+    # 生成题目时表达式各不相同，不经过缓存
+    for item in _compile(expr.strip()):
+        if item.__class__ is str:
+            right = stack.pop()
+            left = stack.pop()
+            stack.append((item, left, right))
+        else:
+            stack.append(item)
+    return stack[0]
@@ -7,62 +7,33 @@
 3. 检查答案并生成评分
 """
 
-import subprocess
-import sys
 import argparse
 
-def run_command(cmd):
-    """运行命令并返回结果"""
-    try:
-        result = subprocess.run(cmd, capture_output=True, text=True, shell=True)
-        return result.returncode == 0, result.stdout, result.stderr
-    except Exception as e:
-        return False, "", str(e)
+from pipeline import run_pipeline
 
-def full_test_workflow(num_questions, value_range, correct_ratio=0.6):
-    """完整的测试工作流程"""
+def full_test_workflow(num_questions, value_range, correct_ratio=0.6, seed=None):
+    """完整的测试工作流程（在当前进程内按批流式执行，同时写出各结果文件）"""
     print("=" * 50)
     print("小学四则运算题目生成器 - 完整测试流程")
     print("=" * 50)
     
-    # 步骤1: 生成题目
+    # 步骤1-3: 生成题目、生成测试答案、检查答案
     print(f"\n步骤1: 生成 {num_questions} 道题目 (范围: {value_range})")
-    cmd1 = f"py myapp_final.py -n {num_questions} -r {value_range}"
-    success, stdout, stderr = run_command(cmd1)
-    
-    if success:
-        print("✓ 题目生成成功")
-        print(stdout.strip())
-    else:
-        print("✗ 题目生成失败")
-        print(stderr)
-        return
-    
-    # 步骤2: 生成测试答案
-    print(f"\n步骤2: 生成测试答案 (正确率: {correct_ratio*100}%)")
-    cmd2 = f"py generate_test_answers.py -e Exercises.txt -o TestAnswers.txt -r {correct_ratio}"
-    success, stdout, stderr = run_command(cmd2)
-    
-    if success:
-        print("✓ 测试答案生成成功")
-        print(stdout.strip())
-    else:
-        print("✗ 测试答案生成失败")
-        print(stderr)
+    print(f"步骤2: 生成测试答案 (正确率: {correct_ratio*100}%)")
+    print(f"步骤3: 检查答案")
+    try:
+        result = run_pipeline(num_questions, value_range, correct_ratio, seed=seed,
+                              exercise_file='Exercises.txt', answer_file='Answers.txt',
+                              test_answer_file='TestAnswers.txt', grade_file='Grade.txt')
+    except Exception as e:
+        print("✗ 测试流程失败")
+        print(e)
         return
     
-    # 步骤3: 检查答案
-    print(f"\n步骤3: 检查答案")
-    cmd3 = f"py myapp_final.py -e Exercises.txt -a TestAnswers.txt"
-    success, stdout, stderr = run_command(cmd3)
-    
-    if success:
-        print("✓ 答案检查完成")
-        print(stdout.strip())
-    else:
-        print("✗ 答案检查失败")
-        print(stderr)
-        return
+    print(f"✓ 成功生成 {result.total} 道题目及测试答案")
+    print("✓ 答案检查完成")
+    print(f"正确：{result.correct_count} 题")
+    print(f"错误：{result.wrong_count} 题")
     
     # 显示结果文件
     print(f"\n步骤4: 查看结果")
@@ -93,7 +64,7 @@ def full_test_workflow(num_questions, value_range, correct_ratio=0.6):
     except Exception as e:
         print(f"读取结果文件时出错: {e}")
     
-    print(f"\n=" * 50)
+    print("\n" + "=" * 50)
     print("测试完成！生成的文件:")
     print("- Exercises.txt: 题目文件")
     print("- Answers.txt: 标准答案文件")
@@ -106,6 +77,7 @@ def main():
     parser.add_argument('-n', '--num', type=int, default=10, help='题目数量 (默认: 10)')
     parser.add_argument('-r', '--range', type=int, default=10, help='数值范围 (默认: 10)')
     parser.add_argument('-c', '--correct', type=float, default=0.6, help='正确答案比例 (默认: 0.6)')
+    parser.add_argument('--seed', type=int, help='随机数种子，指定后结果可复现')
     
     args = parser.parse_args()
     
@@ -117,7 +89,7 @@ def main():
         print("错误: 正确答案比例必须在 0.0 到 1.0 之间")
         return
     
-    full_test_workflow(args.num, args.range, args.correct)
+    full_test_workflow(args.num, args.range, args.correct, args.seed)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
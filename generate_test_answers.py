@@ -3,125 +3,184 @@
 """
 测试答案生成器
 根据题目文件生成随机的测试答案（包含正确和错误答案）
+题目文件按固定行数分段，每段使用由种子和段号确定的随机数流，
+因此相同的种子总能得到相同的测试答案，与进程数无关；各段按顺序写出，内存中只保留一段
+提供标准答案文件（如 Answers.txt）时直接读取答案，不再重新计算
+错误答案由正确答案稍加改动得到（加减 1、改动分子或分母、取倒数等），看起来更像真实的错误
 """
 
-import random
 import argparse
-from fractions import Fraction
-from myapp_final import MathExerciseGenerator, evaluate_expression, parse_fraction
-
-def generate_random_answer(generator):
-    """生成一个随机答案"""
-    answer_type = random.choice(['correct', 'wrong_number', 'wrong_fraction', 'zero'])
-    
-    if answer_type == 'correct':
-        # 这个会在主函数中被正确答案替换
-        return "CORRECT_PLACEHOLDER"
-    elif answer_type == 'wrong_number':
-        # 生成错误的整数答案
-        return str(random.randint(0, 20))
-    elif answer_type == 'wrong_fraction':
-        # 生成错误的分数答案
-        num = random.randint(1, 10)
-        den = random.randint(2, 10)
-        return f"{num}/{den}"
+import random
+
+from binfmt import format_answer
+from myapp_final import (GradeResult, count_lines, evaluate_expression, extract_answer,
+                         extract_expression, line_offsets, parse_fraction, read_lines)
+from pipeline import wrong_answer
+from rational import Rational
+
+# 每段的行数（8 的倍数，合并评分位图时无需移位）
+CHUNK_LINES = 65536
+
+PERTURBATIONS = ('plus_one', 'minus_one', 'numerator', 'denominator', 'reciprocal', 'double')
+
+def perturb_answer(value, rng):
+    """由正确答案 value（Rational）改动得到一个不同的非负错误答案，返回格式化的字符串"""
+    numerator, denominator = value.numerator, value.denominator
+    correct = format_answer(numerator, denominator)
+    for _ in range(10):
+        kind = rng.choice(PERTURBATIONS)
+        if kind == 'plus_one':
+            numerator2, denominator2 = numerator + denominator, denominator
+        elif kind == 'minus_one':
+            numerator2, denominator2 = numerator - denominator, denominator
+        elif kind == 'numerator':
+            numerator2, denominator2 = numerator + rng.choice((-1, 1)), denominator
+        elif kind == 'denominator':
+            numerator2, denominator2 = numerator, denominator + rng.choice((-1, 1))
+        elif kind == 'reciprocal':
+            numerator2, denominator2 = denominator, numerator
+        else:
+            numerator2, denominator2 = numerator * 2, denominator
+        if numerator2 < 0 or denominator2 <= 0:
+            continue
+        wrong = Rational(numerator2, denominator2)
+        answer = format_answer(wrong.numerator, wrong.denominator)
+        if answer != correct:
+            return answer
+    return wrong_answer(correct, rng)
+
+def _answer_value(exercise_line, key_line):
+    """题目的正确答案：优先取标准答案行，无法解析时重新计算，仍然失败返回 None"""
+    if key_line is not None:
+        try:
+            return parse_fraction(extract_answer(key_line))
+        except (ValueError, ZeroDivisionError, IndexError):
+            pass
+    try:
+        return evaluate_expression(extract_expression(exercise_line))
+    except Exception:
+        return None
+
+def _synthesize_chunk(task):
+    """
+    生成一段的测试答案，在该段的 count 道题目中恰好有 quota 道给出正确答案
+    返回 (输出文本, 预期的评分结果)
+    """
+    exercise_file, key_file, offsets, start, count, quota, seed = task
+    rng = random.Random(f"{seed}:{start}")
+    exercise_lines = read_lines(exercise_file, offsets[0], count)
+    if key_file:
+        key_lines = list(read_lines(key_file, offsets[1], count))
+        key_lines += [None] * (count - len(key_lines))
     else:
-        # 返回0作为错误答案
-        return "0"
+        key_lines = [None] * count
+
+    lines = []
+    expected = GradeResult()
+    remaining = count
+    for number, exercise_line, key_line in zip(range(start + 1, start + count + 1),
+                                                 exercise_lines, key_lines):
+        value = _answer_value(exercise_line, key_line)
+        # 顺序抽样：以 剩余名额/剩余题目数 的概率给出正确答案
+        is_correct = rng.random() * remaining < quota
+        remaining -= 1
+        if is_correct:
+            quota -= 1
+            answer = format_answer(value.numerator, value.denominator) if value is not None else "0"
+        elif value is not None:
+            answer = perturb_answer(value, rng)
+        else:
+            answer = wrong_answer("0", rng)
+        lines.append(f"{number}. {answer}\n")
+        expected.add(is_correct and value is not None)
+    return ''.join(lines), expected
 
-def generate_test_answers(exercise_file, output_file, correct_ratio=0.6):
+def _quotas(sizes, correct_count):
+    """把 correct_count 个正确答案按各段题目数分配（最大余数法），总数恰好为 correct_count"""
+    total = sum(sizes)
+    if total == 0:
+        return [0] * len(sizes)
+    exact = [size * correct_count / total for size in sizes]
+    quotas = [int(value) for value in exact]
+    order = sorted(range(len(sizes)), key=lambda i: quotas[i] - exact[i])
+    for i in order[:correct_count - sum(quotas)]:
+        quotas[i] += 1
+    return quotas
+
+def generate_test_answers(exercise_file, output_file, correct_ratio=0.6, key_file=None,
+                          seed=None, workers=1, chunk_lines=CHUNK_LINES):
     """
-    生成测试答案文件
-    correct_ratio: 正确答案的比例（0.0-1.0）
+    生成测试答案文件，返回预期的评分结果（GradeResult），出错时返回 None
+    correct_ratio: 正确答案的比例（0.0-1.0），共有 int(题目数 * correct_ratio) 道给出正确答案
+    key_file: 标准答案文件，提供后不再重新计算答案
+    seed: 随机数种子，为 None 时随机选取
+    workers: 进程数，结果与进程数无关
     """
     try:
-        # 读取题目文件
-        with open(exercise_file, 'r', encoding='utf-8') as f:
-            exercises = f.readlines()
-        
-        generator = MathExerciseGenerator(10)
-        test_answers = []
-        
-        total_questions = len(exercises)
-        correct_count = int(total_questions * correct_ratio)
-        
-        # 决定哪些题目给正确答案
-        correct_indices = set(random.sample(range(total_questions), correct_count))
-        
-        print(f"总题目数: {total_questions}")
+        if seed is None:
+            seed = random.randrange(2 ** 63)
+        total = count_lines(exercise_file)
+        correct_count = int(total * correct_ratio)
+
+        print(f"总题目数: {total}")
         print(f"正确答案数: {correct_count}")
-        print(f"错误答案数: {total_questions - correct_count}")
-        print(f"正确答案题号: {sorted(list(correct_indices))}")
-        
-        for i, exercise_line in enumerate(exercises):
-            exercise = exercise_line.strip()
-            
-            # 提取表达式部分
-            if '. ' in exercise:
-                expr_part = exercise.split('. ', 1)[1].replace(' =', '')
-            else:
-                expr_part = exercise.replace(' =', '')
-            
-            if i in correct_indices:
-                # 生成正确答案
-                try:
-                    correct_answer = evaluate_expression(expr_part)
-                    answer = generator.format_number(correct_answer)
-                except:
-                    answer = "0"
+        print(f"错误答案数: {total - correct_count}")
+
+        starts = list(range(0, total, chunk_lines))
+        sizes = [min(chunk_lines, total - start) for start in starts]
+        paths = [exercise_file] + ([key_file] if key_file else [])
+        offsets = [line_offsets(path, starts) for path in paths]
+        tasks = [(exercise_file, key_file, [path_offsets[i] for path_offsets in offsets],
+                  start, size, quota, seed)
+                 for i, (start, size, quota) in enumerate(zip(starts, sizes, _quotas(sizes, correct_count)))]
+
+        expected = GradeResult()
+        with open(output_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            if workers > 1 and len(tasks) > 1:
+                from multiprocessing import Pool
+                with Pool(workers) as pool:
+                    chunks = pool.imap(_synthesize_chunk, tasks)
+                    for text, chunk_expected in chunks:
+                        f.write(text)
+                        expected.extend(chunk_expected)
             else:
-                # 生成错误答案
-                try:
-                    # 先计算正确答案，然后生成一个不同的错误答案
-                    correct_answer = evaluate_expression(expr_part)
-                    correct_str = generator.format_number(correct_answer)
-                    
-                    # 生成错误答案，确保与正确答案不同
-                    for _ in range(10):  # 最多尝试10次
-                        wrong_answer = generate_random_answer(generator)
-                        if wrong_answer != correct_str and wrong_answer != "CORRECT_PLACEHOLDER":
-                            answer = wrong_answer
-                            break
-                    else:
-                        answer = "0"  # 如果都不行，就用0
-                except:
-                    answer = "0"
-            
-            test_answers.append(f"{i+1}. {answer}")
-        
-        # 保存测试答案文件
-        with open(output_file, 'w', encoding='utf-8') as f:
-            for answer in test_answers:
-                f.write(f"{answer}\n")
-        
+                for task in tasks:
+                    text, chunk_expected = _synthesize_chunk(task)
+                    f.write(text)
+                    expected.extend(chunk_expected)
+
         print(f"测试答案已保存到: {output_file}")
-        return correct_indices
-        
+        return expected
+
     except Exception as e:
         print(f"生成测试答案时出错: {e}")
-        return set()
+        return None
 
 def main():
     parser = argparse.ArgumentParser(description='测试答案生成器')
     parser.add_argument('-e', '--exercise', required=True, help='题目文件路径')
     parser.add_argument('-o', '--output', default='TestAnswers.txt', help='输出的测试答案文件')
     parser.add_argument('-r', '--ratio', type=float, default=0.6, help='正确答案比例 (0.0-1.0)')
-    
+    parser.add_argument('-k', '--key', help='标准答案文件路径（如 Answers.txt），提供后不再重新计算')
+    parser.add_argument('--seed', type=int, help='随机数种子，指定后结果可复现')
+    parser.add_argument('--workers', type=int, default=1, help='使用的进程数')
+
     args = parser.parse_args()
-    
+
     if not (0.0 <= args.ratio <= 1.0):
         print("错误: 正确答案比例必须在 0.0 到 1.0 之间")
         return
-    
+
     print(f"正在为 {args.exercise} 生成测试答案...")
     print(f"正确答案比例: {args.ratio}")
-    
-    correct_indices = generate_test_answers(args.exercise, args.output, args.ratio)
-    
-    if correct_indices:
+
+    expected = generate_test_answers(args.exercise, args.output, args.ratio, key_file=args.key,
+                                     seed=args.seed, workers=args.workers)
+
+    if expected is not None:
         print(f"成功生成测试答案文件: {args.output}")
         print("你现在可以使用以下命令检查答案:")
         print(f"py myapp_final.py -e {args.exercise} -a {args.output}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
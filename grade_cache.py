@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+持久化的批改结果缓存
+以规范化的 (题目, 答案, 标准答案) 文本的 64 位哈希为键保存是否答对，与题号无关：
+题目文件改动了几行、学生重新提交了部分答案时，未改动的行直接查表，只重新计算改动过的行
+缓存保存在 sqlite 中，每次打开算作一代，命中的条目记录最近一次使用的代数；
+条目数超过上限时先淘汰最久没有使用的条目
+"""
+
+import os
+import sqlite3
+from hashlib import blake2b
+from itertools import chain, islice, repeat
+
+from myapp_final import (GradeResult, MathExerciseGenerator, extract_answer, extract_expression,
+                         grade_line, normalize_key_line)
+from stats import timer
+
+# 默认的条目数上限（每个条目约 20 字节）
+MAX_ENTRIES = 10 ** 7
+
+# 每批查询、批改的行数
+CHUNK_LINES = 4096
+
+# 每条 SQL 语句的参数个数上限（旧版 sqlite 为 999）
+_SQL_PARAMS = 900
+
+
+def pair_key(exercise_line, answer_line, expected=None):
+    """
+    规范化的 (题目, 答案) 文本的 64 位有符号哈希，不含题号和多余的空白
+    expected 为规范化的标准答案（与标准答案比较），为 None 时表示重新计算答案；
+    批改方式和标准答案都计入哈希，换了标准答案文件不会误用以前的结果
+    """
+    expr = ' '.join(extract_expression(exercise_line).split())
+    answer = extract_answer(answer_line)
+    mode = 'compute' if expected is None else f"key\0{expected}"
+    digest = blake2b(f"{expr}\0{answer}\0{mode}".encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little', signed=True)
+
+
+class GradeCache:
+    """
+    批改结果缓存，首次使用时才打开数据库；用完后调用 close()（或用 with）写入并淘汰
+    hits、misses、evicted 为本次的命中、未命中和淘汰条目数
+    """
+
+    def __init__(self, path, max_entries=MAX_ENTRIES):
+        self.path = os.fspath(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._db = None
+        self._generation = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _open(self):
+        if self._db is not None:
+            return
+        db = sqlite3.connect(self.path)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("CREATE TABLE IF NOT EXISTS results "
+                   "(key INTEGER PRIMARY KEY, correct INTEGER NOT NULL, used INTEGER NOT NULL) "
+                   "WITHOUT ROWID")
+        db.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+        db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+        row = db.execute("SELECT value FROM meta WHERE name = 'generation'").fetchone()
+        self._generation = (row[0] if row else 0) + 1
+        with db:
+            db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('generation', ?)",
+                       (self._generation,))
+        self._db = db
+
+    def __len__(self):
+        self._open()
+        return self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def lookup(self, keys):
+        """查询一批键，返回 {键: 是否答对}（只含命中的键），并更新命中条目的使用代数"""
+        self._open()
+        db = self._db
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        with db:
+            for start in range(0, len(unique), _SQL_PARAMS):
+                part = unique[start:start + _SQL_PARAMS]
+                marks = ','.join('?' * len(part))
+                found.update(db.execute(f"SELECT key, correct FROM results WHERE key IN ({marks})",
+                                        part))
+                db.execute(f"UPDATE results SET used = ? WHERE key IN ({marks})",
+                           [self._generation] + part)
+        hits = sum(key in found for key in keys)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        return {key: bool(correct) for key, correct in found.items()}
+
+    def store(self, items):
+        """保存一批 (键, 是否答对)"""
+        if not items:
+            return
+        self._open()
+        generation = self._generation
+        with self._db:
+            self._db.executemany("INSERT OR REPLACE INTO results (key, correct, used) VALUES (?, ?, ?)",
+                                 ((key, int(correct), generation) for key, correct in items))
+
+    def evict(self):
+        """条目数超过上限时淘汰最久没有使用的条目，返回淘汰的条目数"""
+        self._open()
+        excess = len(self) - self.max_entries
+        if excess <= 0:
+            return 0
+        with self._db:
+            self._db.execute("DELETE FROM results WHERE key IN "
+                             "(SELECT key FROM results ORDER BY used LIMIT ?)", (excess,))
+        self.evicted += excess
+        return excess
+
+    def close(self):
+        if self._db is not None:
+            self.evict()
+            self._db.close()
+            self._db = None
+
+    def summary(self):
+        """本次的缓存统计"""
+        looked_up = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'evicted': self.evicted,
+                'hit_rate': self.hits / looked_up if looked_up else 0.0}
+
+
+def grade_lines_cached(exercise_lines, answer_lines, cache, key_lines=None, result=None,
+                       stats=None, chunk_size=CHUNK_LINES):
+    """
+    与 grade_lines 相同，但先按 (题目, 答案) 查询缓存，只批改未命中的行并写回缓存
+    提供 stats 时记录 grade 阶段耗时和缓存计数
+    """
+    generator = MathExerciseGenerator(10)
+    if key_lines is not None:
+        expected_answers = chain((normalize_key_line(line, generator) for line in key_lines), repeat(None))
+    else:
+        expected_answers = repeat(None)
+    if result is None:
+        result = GradeResult()
+    add = result.add
+    hits, misses = cache.hits, cache.misses
+
+    rows = zip(exercise_lines, answer_lines, expected_answers)
+    with timer(stats, 'grade'):
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            keys = [pair_key(exercise_line, answer_line, expected)
+                    for exercise_line, answer_line, expected in chunk]
+            known = cache.lookup(keys)
+            new = []
+            for key, (exercise_line, answer_line, expected) in zip(keys, chunk):
+                is_correct = known.get(key)
+                if is_correct is None:
+                    is_correct = grade_line(exercise_line, answer_line, expected, generator)
+                    known[key] = is_correct
+                    new.append((key, is_correct))
+                add(is_correct)
+            cache.store(new)
+
+    if stats is not None:
+        stats.merge({'cache_hits': cache.hits - hits, 'cache_misses': cache.misses - misses})
+    return result
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数值范围内的字面量表
+-r 确定后，generate_number 能产生的数（小于 r 的自然数、分母小于 r 的真分数）是有限的，
+预先为每个抽取结果保存约分后的 Rational 和渲染好的字符串，生成题目时只需抽取下标
+"""
+
+from array import array
+from functools import lru_cache
+from math import gcd
+
+from rational import Rational
+
+# 表项数不超过该值时一次性建表，否则每次抽取时直接构造
+EAGER_LIMIT = 1 << 18
+
+
+class LiteralTable:
+    """
+    字面量表
+    下标 0 .. r-2 为自然数 1 .. r-1；
+    之后按分母 d = 2 .. r-1、分子 n = 1 .. d-1 依次排列真分数 n/d（未约分的抽取结果）
+    """
+
+    def __init__(self, max_range, eager_limit=EAGER_LIMIT):
+        self.max_range = max_range
+        self.natural_count = max(max_range - 1, 0)
+        fraction_count = (max_range - 2) * (max_range - 1) // 2 if max_range > 2 else 0
+        self.size = self.natural_count + fraction_count
+        self.values = None
+        self.texts = None
+        self.numerators = None
+        self.denominators = None
+        if self.size <= eager_limit:
+            self._build()
+
+    def _build(self):
+        """一次性建表，相同的数共享同一个 Rational 和字符串"""
+        values = []
+        texts = []
+        numerators = array('q')
+        denominators = array('q')
+        shared = {}
+        pairs = [(k, 1) for k in range(1, self.natural_count + 1)]
+        for denominator in range(2, self.max_range):
+            for numerator in range(1, denominator):
+                g = gcd(numerator, denominator)
+                pairs.append((numerator // g, denominator // g))
+        for key in pairs:
+            if key not in shared:
+                shared[key] = (Rational._raw(*key), _render(*key))
+            value, text = shared[key]
+            values.append(value)
+            texts.append(text)
+            numerators.append(key[0])
+            denominators.append(key[1])
+        self.values = values
+        self.texts = texts
+        self.numerators = numerators
+        self.denominators = denominators
+
+    def _draw_pair(self, index):
+        """下标对应的约分后 (分子, 分母)"""
+        if index < self.natural_count:
+            return index + 1, 1
+        denominator, numerator = self._split(index - self.natural_count)
+        g = gcd(numerator, denominator)
+        return numerator // g, denominator // g
+
+    @staticmethod
+    def _split(offset):
+        """真分数部分的偏移量 -> (分母, 分子)"""
+        # 分母 d 之前共有 (d-2)(d-1)/2 个真分数
+        denominator = int(((8 * offset + 1) ** 0.5 + 3) / 2)
+        while (denominator - 2) * (denominator - 1) // 2 > offset:
+            denominator -= 1
+        while (denominator - 1) * denominator // 2 <= offset:
+            denominator += 1
+        numerator = offset - (denominator - 2) * (denominator - 1) // 2 + 1
+        return denominator, numerator
+
+    def fraction_index(self, numerator, denominator):
+        """真分数 numerator/denominator（未约分）的下标"""
+        return self.natural_count + (denominator - 2) * (denominator - 1) // 2 + numerator - 1
+
+    def draw(self, rng):
+        """按 generate_number 的分布抽取一个下标（范围小于 3 时没有真分数，只抽自然数）"""
+        if self.max_range < 3 or rng.choice([True, False]):
+            # 自然数
+            return rng.randint(1, self.max_range - 1) - 1
+        else:
+            # 真分数
+            denominator = rng.randint(2, self.max_range - 1)
+            numerator = rng.randint(1, denominator - 1)
+            return self.fraction_index(numerator, denominator)
+
+    def literal(self, index):
+        """返回下标对应的 (Rational, 字符串)"""
+        if self.values is not None:
+            return self.values[index], self.texts[index]
+        numerator, denominator = self._draw_pair(index)
+        return Rational._raw(numerator, denominator), _render(numerator, denominator)
+
+    def draw_literal(self, rng):
+        """按 generate_number 的分布抽取一个数，返回 (Rational, 字符串)"""
+        if self.values is not None:
+            index = self.draw(rng)
+            return self.values[index], self.texts[index]
+        # 范围太大未建表时直接构造
+        if self.max_range < 3 or rng.choice([True, False]):
+            numerator, denominator = rng.randint(1, self.max_range - 1), 1
+        else:
+            denominator = rng.randint(2, self.max_range - 1)
+            numerator = rng.randint(1, denominator - 1)
+            g = gcd(numerator, denominator)
+            numerator //= g
+            denominator //= g
+        return Rational._raw(numerator, denominator), _render(numerator, denominator)
+
+
+def _render(numerator, denominator):
+    """渲染约分后的自然数或真分数"""
+    if denominator == 1:
+        return str(numerator)
+    return f"{numerator}/{denominator}"
+
+
+@lru_cache(maxsize=32)
+def get_table(max_range):
+    """取得（必要时构建）指定范围的字面量表，同一范围只构建一次"""
+    return LiteralTable(max_range)
@@ -5,71 +5,123 @@
 """
 
 import argparse
+import os
 import random
 import sys
+import time
+from collections import Counter
 from fractions import Fraction
+from itertools import chain, islice, repeat
+
+from binfmt import BINARY, FLAT, LEFT, RIGHT, BinaryExercises, format_answer, is_binary, write_binary
+from dedup import DedupIndex, canonical_key, tree_key
+from exercise_batch import ExerciseBatch
+from expression import evaluate
+from literals import get_table
+from rational import Rational
+from stats import RunStats, timer
+
+PRECEDENCE = {'+': 1, '-': 1, '×': 2, '÷': 2}
+
+def render_structure(shape, op1, op2, texts):
+    """由题目结构渲染表达式"""
+    if shape == BINARY:
+        x, y = texts
+        return f"{x} {op1} {y}"
+    x, y, z = texts
+    if shape == FLAT:
+        return f"{x} {op1} {y} {op2} {z}"
+    if shape == LEFT:
+        return f"({x} {op1} {y}) {op2} {z}"
+    return f"{x} {op1} ({y} {op2} {z})"
+
+def structure_key(shape, op1, op2, operands):
+    """由题目结构直接计算查重指纹，与对渲染出的表达式调用 canonical_key 的结果相同"""
+    if shape == BINARY:
+        return tree_key((op1,) + operands)
+    x, y, z = operands
+    # 不加括号时按优先级、从左到右结合
+    if shape == LEFT or (shape == FLAT and PRECEDENCE[op1] >= PRECEDENCE[op2]):
+        return tree_key((op2, (op1, x, y), z))
+    return tree_key((op1, x, (op2, y, z)))
 
 class MathExerciseGenerator:
-    def __init__(self, max_range):
+    def __init__(self, max_range, rng=None, stats=None, index=None):
         self.max_range = max_range
-        self.generated = set()
+        # 随机数来源，默认使用全局 random 模块，可传入 random.Random(seed) 以便复现
+        self.rng = rng if rng is not None else random
+        # 可选的 RunStats，记录尝试、重复和失败次数
+        self.stats = stats
+        # 查重指纹集合，可传入 PersistentDedupIndex 使题目在多次运行之间也不重复
+        self.generated = index if index is not None else DedupIndex()
+        self._literals = None
+    
+    @property
+    def literals(self):
+        """当前范围的字面量表（首次使用时构建，同一范围共享）"""
+        if self._literals is None:
+            self._literals = get_table(self.max_range)
+        return self._literals
+    
+    def draw_literal(self):
+        """抽取一个数，返回 (Rational, 渲染后的字符串)"""
+        return self.literals.draw_literal(self.rng)
     
     def generate_number(self):
         """生成数字（自然数或真分数）"""
-        if random.choice([True, False]):
-            # 自然数
-            return random.randint(1, self.max_range - 1)
-        else:
-            # 真分数
-            denominator = random.randint(2, self.max_range - 1)
-            numerator = random.randint(1, denominator - 1)
-            return Fraction(numerator, denominator)
+        return self.draw_literal()[0]
     
     def format_number(self, num):
         """格式化数字输出"""
         if isinstance(num, int):
             return str(num)
-        elif isinstance(num, Fraction):
-            if num.denominator == 1:
-                return str(num.numerator)
-            elif num >= 1:
+        elif isinstance(num, (Rational, Fraction)):
+            numerator, denominator = num.numerator, num.denominator
+            if denominator == 1:
+                return str(numerator)
+            elif numerator >= denominator:
                 # 带分数
-                whole = num.numerator // num.denominator
-                remainder = num.numerator % num.denominator
-                if remainder == 0:
-                    return str(whole)
-                return f"{whole}'{remainder}/{num.denominator}"
+                whole, remainder = divmod(numerator, denominator)
+                return f"{whole}'{remainder}/{denominator}"
             else:
                 # 真分数
-                return f"{num.numerator}/{num.denominator}"
+                return f"{numerator}/{denominator}"
         else:
             return str(num)
     
     def generate_exercise(self):
         """生成一道题目"""
+        shape, op1, op2, _, texts, result = self.generate_structure()
+        return render_structure(shape, op1, op2, texts), result
+    
+    def generate_structure(self):
+        """
+        生成一道题目的结构：(形式, 运算符 1, 运算符 2, 操作数, 操作数文本, 结果)
+        形式与 binfmt 相同（BINARY、FLAT、LEFT、RIGHT），两个操作数的题目运算符 2 为 None
+        """
         operators = ['+', '-', '×', '÷']
-        op_count = random.randint(1, 3)
+        op_count = self.rng.randint(1, 3)
         
         # 生成简单的两数运算
         if op_count == 1:
-            num1 = self.generate_number()
-            num2 = self.generate_number()
-            op = random.choice(operators)
+            num1, s1 = self.draw_literal()
+            num2, s2 = self.draw_literal()
+            op = self.rng.choice(operators)
             
             # 确保减法不产生负数
             if op == '-':
-                if isinstance(num1, (int, Fraction)) and isinstance(num2, (int, Fraction)):
-                    if Fraction(num1) < Fraction(num2):
-                        num1, num2 = num2, num1
+                if num1 < num2:
+                    num1, num2 = num2, num1
+                    s1, s2 = s2, s1
             
             # 确保除法分母不为0
             if op == '÷' and num2 == 0:
-                num2 = 1
+                num2, s2 = Rational(1), '1'
             
-            expr = f"{self.format_number(num1)} {op} {self.format_number(num2)}"
+            structure = (BINARY, op, None, (num1, num2), (s1, s2))
             
             # 计算结果
-            f1, f2 = Fraction(num1), Fraction(num2)
+            f1, f2 = num1, num2
             if op == '+':
                 result = f1 + f2
             elif op == '-':
@@ -79,40 +131,41 @@ class MathExerciseGenerator:
             elif op == '÷':
                 result = f1 / f2
             
-            return expr, result
+            return structure + (result,)
         
         # 更复杂的表达式（支持括号）
         else:
-            num1 = self.generate_number()
-            num2 = self.generate_number()
-            num3 = self.generate_number()
+            num1, s1 = self.draw_literal()
+            num2, s2 = self.draw_literal()
+            num3, s3 = self.draw_literal()
             
-            op1 = random.choice(['+', '-', '×', '÷'])
-            op2 = random.choice(['+', '-', '×', '÷'])
+            op1 = self.rng.choice(['+', '-', '×', '÷'])
+            op2 = self.rng.choice(['+', '-', '×', '÷'])
             
-            f1, f2, f3 = Fraction(num1), Fraction(num2), Fraction(num3)
+            f1, f2, f3 = num1, num2, num3
             
             # 确保减法不产生负数和除法分母不为0
             if op1 == '-' and f1 < f2:
                 num1, num2 = num2, num1
+                s1, s2 = s2, s1
                 f1, f2 = f2, f1
             if op1 == '÷' and f2 == 0:
-                num2 = 1
-                f2 = Fraction(1)
+                num2, s2 = Rational(1), '1'
+                f2 = Rational(1)
             if op2 == '÷' and f3 == 0:
-                num3 = 1
-                f3 = Fraction(1)
+                num3, s3 = Rational(1), '1'
+                f3 = Rational(1)
             
             # 决定是否使用括号
-            use_parentheses = random.choice([True, False])
+            use_parentheses = self.rng.choice([True, False])
             
             if use_parentheses:
                 # 随机选择括号位置：(a op1 b) op2 c 或 a op1 (b op2 c)
-                parentheses_position = random.choice(['left', 'right'])
+                parentheses_position = self.rng.choice(['left', 'right'])
                 
                 if parentheses_position == 'left':
                     # (a op1 b) op2 c
-                    expr = f"({self.format_number(num1)} {op1} {self.format_number(num2)}) {op2} {self.format_number(num3)}"
+                    structure = (LEFT, op1, op2, (f1, f2, f3), (s1, s2, s3))
                     
                     # 计算括号内的结果
                     if op1 == '+':
@@ -132,7 +185,7 @@ class MathExerciseGenerator:
                         # 确保结果不为负数
                         if result < 0:
                             result = f3 - bracket_result
-                            expr = f"{self.format_number(num3)} - ({self.format_number(num1)} {op1} {self.format_number(num2)})"
+                            structure = (RIGHT, '-', op1, (f3, f1, f2), (s3, s1, s2))
                     elif op2 == '×':
                         result = bracket_result * f3
                     else:  # op2 == '÷'
@@ -140,7 +193,7 @@ class MathExerciseGenerator:
                 
                 else:  # parentheses_position == 'right'
                     # a op1 (b op2 c)
-                    expr = f"{self.format_number(num1)} {op1} ({self.format_number(num2)} {op2} {self.format_number(num3)})"
+                    structure = (RIGHT, op1, op2, (f1, f2, f3), (s1, s2, s3))
                     
                     # 计算括号内的结果
                     if op2 == '+':
@@ -150,7 +203,10 @@ class MathExerciseGenerator:
                         # 确保括号内不为负数
                         if bracket_result < 0:
                             bracket_result = f3 - f2
-                            expr = f"{self.format_number(num1)} {op1} ({self.format_number(num3)} - {self.format_number(num2)})"
+                            num2, num3 = num3, num2
+                            s2, s3 = s3, s2
+                            f2, f3 = f3, f2
+                            structure = (RIGHT, op1, '-', (f1, f2, f3), (s1, s2, s3))
                     elif op2 == '×':
                         bracket_result = f2 * f3
                     else:  # op2 == '÷'
@@ -164,7 +220,7 @@ class MathExerciseGenerator:
                         # 确保结果不为负数
                         if result < 0:
                             result = bracket_result - f1
-                            expr = f"({self.format_number(num2)} {op2} {self.format_number(num3)}) - {self.format_number(num1)}"
+                            structure = (LEFT, op2, '-', (f2, f3, f1), (s2, s3, s1))
                     elif op1 == '×':
                         result = f1 * bracket_result
                     else:  # op1 == '÷'
@@ -172,7 +228,7 @@ class MathExerciseGenerator:
             
             else:
                 # 不使用括号，按运算优先级计算
-                expr = f"{self.format_number(num1)} {op1} {self.format_number(num2)} {op2} {self.format_number(num3)}"
+                structure = (FLAT, op1, op2, (f1, f2, f3), (s1, s2, s3))
                 
                 # 检查运算优先级：乘除法优先于加减法
                 if op2 in ['×', '÷'] and op1 in ['+', '-']:
@@ -190,7 +246,7 @@ class MathExerciseGenerator:
                         # 确保结果不为负数
                         if result < 0:
                             result = temp - f1
-                            expr = f"{self.format_number(num2)} {op2} {self.format_number(num3)} - {self.format_number(num1)}"
+                            structure = (FLAT, op2, '-', (f2, f3, f1), (s2, s3, s1))
                 elif op1 in ['×', '÷'] and op2 in ['+', '-']:
                     # 先计算左边的乘除法
                     if op1 == '×':
@@ -206,7 +262,7 @@ class MathExerciseGenerator:
                         # 确保结果不为负数
                         if result < 0:
                             result = f3 - temp
-                            expr = f"{self.format_number(num3)} - {self.format_number(num1)} {op1} {self.format_number(num2)}"
+                            structure = (FLAT, '-', op1, (f3, f1, f2), (s3, s1, s2))
                 else:
                     # 按从左到右的顺序计算（同优先级）
                     if op1 == '+':
@@ -225,35 +281,193 @@ class MathExerciseGenerator:
                         # 确保结果不为负数
                         if result < 0:
                             result = f3 - temp
-                            result = abs(result)
+                            structure = (RIGHT, '-', op1, (f3, f1, f2), (s3, s1, s2))
                     elif op2 == '×':
                         result = temp * f3
                     else:  # op2 == '÷'
                         result = temp / f3
             
-            return expr, result
+            return structure + (result,)
     
-    def generate_exercises(self, count):
-        """生成指定数量的题目"""
-        exercises = []
+    def iter_exercises(self, count):
+        """逐个生成指定数量的题目（生成器），不保存题目列表"""
+        for _, expr, result in self.iter_keyed_exercises(count):
+            yield expr, result
+    
+    def iter_keyed_exercises(self, count):
+        """逐个生成题目，同时返回其查重指纹：(指纹, 表达式, 结果)"""
+        for key, (expr, result) in self._iter_unique(count, self._keyed_exercise):
+            yield key, expr, result
+    
+    def iter_keyed_structures(self, count):
+        """逐个生成题目结构（见 generate_structure），同时返回其查重指纹：(指纹, 结构)"""
+        return self._iter_unique(count, self._keyed_structure)
+    
+    def _keyed_exercise(self):
+        expr, result = self.generate_exercise()
+        # 按规范化指纹查重（考虑交换律和结合律）
+        return canonical_key(expr), (expr, result)
+    
+    def _keyed_structure(self):
+        structure = self.generate_structure()
+        return structure_key(*structure[:4]), structure
+    
+    def _iter_unique(self, count, keyed):
+        """
+        调用 keyed() 生成 (指纹, 题目) 直到得到 count 道不重复的题目（或用完尝试次数），
+        逐个产出 (指纹, 题目)，并记录尝试、重复和失败次数
+        """
+        produced = 0
         attempts = 0
+        duplicates = 0
+        failures = Counter()
         max_attempts = count * 10
         
-        while len(exercises) < count and attempts < max_attempts:
-            try:
-                expr, result = self.generate_exercise()
-                
-                # 简单的重复检查
-                if expr not in self.generated:
-                    self.generated.add(expr)
-                    exercises.append((expr, result))
+        try:
+            while produced < count and attempts < max_attempts:
+                try:
+                    key, item = keyed()
+                    is_new = self.generated.add(key)
+                except Exception as e:
+                    # 例如括号内结果为 0 又作为除数
+                    attempts += 1
+                    failures[type(e).__name__] += 1
+                    continue
                 
                 attempts += 1
-            except:
-                attempts += 1
-                continue
-        
-        return exercises
+                # yield 放在 try 之外，避免吞掉 GeneratorExit
+                if is_new:
+                    produced += 1
+                    yield key, item
+                else:
+                    duplicates += 1
+        finally:
+            if self.stats is not None:
+                self.stats.merge({'attempts': attempts, 'accepted': produced,
+                                  'duplicates': duplicates}, failures)
+    
+    def generate_exercises(self, count):
+        """生成指定数量的题目"""
+        return list(self.iter_exercises(count))
+    
+    def generate_batch(self, count):
+        """
+        生成指定数量的题目，按列存为 ExerciseBatch（占用内存远小于元组列表）
+        由 generate_structure 的运算符和操作数直接填充各列，查重指纹也由结构计算，
+        不渲染表达式、也不重新解析；题目与 generate_exercises 的结果相同
+        """
+        batch = ExerciseBatch()
+        batch.extend_structures(structure for _, structure in self.iter_keyed_structures(count))
+        return batch
+
+# 每个子任务生成的题目数，子任务越小内存占用越低
+SHARD_SIZE = 20000
+
+def _generate_shard(task):
+    """子进程任务：用独立的随机数流生成一批题目"""
+    max_range, count, seed, round_no, shard_no = task
+    rng = random.Random(f"{seed}:{round_no}:{shard_no}")
+    stats = RunStats()
+    generator = MathExerciseGenerator(max_range, rng=rng, stats=stats)
+    shard = list(generator.iter_keyed_exercises(count))
+    # 是否被接受由合并时的全局去重决定
+    del stats.counters['accepted']
+    return shard, stats.counters, stats.failures
+
+def generate_parallel(count, max_range, workers, seed=None, shard_size=SHARD_SIZE, stats=None,
+                      index=None):
+    """
+    多进程分片生成题目（生成器）
+    题目按子任务顺序合并，并经过全局指纹去重（index 为 None 时使用新的 DedupIndex）；
+    相同的 seed 与 shard_size 总能得到相同的题目序列，与进程数无关
+    """
+    from multiprocessing import Pool
+    
+    if seed is None:
+        seed = random.randrange(2 ** 63)
+    
+    index = index if index is not None else DedupIndex()
+    produced = 0
+    round_no = 0
+    # 与单进程相同的尝试预算
+    budget = count * 10
+    requested_total = 0
+    acceptance = 1.0
+    
+    with Pool(workers) as pool:
+        while produced < count and requested_total < budget:
+            # 按上一轮的去重通过率多申请一些，减少轮数
+            remaining = count - produced
+            requested = min(budget - requested_total, int(remaining / acceptance) + 1)
+            requested_total += requested
+            tasks = []
+            for shard_no, start in enumerate(range(0, requested, shard_size)):
+                shard_count = min(shard_size, requested - start)
+                tasks.append((max_range, shard_count, seed, round_no, shard_no))
+            
+            added = 0
+            for shard, counters, failures in pool.imap(_generate_shard, tasks):
+                if stats is not None:
+                    stats.merge(counters, failures)
+                for key, expr, result in shard:
+                    if produced >= count:
+                        if stats is not None:
+                            stats.count('discarded')
+                    elif index.add(key):
+                        produced += 1
+                        added += 1
+                        if stats is not None:
+                            stats.count('accepted')
+                        yield expr, result
+                    elif stats is not None:
+                        # 不同子任务之间的重复
+                        stats.count('duplicates')
+            
+            if added == 0:
+                break
+            acceptance = added / requested
+            round_no += 1
+
+def write_exercises(exercises, generator, exercise_file='Exercises.txt',
+                    answer_file='Answers.txt', chunk_size=4096, stats=None, start=1):
+    """
+    单遍写出题目和答案文件
+    exercises 可以是任意 (表达式, 结果) 迭代器或 ExerciseBatch，按块批量写入，返回写出的题目数；
+    题号从 start 开始；提供 stats 时分别统计生成、渲染和写入的耗时
+    """
+    if isinstance(exercises, ExerciseBatch):
+        return _write_batch(exercises, exercise_file, answer_file, chunk_size, start)
+    count = 0
+    buffer_size = 1 << 20
+    format_number = generator.format_number
+    exercises = iter(exercises)
+    with open(exercise_file, 'w', encoding='utf-8', buffering=buffer_size) as ef, \
+         open(answer_file, 'w', encoding='utf-8', buffering=buffer_size) as af:
+        while True:
+            with timer(stats, 'generate'):
+                chunk = list(islice(exercises, chunk_size))
+            if not chunk:
+                break
+            with timer(stats, 'render'):
+                exercise_chunk = [f"{i}. {expr} =\n" for i, (expr, _) in enumerate(chunk, count + start)]
+                answer_chunk = [f"{i}. {format_number(result)}\n"
+                                for i, (_, result) in enumerate(chunk, count + start)]
+            with timer(stats, 'write'):
+                ef.writelines(exercise_chunk)
+                af.writelines(answer_chunk)
+            count += len(chunk)
+    return count
+
+def _write_batch(batch, exercise_file, answer_file, chunk_size=4096, first=1):
+    """由 ExerciseBatch 的各列直接渲染题目和答案，不构造 Rational"""
+    buffer_size = 1 << 20
+    with open(exercise_file, 'w', encoding='utf-8', buffering=buffer_size) as ef, \
+         open(answer_file, 'w', encoding='utf-8', buffering=buffer_size) as af:
+        for start in range(0, len(batch), chunk_size):
+            chunk = batch[start:start + chunk_size]
+            ef.writelines(f"{i}. {expr} =\n" for i, expr in enumerate(chunk.expressions(), start + first))
+            af.writelines(f"{i}. {answer}\n" for i, answer in enumerate(chunk.answer_texts(), start + first))
+    return len(batch)
 
 def parse_fraction(s):
     """解析分数字符串"""
@@ -265,180 +479,447 @@ def parse_fraction(s):
         frac_part = parts[1].split("/")
         numerator = int(frac_part[0])
         denominator = int(frac_part[1])
-        return Fraction(whole * denominator + numerator, denominator)
+        return Rational(whole * denominator + numerator, denominator)
     elif "/" in s:
         # 真分数格式 3/5
         parts = s.split("/")
-        return Fraction(int(parts[0]), int(parts[1]))
+        return Rational(int(parts[0]), int(parts[1]))
     else:
         # 自然数
-        return Fraction(int(s))
+        return Rational(int(s))
 
 def evaluate_expression(expr):
-    """计算表达式的值，支持括号"""
-    expr = expr.strip()
+    """计算表达式的值，支持括号和任意个数的运算符"""
+    return evaluate(expr)
+
+def extract_expression(line):
+    """从题目行（如 "1. 1 + 2 =")中提取表达式"""
+    exercise = line.strip()
+    if '. ' in exercise:
+        exercise = exercise.split('. ', 1)[1]
+    return exercise.replace(' =', '')
+
+def extract_answer(line):
+    """从答案行（如 "1. 3")中提取答案"""
+    answer = line.strip()
+    if '. ' in answer:
+        answer = answer.split('. ', 1)[1]
+    return answer.strip()
+
+def normalize_key_line(line, generator):
+    """规范化标准答案文件中的一行，无法解析时返回 None"""
+    try:
+        return generator.format_number(parse_fraction(extract_answer(line)))
+    except (ValueError, ZeroDivisionError, IndexError):
+        return None
+
+def count_lines(path, block_size=1 << 20):
+    """按块统计文件行数（不解码），最后一行没有换行符时也计入，与逐行读取的行数一致"""
+    count = 0
+    last = b'\n'
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            count += block.count(b'\n')
+            last = block[-1:]
+    return count + (last != b'\n')
+
+def spot_check_key(exercise_file, key_file, count):
+    """均匀抽查 count 道题目，重新计算并与标准答案比较，全部一致返回 True"""
+    generator = MathExerciseGenerator(10)
+    total = count_lines(exercise_file)
+    step = max(1, total // count) if count > 0 else total + 1
+    with open(exercise_file, 'r', encoding='utf-8') as ef, \
+         open(key_file, 'r', encoding='utf-8') as kf:
+        for i, (exercise_line, key_line) in enumerate(zip(ef, kf)):
+            if i % step:
+                continue
+            try:
+                expected = generator.format_number(evaluate_expression(extract_expression(exercise_line)))
+            except (ValueError, ZeroDivisionError):
+                expected = None
+            if normalize_key_line(key_line, generator) != expected:
+                return False
+    return True
+
+def grade_line(exercise_line, answer_line, expected, generator):
+    """
+    批改一道题目，答对返回 True
+    expected 为规范化的标准答案，为 None 时重新计算
+    """
+    try:
+        if expected is None:
+            expected = generator.format_number(evaluate_expression(extract_expression(exercise_line)))
+        return extract_answer(answer_line) == expected
+    except Exception:
+        return False
+
+def _grade_lines_timed(lines, generator, result, stats):
+    """
+    逐行批改并分阶段计时：读取和解析（parse）、计算标准答案（evaluate）、比较（grade）
+    批改失败的行按异常类型计数
+    """
+    clock = time.perf_counter
+    parse = evaluate = grade = 0.0
+    lines = iter(lines)
+    while True:
+        start = clock()
+        try:
+            exercise_line, answer_line, expected = next(lines)
+        except StopIteration:
+            break
+        parsed = evaluated = None
+        try:
+            expr = extract_expression(exercise_line)
+            answer = extract_answer(answer_line)
+            parsed = clock()
+            if expected is None:
+                expected = generator.format_number(evaluate_expression(expr))
+            evaluated = clock()
+            is_correct = answer == expected
+        except Exception as e:
+            stats.failure(e)
+            is_correct = False
+        result.add(is_correct)
+        end = clock()
+        parsed = parsed or end
+        evaluated = evaluated or end
+        parse += parsed - start
+        evaluate += evaluated - parsed
+        grade += end - evaluated
+    stats.phases['parse'] += parse
+    stats.phases['evaluate'] += evaluate
+    stats.phases['grade'] += grade
+
+class GradeResult:
+    """
+    评分结果
+    只保存计数和每题一位的位图（第 i 位为 1 表示第 i+1 题答对）
+    """
     
-    # 替换运算符
-    expr = expr.replace('×', '*').replace('÷', '/')
+    def __init__(self):
+        self.total = 0
+        self.correct_count = 0
+        self.bits = bytearray()
     
-    # 处理括号
-    if '(' in expr and ')' in expr:
-        return evaluate_with_parentheses(expr)
-    else:
-        return evaluate_without_parentheses(expr)
-
-def evaluate_with_parentheses(expr):
-    """处理带括号的表达式"""
-    # 找到括号的位置
-    start = expr.find('(')
-    end = expr.find(')')
+    @property
+    def wrong_count(self):
+        return self.total - self.correct_count
+    
+    def add(self, is_correct):
+        """记录下一题的批改结果"""
+        i = self.total
+        if i & 7 == 0:
+            self.bits.append(0)
+        if is_correct:
+            self.bits[i >> 3] |= 1 << (i & 7)
+            self.correct_count += 1
+        self.total = i + 1
+    
+    def extend(self, other):
+        """在末尾追加另一份评分结果（题号顺延）"""
+        if self.total & 7 == 0:
+            self.bits += other.bits
+            self.total += other.total
+            self.correct_count += other.correct_count
+        else:
+            for is_correct in other:
+                self.add(is_correct)
+    
+    def __iter__(self):
+        """按题号顺序产出每题是否答对"""
+        bits = self.bits
+        for i in range(self.total):
+            yield bool(bits[i >> 3] & (1 << (i & 7)))
     
-    if start == -1 or end == -1:
-        return evaluate_without_parentheses(expr)
+    def iter_numbers(self, correct=True):
+        """产出答对（或答错）的题号"""
+        for i, is_correct in enumerate(self, 1):
+            if is_correct == correct:
+                yield i
     
-    # 提取括号内的表达式
-    bracket_expr = expr[start+1:end]
-    bracket_result = evaluate_without_parentheses(bracket_expr)
+    def __getitem__(self, name):
+        """兼容旧接口：result['correct'] / result['wrong'] 返回题号列表"""
+        if name == 'correct':
+            return list(self.iter_numbers(True))
+        if name == 'wrong':
+            return list(self.iter_numbers(False))
+        raise KeyError(name)
     
-    # 构造新的表达式，用括号的结果替换括号部分
-    # 需要处理分数格式
+    def __eq__(self, other):
+        if not isinstance(other, GradeResult):
+            return NotImplemented
+        return self.total == other.total and self.bits == other.bits
+    
+    @classmethod
+    def from_dict(cls, result):
+        """由 {'correct': [...], 'wrong': [...]} 构造"""
+        correct = set(result['correct'])
+        total = max(correct | set(result['wrong']), default=0)
+        grade = cls()
+        for i in range(1, total + 1):
+            grade.add(i in correct)
+        return grade
+
+def grade_lines(exercise_lines, answer_lines, key_lines=None, result=None, stats=None):
+    """
+    批改题目行与答案行（打开的文件、字符串列表等任意可迭代对象），返回 GradeResult
+    提供标准答案行 key_lines 时直接与其比较，无法解析的行和多出的题目回退为计算；
+    result 为已有的 GradeResult 时在其后追加
+    """
     generator = MathExerciseGenerator(10)
-    bracket_result_str = generator.format_number(bracket_result)
-    
-    new_expr = expr[:start] + bracket_result_str + expr[end+1:]
-    
-    # 递归计算剩余表达式
-    return evaluate_without_parentheses(new_expr.strip())
-
-def evaluate_without_parentheses(expr):
-    """处理不带括号的表达式"""
-    expr = expr.strip()
-    tokens = expr.split()
-    
-    if len(tokens) == 1:
-        # 单个数字
-        return parse_fraction(tokens[0])
-    elif len(tokens) == 3:
-        # 简单的二元运算
-        left = parse_fraction(tokens[0])
-        op = tokens[1]
-        right = parse_fraction(tokens[2])
+    if key_lines is not None:
+        expected_answers = chain((normalize_key_line(line, generator) for line in key_lines), repeat(None))
+    else:
+        expected_answers = repeat(None)
+    if result is None:
+        result = GradeResult()
+    
+    if stats is None:
+        for exercise_line, answer_line, expected in zip(exercise_lines, answer_lines, expected_answers):
+            result.add(grade_line(exercise_line, answer_line, expected, generator))
+    else:
+        _grade_lines_timed(zip(exercise_lines, answer_lines, expected_answers), generator, result, stats)
+    return result
+
+def grade_batch(batch, answer_lines, result=None):
+    """按 ExerciseBatch 中的答案列批改答案行，不解析、不计算题目"""
+    if result is None:
+        result = GradeResult()
+    add = result.add
+    for answer, answer_line in zip(batch.answer_texts(), answer_lines):
+        add(answer != '' and extract_answer(answer_line) == answer)
+    return result
+
+def check_answers(exercise_file, answer_file, key_file=None, spot_check=0, stats=None, cache=None):
+    """
+    检查答案正确性
+    逐行读取题目、答案（和标准答案）文件，内存中只保留计数和位图；
+    exercise_file 也可以是已在内存中的 ExerciseBatch；
+    提供标准答案文件 key_file 时直接与其比较，不再重新计算；
+    标准答案文件不存在、某行无法解析或抽查（spot_check 道）不一致时回退为计算；
+    提供 cache（GradeCache）时未改动的 (题目, 答案) 直接查缓存，只批改其余的行；
+    提供 stats 时记录各阶段耗时和批改计数
+    """
+    result = GradeResult()
+    key = None
+    try:
+        if isinstance(exercise_file, ExerciseBatch):
+            with open(answer_file, 'r', encoding='utf-8') as af:
+                return grade_batch(exercise_file, af, result)
+        if is_binary(exercise_file):
+            return check_answers_binary(exercise_file, answer_file, stats)
+        
+        # 打开标准答案
+        if key_file:
+            try:
+                key = open(key_file, 'r', encoding='utf-8')
+            except OSError:
+                print(f"标准答案文件 {key_file} 无法读取，改为重新计算答案")
+            if key and spot_check and not spot_check_key(exercise_file, key_file, spot_check):
+                print("抽查结果与标准答案不一致，改为重新计算答案")
+                key.close()
+                key = None
         
-        if op == '+':
-            return left + right
-        elif op == '-':
-            return left - right
-        elif op == '*':
-            return left * right
-        elif op == '/':
-            return left / right
-    
-    elif len(tokens) == 5:
-        # 三元运算（考虑运算优先级）
-        left = parse_fraction(tokens[0])
-        op1 = tokens[1]
-        middle = parse_fraction(tokens[2])
-        op2 = tokens[3]
-        right = parse_fraction(tokens[4])
+        with open(exercise_file, 'r', encoding='utf-8') as ef, \
+             open(answer_file, 'r', encoding='utf-8') as af:
+            if cache is not None:
+                from grade_cache import grade_lines_cached
+                grade_lines_cached(ef, af, cache, key, result, stats)
+            else:
+                grade_lines(ef, af, key, result, stats)
+            if stats is not None:
+                stats.merge({'graded': result.total, 'correct': result.correct_count,
+                             'wrong': result.wrong_count, 'key_used': int(key is not None)})
         
-        # 检查运算优先级：乘除法优先于加减法
-        if op2 in ['*', '/'] and op1 in ['+', '-']:
-            # 先计算右边的乘除法
-            if op2 == '*':
-                temp = middle * right
-            else:  # op2 == '/'
-                temp = middle / right
-            
-            # 再计算左边的加减法
-            if op1 == '+':
-                return left + temp
-            else:  # op1 == '-'
-                return left - temp
+        return result
+    
+    except Exception as e:
+        print(f"检查答案时出错：{e}")
+        return GradeResult()
+    
+    finally:
+        if key:
+            key.close()
+
+def check_answers_binary(exercise_file, answer_file, stats=None):
+    """
+    批改二进制题目文件
+    标准答案直接取自记录，不解析题目文本、不重新计算；
+    答案文件可以是文本格式，也可以是二进制格式（此时直接比较分子分母）
+    """
+    result = GradeResult()
+    add = result.add
+    with timer(stats, 'grade'), BinaryExercises(exercise_file) as exercises:
+        if is_binary(answer_file):
+            with BinaryExercises(answer_file) as answers:
+                for record, submitted in zip(exercises.records(), answers.records()):
+                    add(record[11] != 0 and record[10:] == submitted[10:])
         else:
-            # 按从左到右的顺序计算
-            if op1 == '+':
-                temp = left + middle
-            elif op1 == '-':
-                temp = left - middle
-            elif op1 == '*':
-                temp = left * middle
-            elif op1 == '/':
-                temp = left / middle
-            
-            # 再计算右边
-            if op2 == '+':
-                return temp + right
-            elif op2 == '-':
-                return temp - right
-            elif op2 == '*':
-                return temp * right
-            elif op2 == '/':
-                return temp / right
-    
-    return Fraction(0)
-
-def check_answers(exercise_file, answer_file):
-    """检查答案正确性"""
+            with open(answer_file, 'r', encoding='utf-8') as af:
+                for record, answer_line in zip(exercises.records(), af):
+                    numerator, denominator = record[10:]
+                    add(denominator != 0 and
+                        extract_answer(answer_line) == format_answer(numerator, denominator))
+    if stats is not None:
+        stats.merge({'graded': result.total, 'correct': result.correct_count,
+                     'wrong': result.wrong_count, 'key_used': 1})
+    return result
+
+def line_offsets(path, line_numbers, block_size=1 << 20):
+    """
+    按块扫描文件，返回各行号（从 0 开始）所在行的起始字节偏移
+    超出文件末尾的行号对应文件大小
+    """
+    wanted = sorted(set(line_numbers))
+    offsets = {}
+    i = 0
+    line = 0
+    line_start = 0
+    block_start = 0
+    with open(path, 'rb') as f:
+        while i < len(wanted):
+            while i < len(wanted) and wanted[i] == line:
+                offsets[line] = line_start
+                i += 1
+            if i == len(wanted):
+                break
+            block = f.read(block_size)
+            if not block:
+                break
+            newlines = block.count(b'\n')
+            if line + newlines < wanted[i]:
+                # 目标行不在本块中
+                if newlines:
+                    line += newlines
+                    line_start = block_start + block.rfind(b'\n') + 1
+                block_start += len(block)
+                continue
+            pos = 0
+            while i < len(wanted):
+                pos = block.find(b'\n', pos) + 1
+                if pos == 0:
+                    break
+                line += 1
+                line_start = block_start + pos
+                while i < len(wanted) and wanted[i] == line:
+                    offsets[line] = line_start
+                    i += 1
+            block_start += len(block)
+    for number in wanted[i:]:
+        offsets[number] = block_start
+    return [offsets[number] for number in line_numbers]
+
+def read_lines(path, offset, count):
+    """从字节偏移 offset 开始读取至多 count 行（count 为 None 时读到文件末尾）"""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        lines = f if count is None else islice(f, count)
+        for line in lines:
+            yield line.decode('utf-8')
+
+def _grade_chunk(task):
+    """子进程任务：批改一段对齐的行，返回 GradeResult"""
+    exercise_file, answer_file, key_file, offsets, count = task
+    exercises = read_lines(exercise_file, offsets[0], count)
+    answers = read_lines(answer_file, offsets[1], count)
+    key_lines = read_lines(key_file, offsets[2], count) if key_file else None
+    return grade_lines(exercises, answers, key_lines)
+
+def check_answers_parallel(exercise_file, answer_file, workers, key_file=None, spot_check=0,
+                           chunks_per_worker=4, stats=None, cache=None):
+    """
+    多进程检查答案
+    按行号把题目、答案（和标准答案）文件切分为对齐的字节区间，
+    各进程批改一段，再按顺序合并，题号与单进程完全一致；
+    提供 stats 时整个批改过程计入 grade 阶段
+    """
+    from multiprocessing import Pool
+    
+    if is_binary(exercise_file):
+        # 二进制文件不需要解析，单进程批改即可
+        return check_answers(exercise_file, answer_file, stats=stats)
+    if cache is not None:
+        # 缓存只在单进程中读写
+        return check_answers(exercise_file, answer_file, key_file, spot_check, stats, cache)
+    
     try:
-        # 读取题目
-        with open(exercise_file, 'r', encoding='utf-8') as f:
-            exercises = f.readlines()
-        
-        # 读取用户答案
-        with open(answer_file, 'r', encoding='utf-8') as f:
-            user_answers = f.readlines()
+        if key_file:
+            try:
+                with open(key_file, 'rb'):
+                    pass
+            except OSError:
+                print(f"标准答案文件 {key_file} 无法读取，改为重新计算答案")
+                key_file = None
+            if key_file and spot_check and not spot_check_key(exercise_file, key_file, spot_check):
+                print("抽查结果与标准答案不一致，改为重新计算答案")
+                key_file = None
         
-        correct = []
-        wrong = []
+        # 每段的行数取 8 的倍数，合并位图时无需移位
+        total = count_lines(exercise_file)
+        chunk_count = max(1, workers * chunks_per_worker)
+        chunk_lines = max(8, -(-total // chunk_count))
+        chunk_lines = -(-chunk_lines // 8) * 8
+        starts = list(range(0, max(total, 1), chunk_lines))
         
-        for i, (exercise_line, answer_line) in enumerate(zip(exercises, user_answers), 1):
-            # 解析题目
-            exercise = exercise_line.strip()
-            user_answer = answer_line.strip()
-            
-            # 提取表达式部分
-            if '. ' in exercise:
-                expr_part = exercise.split('. ', 1)[1].replace(' =', '')
-            else:
-                expr_part = exercise.replace(' =', '')
-            
-            # 提取用户答案
-            if '. ' in user_answer:
-                answer_part = user_answer.split('. ', 1)[1]
-            else:
-                answer_part = user_answer
-            
-            try:
-                # 计算正确答案
-                correct_answer = evaluate_expression(expr_part)
-                generator = MathExerciseGenerator(10)
-                correct_answer_str = generator.format_number(correct_answer)
-                
-                # 比较答案
-                if answer_part.strip() == correct_answer_str:
-                    correct.append(i)
-                else:
-                    wrong.append(i)
-            except:
-                wrong.append(i)
+        paths = [exercise_file, answer_file] + ([key_file] if key_file else [])
+        offsets = [line_offsets(path, starts) for path in paths]
+        tasks = []
+        for i in range(len(starts)):
+            # 最后一段读到文件末尾，包括没有换行符结尾的最后一行
+            count = chunk_lines if i + 1 < len(starts) else None
+            tasks.append((exercise_file, answer_file, key_file,
+                          [path_offsets[i] for path_offsets in offsets], count))
         
-        return {'correct': correct, 'wrong': wrong}
+        result = GradeResult()
+        with timer(stats, 'grade'), Pool(workers) as pool:
+            for chunk in pool.imap(_grade_chunk, tasks):
+                result.extend(chunk)
+                if chunk.total < chunk_lines:
+                    # 某个文件提前结束，与逐行 zip 的行为保持一致
+                    break
+        if stats is not None:
+            stats.merge({'graded': result.total, 'correct': result.correct_count,
+                         'wrong': result.wrong_count, 'key_used': int(key_file is not None)})
+        return result
     
     except Exception as e:
         print(f"检查答案时出错：{e}")
-        return {'correct': [], 'wrong': []}
+        return GradeResult()
+
+def _write_numbers(f, numbers, chunk_size=4096):
+    """分块写出以逗号分隔的题号"""
+    chunk = []
+    first = True
+    for number in numbers:
+        chunk.append(str(number))
+        if len(chunk) >= chunk_size:
+            f.write(('' if first else ', ') + ', '.join(chunk))
+            chunk.clear()
+            first = False
+    if chunk:
+        f.write(('' if first else ', ') + ', '.join(chunk))
 
 def save_grade(result, grade_file='Grade.txt'):
-    """保存评分结果"""
+    """保存评分结果，题号分块写出"""
+    if isinstance(result, dict):
+        result = GradeResult.from_dict(result)
     with open(grade_file, 'w', encoding='utf-8') as f:
-        correct_count = len(result['correct'])
-        wrong_count = len(result['wrong'])
-        
-        correct_nums = ', '.join(map(str, result['correct'])) if result['correct'] else ''
-        wrong_nums = ', '.join(map(str, result['wrong'])) if result['wrong'] else ''
-        
-        f.write(f"Correct: {correct_count} ({correct_nums})\n")
-        f.write(f"Wrong: {wrong_count} ({wrong_nums})\n")
+        f.write(f"Correct: {result.correct_count} (")
+        _write_numbers(f, result.iter_numbers(True))
+        f.write(")\n")
+        f.write(f"Wrong: {result.wrong_count} (")
+        _write_numbers(f, result.iter_numbers(False))
+        f.write(")\n")
+
+def _parse_slice(text):
+    """解析 --slice 的 A:B（题号从 1 开始，含两端）"""
+    try:
+        first, last = (int(part) for part in text.split(':'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的题号区间：{text}，应为 A:B") from None
+    if not 1 <= first <= last:
+        raise argparse.ArgumentTypeError(f"无效的题号区间：{text}，应满足 1 <= A <= B")
+    return first, last
 
 def main():
     parser = argparse.ArgumentParser(description='小学四则运算题目生成器')
@@ -446,14 +927,226 @@ def main():
     # 生成题目参数
     parser.add_argument('-n', type=int, help='生成题目的个数')
     parser.add_argument('-r', type=int, help='数值范围（必须指定）')
+    parser.add_argument('--workers', type=int, default=1, help='生成题目或检查答案使用的进程数')
+    parser.add_argument('--seed', type=int, help='随机数种子，指定后结果可复现')
+    parser.add_argument('--engine', choices=['python', 'numpy'], default='python',
+                        help='生成引擎：逐题生成或基于 NumPy 的批量生成')
+    parser.add_argument('--exact', action='store_true',
+                        help='枚举全部不同的题目后不放回抽样，题目不足时直接报告上限')
+    parser.add_argument('--format', choices=['text', 'binary'], default='text',
+                        help='输出格式：文本（Exercises.txt、Answers.txt）或二进制（Exercises.bin，含答案）')
+    
+    parser.add_argument('--counter', action='store_true',
+                        help='计数器模式：第 k 道题目只由种子、范围和 k 决定，可以按题号单独重新生成；'
+                             '与 --exact 同时使用时题目互不重复')
+    parser.add_argument('--slice', type=_parse_slice, metavar='A:B',
+                        help='计数器模式下只生成题号 A 到 B（含）的题目，题号与完整生成时相同')
+    parser.add_argument('--manifest', metavar='FILE',
+                        help='批量生成练习卷：清单文件（JSON 或 JSON Lines），见 bulk.py')
+    parser.add_argument('--output', default='worksheets',
+                        help='批量生成时的输出目录，以 .zip 结尾时写入 zip 文件')
+    parser.add_argument('--unique', action='store_true',
+                        help='批量生成时同一范围的练习卷之间也不出现重复的题目')
+    parser.add_argument('--integer-answers', action='store_true', help='只生成答案为整数的题目')
+    parser.add_argument('--max-answer', type=str, help='答案上限（可以是分数，如 5/2）')
+    parser.add_argument('--max-denominator', type=int, help='答案分母的上限')
+    parser.add_argument('--operators', type=str, help='可用的运算符，如 "+-" 或 "×÷"')
+    parser.add_argument('--dedup-store', metavar='FILE',
+                        help='持久保存查重指纹的数据库文件，多次运行生成的题目互不重复')
+    parser.add_argument('--bloom-capacity', type=int, default=10 ** 7,
+                        help='查重指纹 Bloom 过滤器的容量，0 表示不使用过滤器')
+    parser.add_argument('--bank', metavar='FILE',
+                        help='题库文件：与 -n、-r 同时使用时把生成的题目加入题库，见 problem_bank.py')
+    parser.add_argument('--from-bank', action='store_true',
+                        help='从题库中按条件取 -n 道题目组卷（-r 为数值范围上限），不重新生成')
+    parser.add_argument('--mix', metavar='SPEC',
+                        help='从题库组卷时按运算符分组取题，如 "+-:10,×÷:10"（代替 -n）')
+    parser.add_argument('--for-class', metavar='NAME',
+                        help='从题库组卷时只取该班级没用过的题目，并记为已用')
     
     # 检查答案参数
     parser.add_argument('-e', type=str, help='题目文件路径')
     parser.add_argument('-a', type=str, help='答案文件路径')
+    parser.add_argument('-k', type=str, help='标准答案文件路径（如 Answers.txt），提供后不再重新计算')
+    parser.add_argument('--spot-check', type=int, default=0,
+                        help='使用标准答案时抽查的题目数，不一致则回退为重新计算')
+    parser.add_argument('--cache', metavar='FILE',
+                        help='批改结果缓存文件，未改动的题目和答案直接查表')
+    parser.add_argument('--cache-size', type=int, default=10 ** 7,
+                        help='批改结果缓存的条目数上限，超出时淘汰最久没有使用的条目')
+    parser.add_argument('--class', dest='class_answers', metavar='DIR_OR_GLOB',
+                        help='按班级批改：答案文件所在目录或通配符（如 "answers/*.txt"），与 -e 一起使用')
+    parser.add_argument('--grade-dir', default='Grades',
+                        help='按班级批改时成绩文件和汇总报告的输出目录')
+    
+    # 统计与性能分析参数
+    parser.add_argument('--stats', nargs='?', const='-', metavar='FILE',
+                        help='输出各阶段耗时和计数（JSON），不指定文件时输出到标准错误')
+    parser.add_argument('--profile', metavar='FILE', help='用 cProfile 分析本次运行并保存到文件')
     
     args = parser.parse_args()
+    stats = RunStats() if args.stats else None
     
-    if args.n is not None:
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        status = run(args, parser, stats)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+    
+    if stats is not None:
+        stats.dump(args.stats)
+    if status:
+        sys.exit(status)
+
+def _generate_and_write(args, stats, index):
+    """按命令行参数生成题目并写出文件，返回题目数，参数有误时返回 None"""
+    rng = random.Random(args.seed) if args.seed is not None else None
+    generator = MathExerciseGenerator(args.r, rng=rng, stats=stats, index=index)
+    constrained = (args.integer_answers or args.max_answer is not None or
+                   args.max_denominator is not None or args.operators is not None)
+    if args.counter:
+        from counter_rng import iter_counter_exercises
+        if constrained or index is not None or args.engine == 'numpy':
+            print("错误：计数器模式不能与 --dedup-store、--engine numpy 或约束条件同时使用")
+            return None
+        first, last = args.slice or (1, args.n)
+        if not args.exact:
+            print("提示：计数器模式下各题独立生成，可能有重复；加 --exact 时题目互不重复，但在题目空间中均匀抽取")
+        try:
+            exercises = iter_counter_exercises(first - 1, last, args.r, args.seed, args.workers,
+                                               distinct=args.exact)
+        except ValueError as e:
+            print(f"错误：{e}")
+            return None
+        if args.format == 'binary':
+            with timer(stats, 'write'):
+                return write_binary(exercises, 'Exercises.bin', args.r)
+        return write_exercises(exercises, generator, stats=stats, start=first)
+    if constrained:
+        from constraints import ConstrainedGenerator, Constraints
+        if args.exact or args.engine == 'numpy' or args.workers > 1:
+            print("错误：约束条件只能用于单进程的 python 引擎，不能与 --exact 同时使用")
+            return None
+        try:
+            max_answer = parse_fraction(args.max_answer) if args.max_answer is not None else None
+            constraints = Constraints(args.integer_answers, max_answer, args.max_denominator,
+                                      args.operators)
+            constrained_generator = ConstrainedGenerator(args.r, constraints, rng=generator.rng,
+                                                         index=index)
+        except (ValueError, ZeroDivisionError) as e:
+            print(f"错误：{e}")
+            return None
+        if constrained_generator.filter is not None:
+            print(f"提示：数值范围 {args.r} 或满足约束的答案过多，改为随机生成后筛选，题目可能不足",
+                  file=sys.stderr)
+        exercises = constrained_generator.iter_exercises(args.n)
+    elif args.exact:
+        from problem_space import ProblemSpace
+        try:
+            exercises = ProblemSpace(args.r).sample(args.n, generator.rng)
+        except ValueError as e:
+            print(f"错误：{e}")
+            return None
+    elif args.engine == 'numpy':
+        from vectorized import iter_vectorized
+        exercises = iter_vectorized(args.n, args.r, seed=args.seed, index=index)
+    elif args.workers > 1:
+        exercises = generate_parallel(args.n, args.r, args.workers, args.seed, stats=stats,
+                                      index=index)
+    else:
+        exercises = generator.iter_exercises(args.n)
+    if args.format == 'binary':
+        with timer(stats, 'write'):
+            count = write_binary(exercises, 'Exercises.bin', args.r)
+    else:
+        count = write_exercises(exercises, generator, stats=stats)
+    if stats is not None and 'accepted' not in stats.counters:
+        # 精确抽样和批量引擎不经过逐题去重
+        stats.count('accepted', count)
+    return count
+
+def _run_bank(args, stats):
+    """把生成的题目加入题库，或从题库中按条件取题写出题目和答案文件"""
+    from problem_bank import ProblemBank, parse_mix
+    rng = random.Random(args.seed) if args.seed is not None else None
+    with ProblemBank(args.bank) as bank:
+        if not args.from_bank:
+            if args.n is None or args.r is None or args.r < 1:
+                print("错误：向题库添加题目时必须指定 -n 和 -r")
+                return
+            print(f"正在生成 {args.n} 道题目并加入题库 {args.bank}...")
+            with timer(stats, 'generate'):
+                added = bank.fill(args.n, args.r, rng=rng, stats=stats)
+            print(f"新增 {added} 道题目，题库中共有 {len(bank)} 道题目")
+            return
+        
+        try:
+            mix = parse_mix(args.mix) if args.mix else args.n
+            constraints = None
+            if (args.integer_answers or args.max_answer is not None or
+                    args.max_denominator is not None or args.operators is not None):
+                from constraints import Constraints
+                max_answer = parse_fraction(args.max_answer) if args.max_answer is not None else None
+                constraints = Constraints(args.integer_answers, max_answer, args.max_denominator,
+                                          args.operators)
+        except (ValueError, ZeroDivisionError) as e:
+            print(f"错误：{e}")
+            return
+        if mix is None:
+            print("错误：从题库组卷时必须指定 -n 或 --mix")
+            return
+        requested = sum(mix.values()) if isinstance(mix, dict) else mix
+        print(f"正在从题库 {args.bank} 中取 {requested} 道题目...")
+        with timer(stats, 'generate'):
+            exercises = bank.assemble(mix, class_name=args.for_class, rng=rng,
+                                      constraints=constraints, max_range=args.r)
+    count = write_exercises(exercises, MathExerciseGenerator(10), stats=stats)
+    if stats is not None:
+        stats.count('accepted', count)
+    if count < requested:
+        print(f"提示：题库中满足条件的题目只有 {count} 道")
+    print(f"成功取出 {count} 道题目")
+    print("题目已保存到 Exercises.txt")
+    print("答案已保存到 Answers.txt")
+
+def run(args, parser, stats=None):
+    """按命令行参数生成题目或检查答案，生成题目失败或题目不足时返回 1"""
+    if args.slice:
+        args.counter = True
+        args.n = args.slice[1] - args.slice[0] + 1
+    if args.manifest:
+        # 批量生成模式
+        from bulk import run_manifest
+        if args.dedup_store or args.format == 'binary':
+            print("错误：--manifest 不能与 --dedup-store 或 --format binary 同时使用")
+            return
+        print(f"正在按清单 {args.manifest} 生成练习卷...")
+        try:
+            with timer(stats, 'generate'):
+                summary = run_manifest(args.manifest, args.output, seed=args.seed, unique=args.unique,
+                                       workers=args.workers)
+        except (OSError, ValueError, TypeError) as e:
+            print(f"错误：{e}")
+            return
+        for name, count, requested in summary:
+            if count < requested:
+                print(f"提示：练习卷 {name} 只生成了 {count} 道题目（要求 {requested} 道）")
+        if stats is not None:
+            stats.merge({'worksheets': len(summary), 'accepted': sum(count for _, count, _ in summary)})
+        print(f"成功生成 {len(summary)} 份练习卷，共 {sum(count for _, count, _ in summary)} 道题目")
+        print(f"已保存到 {args.output}")
+    
+    elif args.bank:
+        # 题库模式
+        _run_bank(args, stats)
+    
+    elif args.n is not None:
         # 生成题目模式
         if args.r is None:
             print("错误：必须使用 -r 参数指定数值范围")
@@ -466,23 +1159,54 @@ def main():
         
         print(f"正在生成 {args.n} 道题目，数值范围为 {args.r}...")
         
-        generator = MathExerciseGenerator(args.r)
-        exercises = generator.generate_exercises(args.n)
+        if args.exact and args.dedup_store:
+            print("错误：--exact 不能与 --dedup-store 同时使用")
+            return
         
-        # 保存题目
-        with open('Exercises.txt', 'w', encoding='utf-8') as f:
-            for i, (expr, _) in enumerate(exercises, 1):
-                f.write(f"{i}. {expr} =\n")
+        if args.counter and args.seed is None:
+            # 记下种子，之后才能按题号重新生成
+            args.seed = random.randrange(2 ** 63)
+            print(f"随机数种子：{args.seed}")
         
-        # 保存答案
-        with open('Answers.txt', 'w', encoding='utf-8') as f:
-            for i, (_, result) in enumerate(exercises, 1):
-                answer = generator.format_number(result)
-                f.write(f"{i}. {answer}\n")
+        index = None
+        if args.dedup_store:
+            from dedup_store import PersistentDedupIndex
+            index = PersistentDedupIndex(args.dedup_store, bloom_capacity=args.bloom_capacity or None)
+        try:
+            count = _generate_and_write(args, stats, index)
+        finally:
+            if index is not None:
+                index.close()
+        if count is None:
+            return 1
         
-        print(f"成功生成 {len(exercises)} 道题目")
-        print("题目已保存到 Exercises.txt")
-        print("答案已保存到 Answers.txt")
+        print(f"成功生成 {count} 道题目")
+        if args.format == 'binary':
+            print("题目和答案已保存到 Exercises.bin")
+        else:
+            print("题目已保存到 Exercises.txt")
+            print("答案已保存到 Answers.txt")
+        if count < args.n:
+            print(f"错误：满足条件的题目不足，只生成了 {count} 道（要求 {args.n} 道）", file=sys.stderr)
+            return 1
+    
+    elif args.e and args.class_answers:
+        # 按班级批改模式
+        from class_grading import find_answer_files, grade_class
+        grade_dir = os.path.abspath(args.grade_dir)
+        answer_files = [path for path in find_answer_files(args.class_answers, exclude=(args.e, args.k))
+                        if os.path.dirname(os.path.abspath(path)) != grade_dir]
+        if not answer_files:
+            print(f"错误：{args.class_answers} 中没有答案文件")
+            return
+        print(f"正在批改 {len(answer_files)} 份答案...")
+        print(f"题目文件：{args.e}")
+        report = grade_class(args.e, answer_files, args.grade_dir, key_file=args.k,
+                             workers=args.workers, stats=stats)
+        for path, error in report.failures:
+            print(f"无法批改 {path}：{error}")
+        print(f"批改完成！共 {len(report.students)} 份答案，{len(report.exercises)} 道题目")
+        print(f"成绩和汇总（Summary.csv、ErrorRates.csv）已保存到 {args.grade_dir}")
     
     elif args.e and args.a:
         # 检查答案模式
@@ -490,17 +1214,37 @@ def main():
         print(f"题目文件：{args.e}")
         print(f"答案文件：{args.a}")
         
-        result = check_answers(args.e, args.a)
-        save_grade(result)
+        if args.k:
+            print(f"标准答案：{args.k}")
+        cache = None
+        if args.cache:
+            from grade_cache import GradeCache
+            cache = GradeCache(args.cache, max_entries=args.cache_size)
+        try:
+            if args.workers > 1:
+                result = check_answers_parallel(args.e, args.a, args.workers, key_file=args.k,
+                                                spot_check=args.spot_check, stats=stats, cache=cache)
+            else:
+                result = check_answers(args.e, args.a, key_file=args.k, spot_check=args.spot_check,
+                                       stats=stats, cache=cache)
+        finally:
+            if cache is not None:
+                cache.close()
+        with timer(stats, 'write'):
+            save_grade(result)
         
-        correct_count = len(result['correct'])
-        wrong_count = len(result['wrong'])
-        total = correct_count + wrong_count
+        correct_count = result.correct_count
+        wrong_count = result.wrong_count
+        total = result.total
         
         print(f"检查完成！")
         print(f"总题目数：{total}")
         print(f"正确：{correct_count} 题")
         print(f"错误：{wrong_count} 题")
+        if cache is not None:
+            summary = cache.summary()
+            print(f"缓存：命中 {summary['hits']}，未命中 {summary['misses']}，"
+                  f"淘汰 {summary['evicted']}（命中率 {summary['hit_rate']:.1%}）")
         print("详细结果已保存到 Grade.txt")
     
     else:
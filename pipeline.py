@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进程内的完整流程：生成题目 -> 合成测试答案 -> 批改
+各阶段之间按批传递题目（表达式、结果、标准答案、提交的答案），不经过文件往返；
+批改时把题目行和答案行在内存中渲染为文件格式，交给与命令行相同的 grade_lines 解析和计算，
+不使用随题目传递的标准答案；需要时可以把各阶段的结果顺便写到文件（与命令行生成的文件格式相同）
+"""
+
+import random
+from itertools import islice
+
+from myapp_final import (GradeResult, MathExerciseGenerator, generate_parallel, grade_lines,
+                         save_grade)
+
+BATCH_SIZE = 4096
+
+WRONG_ANSWER_TYPES = ('wrong_number', 'wrong_fraction', 'zero')
+
+
+class Batch:
+    """
+    一批连续的题目
+    start 为第一道题目的题号，其余字段为等长的列表
+    """
+
+    __slots__ = ('start', 'exprs', 'results', 'answers', 'submitted')
+
+    def __init__(self, start, exprs, results):
+        self.start = start
+        self.exprs = exprs
+        self.results = results
+        self.answers = None
+        self.submitted = None
+
+    def __len__(self):
+        return len(self.exprs)
+
+    def exercise_lines(self):
+        """按题目文件的格式渲染本批题目"""
+        return [f"{i}. {expr} =\n" for i, expr in enumerate(self.exprs, self.start)]
+
+    def answer_lines(self, answers):
+        """按答案文件的格式渲染本批的一列答案"""
+        return [f"{i}. {answer}\n" for i, answer in enumerate(answers, self.start)]
+
+
+def generate_batches(count, max_range, seed=None, workers=1, engine='python',
+                     batch_size=BATCH_SIZE):
+    """生成题目并按批产出，每批已带有格式化的标准答案"""
+    rng = random.Random(seed) if seed is not None else None
+    generator = MathExerciseGenerator(max_range, rng=rng)
+    if engine == 'numpy':
+        from vectorized import iter_vectorized
+        exercises = iter_vectorized(count, max_range, seed=seed)
+    elif workers > 1:
+        exercises = generate_parallel(count, max_range, workers, seed)
+    else:
+        exercises = generator.iter_exercises(count)
+
+    format_number = generator.format_number
+    start = 1
+    while True:
+        chunk = list(islice(exercises, batch_size))
+        if not chunk:
+            break
+        batch = Batch(start, [expr for expr, _ in chunk], [result for _, result in chunk])
+        batch.answers = [format_number(result) for result in batch.results]
+        start += len(chunk)
+        yield batch
+
+
+def wrong_answer(correct, rng):
+    """生成一个与正确答案 correct 不同的错误答案"""
+    for _ in range(10):
+        answer_type = rng.choice(WRONG_ANSWER_TYPES)
+        if answer_type == 'wrong_number':
+            answer = str(rng.randint(0, 20))
+        elif answer_type == 'wrong_fraction':
+            answer = f"{rng.randint(1, 10)}/{rng.randint(2, 10)}"
+        else:
+            answer = "0"
+        if answer != correct:
+            return answer
+    # 随机尝试都与正确答案相同（例如正确答案为 0）
+    return "1" if correct == "0" else "0"
+
+
+def synthesize_answers(batches, total, correct_ratio=0.6, rng=None):
+    """
+    为每批题目合成测试答案
+    在 total 道题目中恰好有 int(total * correct_ratio) 道给出正确答案，
+    按顺序抽样选择，不需要预先知道全部题目
+    """
+    rng = rng if rng is not None else random
+    remaining = total
+    correct_left = int(total * correct_ratio)
+    for batch in batches:
+        submitted = []
+        for answer in batch.answers:
+            # 顺序抽样：以 剩余名额/剩余题目数 的概率选中
+            if remaining > 0 and rng.random() * remaining < correct_left:
+                submitted.append(answer)
+                correct_left -= 1
+            else:
+                submitted.append(wrong_answer(answer, rng))
+            remaining -= 1
+        batch.submitted = submitted
+        yield batch
+
+
+def grade_batches(batches, result=None):
+    """
+    逐批批改，返回 GradeResult
+    与检查答案模式相同，由 grade_lines 解析题目行和答案行并重新计算答案，只是省去了文件读写
+    """
+    result = GradeResult() if result is None else result
+    for batch in batches:
+        grade_lines(batch.exercise_lines(), batch.answer_lines(batch.submitted), result=result)
+    return result
+
+
+class FileSink:
+    """
+    把流经的批写到文件，任一路径为 None 时不写该文件
+    用作迭代器包装：for batch in sink.tee(batches)
+    """
+
+    def __init__(self, exercise_file=None, answer_file=None, test_answer_file=None):
+        self.paths = (exercise_file, answer_file, test_answer_file)
+
+    def tee(self, batches):
+        buffer_size = 1 << 20
+        files = [open(path, 'w', encoding='utf-8', buffering=buffer_size) if path else None
+                 for path in self.paths]
+        exercise_f, answer_f, test_answer_f = files
+        try:
+            for batch in batches:
+                if exercise_f:
+                    exercise_f.writelines(batch.exercise_lines())
+                if answer_f:
+                    answer_f.writelines(batch.answer_lines(batch.answers))
+                if test_answer_f and batch.submitted is not None:
+                    test_answer_f.writelines(batch.answer_lines(batch.submitted))
+                yield batch
+        finally:
+            for f in files:
+                if f:
+                    f.close()
+
+
+def run_pipeline(count, max_range, correct_ratio=0.6, seed=None, workers=1, engine='python',
+                 exercise_file=None, answer_file=None, test_answer_file=None, grade_file=None,
+                 batch_size=BATCH_SIZE):
+    """
+    完整流程：生成 count 道题目，按 correct_ratio 合成测试答案并批改，返回 GradeResult
+    全程按批流式处理；题目空间不足、实际题目数少于 count 时，正确答案数会相应少于
+    int(count * correct_ratio)
+    各文件参数提供时同时写出对应文件
+    """
+    batches = generate_batches(count, max_range, seed=seed, workers=workers, engine=engine,
+                               batch_size=batch_size)
+    rng = random.Random(f"{seed}:answers") if seed is not None else None
+    batches = synthesize_answers(batches, count, correct_ratio, rng)
+    if exercise_file or answer_file or test_answer_file:
+        batches = FileSink(exercise_file, answer_file, test_answer_file).tee(batches)
+    result = grade_batches(batches)
+    if grade_file:
+        save_grade(result, grade_file)
+    return result
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+题库
+生成的题目连同结构信息批量写入本地 sqlite 数据库，之后按条件查询组卷，不必每次重新生成
+每道题目保存：表达式、运算符序列、题型（数字换成 n 的表达式）、操作数个数、
+约分后答案的分子和分母、容纳全部操作数的最小数值范围和难度；另记录每个班级用过的题目
+
+题目表以查重指纹（dedup.canonical_key）为主键，重复的题目不会重复入库；
+答案 (分母, 分子)、数值范围、(操作数个数, 运算符位掩码) 各有一个索引（都隐含主键），
+组卷时先由索引取出满足条件的全部指纹（不读取表中的行），从中均匀地不放回抽取 N 个，
+再按指纹读取这 N 道题目；"班级没用过"由用题记录表的主键 (班级, 题目) 逐行查询
+
+fill 由生成器的题目结构直接得到每一行，不再解析渲染出的表达式；
+一次填充的题目数不少于题库现有题目数时，先删除三个索引，写完后再重新建立
+"""
+
+import os
+import random
+import re
+import sqlite3
+from itertools import islice
+from operator import itemgetter
+
+from dedup import DedupIndex, canonical_key
+from dedup_store import _to_signed
+from expression import OPERATOR_ALIASES
+from myapp_final import render_structure
+from rational import Rational
+
+OPERATOR_BITS = {'+': 1, '-': 2, '×': 4, '÷': 8}
+
+ALL_OPERATORS = 15
+
+# 每批写入的行数
+BATCH_ROWS = 50000
+
+# 按指纹读取题目时每条 SQL 语句的参数个数（旧版 sqlite 上限为 999）
+_SQL_PARAMS = 900
+
+# 缓存的数字字面量个数上限
+MAX_CACHED_LITERALS = 1 << 16
+
+_NUMBER = re.compile(r"\d+'\d+/\d+|\d+/\d+|\d+")
+
+_KEY_MASK = (1 << 64) - 1
+
+# 从题型中删去数字占位符、括号和空白，只留下运算符
+_NOT_OPERATOR = str.maketrans('', '', 'n() ')
+
+# 数字字面量 -> _literal_info(字面量)，条目数超过上限时清空
+_LITERALS = {}
+
+# 题型 -> _shape_info(题型)，不同的题型只有几十种
+_SHAPES = {}
+
+# (形式, 运算符 1, 运算符 2) -> (题型, *_shape_info(题型))
+_STRUCTURES = {}
+
+# 答案、数值范围、(操作数个数, 运算符位掩码) 的索引
+INDEXES = {
+    'problems_answer': '(denominator, numerator)',
+    'problems_range': '(range)',
+    'problems_shape': '(operands, op_mask)',
+}
+
+
+def operator_mask(operators):
+    """运算符集合（如 "+-" 或 "×÷"）的位掩码"""
+    mask = 0
+    for op in operators:
+        if op in ', ':
+            continue
+        try:
+            mask |= OPERATOR_BITS[OPERATOR_ALIASES[op]]
+        except KeyError:
+            raise ValueError(f"不支持的运算符：{op}") from None
+    if not mask:
+        raise ValueError("至少需要一种运算符")
+    return mask
+
+
+def _shape_info(shape):
+    """题型的 (统一写法的运算符序列, 运算符位掩码, 操作数个数, 题型本身的难度)"""
+    ops = ''.join(OPERATOR_ALIASES[op] for op in shape.translate(_NOT_OPERATOR))
+    operands = shape.count('n')
+    return (ops, operator_mask(ops), operands,
+            operands - 1 + ops.count('×') + ops.count('÷') + ('(' in shape))
+
+
+def _literal_info(number):
+    """数字字面量的 (所需的最小数值范围, 是否为分数)"""
+    if '/' not in number:
+        return int(number) + 1, False
+    whole, _, fraction = number.rpartition("'")
+    return max(int(whole or 0), int(fraction.split('/')[1])) + 1, True
+
+
+def problem_row(key, expr, result):
+    """
+    题目在题库中的一行：
+    (指纹, 表达式, 运算符, 题型, 操作数个数, 运算符位掩码, 分子, 分母, 数值范围, 难度)
+    数值范围为能生成全部操作数的最小 -r：自然数 k 需要 k + 1，分数需要分母 + 1；
+    难度：每多一个操作数、每个乘除运算、每个分数操作数、括号、分数答案各加 1
+    """
+    shape = _NUMBER.sub('n', expr)
+    info = _SHAPES.get(shape)
+    if info is None:
+        info = _SHAPES[shape] = _shape_info(shape)
+    ops, mask, operands, difficulty = info
+    max_range = 1
+    for number in _NUMBER.findall(expr):
+        literal = _LITERALS.get(number)
+        if literal is None:
+            if len(_LITERALS) >= MAX_CACHED_LITERALS:
+                _LITERALS.clear()
+            literal = _LITERALS[number] = _literal_info(number)
+        need, fraction = literal
+        difficulty += fraction
+        if need > max_range:
+            max_range = need
+    numerator, denominator = result.numerator, result.denominator
+    if denominator != 1:
+        difficulty += 1
+    return (_to_signed(key), expr, ops, shape, operands, mask, numerator, denominator, max_range,
+            difficulty)
+
+
+def structure_row(key, structure):
+    """
+    由 MathExerciseGenerator.generate_structure 的题目结构直接得到题库中的一行，
+    与 problem_row(指纹, 渲染出的表达式, 结果) 相同；操作数均为自然数或真分数
+    """
+    shape, op1, op2, operands, texts, result = structure
+    info = _STRUCTURES.get((shape, op1, op2))
+    if info is None:
+        pattern = render_structure(shape, op1, op2, ('n',) * len(texts))
+        info = _STRUCTURES[(shape, op1, op2)] = (pattern,) + _shape_info(pattern)
+    pattern, ops, mask, count, difficulty = info
+    max_range = 1
+    for value in operands:
+        numerator, denominator = value.numerator, value.denominator
+        if denominator == 1:
+            need = numerator + 1
+        else:
+            difficulty += 1
+            need = max(numerator // denominator, denominator) + 1
+        if need > max_range:
+            max_range = need
+    numerator, denominator = result.numerator, result.denominator
+    if denominator != 1:
+        difficulty += 1
+    return (_to_signed(key), render_structure(shape, op1, op2, texts), ops, pattern, count, mask,
+            numerator, denominator, max_range, difficulty)
+
+
+class ProblemBank:
+    """
+    题库，首次使用时才打开数据库；用完后调用 close()（或用 with）
+    add / add_keyed 批量入库，select 按条件取题，assemble 组卷并记录班级用题
+    """
+
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        self._db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _open(self):
+        if self._db is not None:
+            return
+        db = sqlite3.connect(self.path)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("CREATE TABLE IF NOT EXISTS problems ("
+                   "key INTEGER PRIMARY KEY, expr TEXT NOT NULL, ops TEXT NOT NULL, "
+                   "shape TEXT NOT NULL, operands INTEGER NOT NULL, op_mask INTEGER NOT NULL, "
+                   "numerator INTEGER NOT NULL, denominator INTEGER NOT NULL, "
+                   "range INTEGER NOT NULL, difficulty INTEGER NOT NULL)")
+        db.execute("CREATE TABLE IF NOT EXISTS usage ("
+                   "class TEXT NOT NULL, problem INTEGER NOT NULL, worksheet TEXT, "
+                   "PRIMARY KEY (class, problem)) WITHOUT ROWID")
+        db.commit()
+        self._db = db
+        self._create_indexes()
+
+    def _create_indexes(self):
+        with self._db:
+            for name, columns in INDEXES.items():
+                self._db.execute(f"CREATE INDEX IF NOT EXISTS {name} ON problems {columns}")
+
+    def _drop_indexes(self):
+        with self._db:
+            for name in INDEXES:
+                self._db.execute(f"DROP INDEX IF EXISTS {name}")
+
+    def __len__(self):
+        self._open()
+        return self._db.execute("SELECT COUNT(*) FROM problems").fetchone()[0]
+
+    def keys(self):
+        """题库中全部题目的查重指纹（DedupIndex），生成新题目时据此跳过已入库的题目"""
+        self._open()
+        count = len(self)
+        index = DedupIndex(count)
+        add = index.add
+        for (key,) in self._db.execute("SELECT key FROM problems"):
+            add(key & _KEY_MASK)
+        return index
+
+    def add_keyed(self, exercises, batch_size=BATCH_ROWS):
+        """批量写入 (指纹, 表达式, 结果)，已在题库中的题目跳过，返回新入库的题目数"""
+        return self._add_rows((problem_row(*exercise) for exercise in exercises), batch_size)
+
+    def _add_rows(self, rows, batch_size=BATCH_ROWS):
+        self._open()
+        db = self._db
+        before = db.total_changes
+        rows = iter(rows)
+        with db:
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                # 按主键顺序插入，减少 B 树页面的随机写
+                batch.sort(key=itemgetter(0))
+                db.executemany("INSERT OR IGNORE INTO problems VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                               batch)
+        return db.total_changes - before
+
+    def add(self, exercises, batch_size=BATCH_ROWS):
+        """批量写入 (表达式, 结果)，返回新入库的题目数"""
+        return self.add_keyed(((canonical_key(expr), expr, result) for expr, result in exercises),
+                              batch_size)
+
+    def fill(self, count, max_range, rng=None, stats=None):
+        """生成 count 道题库中还没有的题目并入库，返回新入库的题目数"""
+        from myapp_final import MathExerciseGenerator
+        generator = MathExerciseGenerator(max_range, rng=rng, stats=stats, index=self.keys())
+        rows = (structure_row(key, structure)
+                for key, structure in generator.iter_keyed_structures(count))
+        # 写入的题目不少于现有题目时，写完后整体建索引比逐行维护索引快
+        rebuild = count >= len(self)
+        if rebuild:
+            self._drop_indexes()
+        try:
+            return self._add_rows(rows)
+        finally:
+            if rebuild:
+                self._create_indexes()
+
+    def _conditions(self, constraints, operators, max_range, min_answer, operands, difficulty,
+                    unused_by):
+        conditions = []
+        params = []
+        masks = [operator_mask(operators)] if operators else []
+        if constraints is not None:
+            masks.append(operator_mask(constraints.operators))
+            if constraints.integer_answer:
+                conditions.append("denominator = 1")
+            if constraints.max_denominator is not None:
+                conditions.append("denominator <= ?")
+                params.append(constraints.max_denominator)
+            if constraints.max_answer is not None:
+                bound = constraints.max_answer
+                conditions.append("numerator * ? <= ? * denominator")
+                params.extend((bound.denominator, bound.numerator))
+        for mask in masks:
+            if mask != ALL_OPERATORS:
+                conditions.append("op_mask & ? = 0")
+                params.append(ALL_OPERATORS & ~mask)
+        if max_range is not None:
+            conditions.append("range <= ?")
+            params.append(max_range)
+        if min_answer is not None:
+            bound = Rational.from_number(min_answer)
+            conditions.append("numerator * ? >= ? * denominator")
+            params.extend((bound.denominator, bound.numerator))
+        if operands is not None:
+            conditions.append("operands = ?")
+            params.append(operands)
+        if difficulty is not None:
+            conditions.append("difficulty BETWEEN ? AND ?")
+            params.extend(difficulty)
+        if unused_by is not None:
+            conditions.append("NOT EXISTS (SELECT 1 FROM usage WHERE class = ? AND problem = key)")
+            params.append(unused_by)
+        return conditions, params
+
+    def select(self, count, constraints=None, operators=None, max_range=None, min_answer=None,
+               operands=None, difficulty=None, unused_by=None, rng=None, exclude=()):
+        """
+        随机取 count 道满足条件的题目，返回 [(题目编号, 表达式, 结果)]，满足条件的题目不足时返回全部
+        constraints：constraints.Constraints（整数答案、答案上限、分母上限、运算符）；
+        operators：只含这些运算符；max_range：操作数都在该数值范围内；min_answer：答案下限；
+        operands：操作数个数；difficulty：(最低, 最高) 难度；unused_by：该班级没用过；
+        exclude：不取这些编号的题目
+        """
+        self._open()
+        rng = rng if rng is not None else random
+        query, params = self._candidate_query(constraints, operators, max_range, min_answer,
+                                              operands, difficulty, unused_by)
+        candidates = [key for (key,) in self._db.execute(query, params) if key not in exclude]
+        chosen = rng.sample(candidates, min(count, len(candidates)))
+        rows = {}
+        for start in range(0, len(chosen), _SQL_PARAMS):
+            part = chosen[start:start + _SQL_PARAMS]
+            marks = ','.join('?' * len(part))
+            for key, expr, numerator, denominator in self._db.execute(
+                    f"SELECT key, expr, numerator, denominator FROM problems WHERE key IN ({marks})",
+                    part):
+                rows[key] = (key, expr, Rational._raw(numerator, denominator))
+        return [rows[key] for key in chosen]
+
+    def _candidate_query(self, constraints=None, operators=None, max_range=None, min_answer=None,
+                         operands=None, difficulty=None, unused_by=None):
+        """取出满足条件的全部指纹的 (SQL, 参数)，条件与 select 相同"""
+        conditions, params = self._conditions(constraints, operators, max_range, min_answer,
+                                              operands, difficulty, unused_by)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        return f"SELECT key FROM problems{where}", params
+
+    def mark_used(self, class_name, keys, worksheet=None):
+        """记录班级用过的题目"""
+        self._open()
+        with self._db:
+            self._db.executemany("INSERT OR IGNORE INTO usage (class, problem, worksheet) VALUES (?, ?, ?)",
+                                 ((class_name, key, worksheet) for key in keys))
+
+    def assemble(self, mix, class_name=None, worksheet=None, rng=None, **criteria):
+        """
+        组卷，返回 (表达式, 结果) 列表，满足条件的题目不足时少于要求的题目数
+        mix 为题目数，或 {运算符: 题目数}（如 {'+-': 10, '×÷': 10}），按顺序分组取题；
+        criteria 为 select 的其余条件；提供 class_name 时只取该班级没用过的题目，并记为已用
+        """
+        sections = mix.items() if isinstance(mix, dict) else [(None, mix)]
+        chosen = {}
+        for operators, count in sections:
+            for key, expr, result in self.select(count, operators=operators, unused_by=class_name,
+                                                 rng=rng, exclude=chosen, **criteria):
+                chosen[key] = (expr, result)
+        if class_name is not None:
+            self.mark_used(class_name, chosen, worksheet)
+        return list(chosen.values())
+
+    def close(self):
+        if self._db is not None:
+            # 让 sqlite 按需收集索引的统计信息，供以后的查询选择索引
+            self._db.execute("PRAGMA optimize")
+            self._db.close()
+            self._db = None
+
+
+def parse_mix(text):
+    """解析 --mix 的 "+-:10,×÷:10"，返回 {运算符: 题目数}"""
+    mix = {}
+    for part in text.split(','):
+        operators, _, count = part.strip().rpartition(':')
+        if not operators or not count.isdigit():
+            raise ValueError(f"无效的运算符分组：{part}，应为 运算符:题目数")
+        operator_mask(operators)
+        mix[operators] = mix.get(operators, 0) + int(count)
+    return mix
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+题目空间的精确计数与反排名（unrank）
+在 dedup.canonical_key 的意义下（加法、乘法满足交换律和结合律）枚举所有不同的合法题目：
+不出现负数、除数不为 0。给定排名可以直接构造对应题目，
+因此可以不放回地抽取 N 道不同的题目，且题目不够时立即给出真实的上限
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from math import isqrt
+
+from literals import get_table
+
+OPERATORS = ['+', '-', '×', '÷']
+COMMUTATIVE = ('+', '×')
+PRECEDENCE = {'+': 1, '-': 1, '×': 2, '÷': 2}
+
+# 三个操作数的题目需要 O(L^2) 的前缀和表，L 为不同字面量的个数
+MAX_TERNARY_LITERALS = 400
+
+SHAPES = ('binary', 'ternary')
+
+
+def _apply(op, left, right):
+    if op == '+':
+        return left + right
+    elif op == '-':
+        return left - right
+    elif op == '×':
+        return left * right
+    else:
+        return left / right
+
+
+def _bracket(text, op, parent, right_side):
+    """按优先级给子表达式加括号；右侧子表达式优先级相同也要加括号"""
+    if PRECEDENCE[op] < PRECEDENCE[parent] or (right_side and PRECEDENCE[op] == PRECEDENCE[parent]):
+        return f"({text})"
+    return text
+
+
+class _PairSpace:
+    """
+    操作数对 (i, j) 的编号，i、j 为按数值排序后的字面量下标
+    'le'：i <= j（可交换的运算），'ge'：i >= j（减法），'all'：任意（除法）
+    """
+
+    def __init__(self, kind, size):
+        self.kind = kind
+        self.size = size
+        if kind == 'all':
+            self.count = size * size
+        else:
+            self.count = size * (size + 1) // 2
+
+    def pair(self, p):
+        if self.kind == 'all':
+            return divmod(p, self.size)
+        # 三角形编号：p = k(k+1)/2 + m，0 <= m <= k
+        k = (isqrt(8 * p + 1) - 1) // 2
+        m = p - k * (k + 1) // 2
+        return (m, k) if self.kind == 'le' else (k, m)
+
+
+class _Template:
+    """
+    一类题目结构：先算 inner_op(x, y) 得到 t，再与 z 做 outer_op
+    position 为 'left' 表示 t 在左侧，'right' 表示 t 在右侧，
+    inner_op 与 outer_op 同为 + 或 × 时三个数是一个多重集合
+    """
+
+    def __init__(self, space, inner_op, outer_op, position):
+        self.space = space
+        self.inner_op = inner_op
+        self.outer_op = outer_op
+        self.position = position
+        self.multiset = inner_op == outer_op and inner_op in COMMUTATIVE
+        kind = 'le' if inner_op in COMMUTATIVE else ('ge' if inner_op == '-' else 'all')
+        self.pairs = _PairSpace(kind, len(space.values))
+        self._cumulative = None
+        # 每对操作数可选的 z 个数恒为 L 时不需要前缀和表
+        self.constant = not self.multiset and (
+            outer_op in COMMUTATIVE or (outer_op == '÷' and position == 'left'))
+
+    def z_range(self, i, j, t):
+        """给定内层结果 t，合法的 z 下标区间 [lo, hi)"""
+        values = self.space.values
+        size = len(values)
+        if self.multiset:
+            return j, size
+        if self.outer_op == '-':
+            if self.position == 'left':
+                return 0, bisect_right(values, t)
+            return bisect_left(values, t), size
+        if self.outer_op == '÷' and self.position == 'right' and t == 0:
+            return 0, 0
+        return 0, size
+
+    def _inner(self, p):
+        i, j = self.pairs.pair(p)
+        values = self.space.values
+        return i, j, _apply(self.inner_op, values[i], values[j])
+
+    @property
+    def cumulative(self):
+        """每对操作数的题目个数的前缀和"""
+        if self._cumulative is None:
+            cumulative = array('q')
+            total = 0
+            for p in range(self.pairs.count):
+                i, j, t = self._inner(p)
+                lo, hi = self.z_range(i, j, t)
+                total += hi - lo
+                cumulative.append(total)
+            self._cumulative = cumulative
+        return self._cumulative
+
+    def __len__(self):
+        if self.constant:
+            return self.pairs.count * len(self.space.values)
+        cumulative = self.cumulative
+        return cumulative[-1] if cumulative else 0
+
+    def unrank(self, rank):
+        """返回第 rank 道题目的 (表达式, 结果)"""
+        if self.constant:
+            p, offset = divmod(rank, len(self.space.values))
+        else:
+            cumulative = self.cumulative
+            p = bisect_right(cumulative, rank)
+            offset = rank - (cumulative[p - 1] if p else 0)
+        i, j, t = self._inner(p)
+        lo, _ = self.z_range(i, j, t)
+        k = lo + offset
+
+        values = self.space.values
+        texts = self.space.texts
+        x, y, z = texts[i], texts[j], texts[k]
+        if self.multiset:
+            return f"{x} {self.inner_op} {y} {self.outer_op} {z}", _apply(self.outer_op, t, values[k])
+
+        inner = f"{x} {self.inner_op} {y}"
+        if self.position == 'left':
+            expr = f"{_bracket(inner, self.inner_op, self.outer_op, False)} {self.outer_op} {z}"
+            return expr, _apply(self.outer_op, t, values[k])
+        expr = f"{z} {self.outer_op} {_bracket(inner, self.inner_op, self.outer_op, True)}"
+        return expr, _apply(self.outer_op, values[k], t)
+
+
+class _BinaryTemplate:
+    """两个操作数的题目 x op y"""
+
+    def __init__(self, space, op):
+        self.space = space
+        self.op = op
+        kind = 'le' if op in COMMUTATIVE else ('ge' if op == '-' else 'all')
+        self.pairs = _PairSpace(kind, len(space.values))
+
+    def __len__(self):
+        return self.pairs.count
+
+    def unrank(self, rank):
+        i, j = self.pairs.pair(rank)
+        values = self.space.values
+        texts = self.space.texts
+        return f"{texts[i]} {self.op} {texts[j]}", _apply(self.op, values[i], values[j])
+
+
+class ProblemSpace:
+    """
+    指定范围（和形式）的全部不同题目
+    len(space) 为题目总数，space.unrank(k) 构造第 k 道题目
+    """
+
+    def __init__(self, max_range, shapes=SHAPES):
+        table = get_table(max_range)
+        if table.values is None:
+            raise ValueError(f"数值范围 {max_range} 过大，无法枚举题目空间")
+        # 按数值排序的不同字面量
+        distinct = {}
+        for value, text in zip(table.values, table.texts):
+            distinct[text] = value
+        ordered = sorted(distinct.items(), key=lambda item: item[1])
+        self.max_range = max_range
+        self.texts = [text for text, _ in ordered]
+        self.values = [value for _, value in ordered]
+
+        self.templates = []
+        if 'binary' in shapes:
+            self.templates.extend(_BinaryTemplate(self, op) for op in OPERATORS)
+        if 'ternary' in shapes:
+            if len(self.values) > MAX_TERNARY_LITERALS:
+                raise ValueError(f"数值范围 {max_range} 过大，无法枚举三个操作数的题目空间")
+            for outer_op in OPERATORS:
+                positions = ['left'] if outer_op in COMMUTATIVE else ['left', 'right']
+                for inner_op in OPERATORS:
+                    for position in positions:
+                        self.templates.append(_Template(self, inner_op, outer_op, position))
+        self._offsets = None
+
+    @property
+    def offsets(self):
+        """各类题目的起始排名"""
+        if self._offsets is None:
+            offsets = [0]
+            for template in self.templates:
+                offsets.append(offsets[-1] + len(template))
+            self._offsets = offsets
+        return self._offsets
+
+    def __len__(self):
+        return self.offsets[-1]
+
+    def unrank(self, rank):
+        """返回第 rank 道题目的 (表达式, Rational 结果)"""
+        if not 0 <= rank < len(self):
+            raise IndexError(rank)
+        t = bisect_right(self.offsets, rank) - 1
+        return self.templates[t].unrank(rank - self.offsets[t])
+
+    def sample(self, count, rng):
+        """
+        不放回地随机抽取 count 道不同的题目，返回 (表达式, 结果) 迭代器
+        题目总数不足时立即抛出 ValueError
+        """
+        total = len(self)
+        if count > total:
+            raise ValueError(f"数值范围 {self.max_range} 内最多只有 {total} 道不同的题目")
+        return (self.unrank(rank) for rank in rng.sample(range(total), count))
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+轻量的有理数类型
+用两个整数表示分数，运算时不立即约分（延迟到读取分子分母、哈希时才约分），
+分母相同（包括整数之间）的运算走快速路径
+"""
+
+import sys
+from math import gcd
+
+_HASH_MODULUS = sys.hash_info.modulus
+_HASH_INF = sys.hash_info.inf
+
+
+class Rational:
+    """分数 numerator/denominator，分母始终为正"""
+
+    __slots__ = ('_num', '_den')
+
+    def __init__(self, numerator=0, denominator=1):
+        if denominator == 0:
+            raise ZeroDivisionError(f"Rational({numerator}, 0)")
+        if denominator < 0:
+            numerator, denominator = -numerator, -denominator
+        self._num = numerator
+        self._den = denominator
+
+    @classmethod
+    def _raw(cls, numerator, denominator):
+        """不做检查直接构造（调用方保证分母为正）"""
+        obj = object.__new__(cls)
+        obj._num = numerator
+        obj._den = denominator
+        return obj
+
+    @classmethod
+    def from_number(cls, value):
+        """由 int、Fraction 或 Rational 构造"""
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, int):
+            return cls._raw(value, 1)
+        return cls(value.numerator, value.denominator)
+
+    def _normalize(self):
+        """约分"""
+        den = self._den
+        if den != 1:
+            g = gcd(self._num, den)
+            if g != 1:
+                self._num //= g
+                self._den = den // g
+
+    @property
+    def numerator(self):
+        self._normalize()
+        return self._num
+
+    @property
+    def denominator(self):
+        self._normalize()
+        return self._den
+
+    # 算术运算
+
+    def __add__(self, other):
+        if isinstance(other, Rational):
+            n2, d2 = other._num, other._den
+        elif isinstance(other, int):
+            n2, d2 = other, 1
+        else:
+            return NotImplemented
+        d1 = self._den
+        if d1 == d2:
+            return Rational._raw(self._num + n2, d1)
+        return Rational._raw(self._num * d2 + n2 * d1, d1 * d2)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        if isinstance(other, Rational):
+            n2, d2 = other._num, other._den
+        elif isinstance(other, int):
+            n2, d2 = other, 1
+        else:
+            return NotImplemented
+        d1 = self._den
+        if d1 == d2:
+            return Rational._raw(self._num - n2, d1)
+        return Rational._raw(self._num * d2 - n2 * d1, d1 * d2)
+
+    def __rsub__(self, other):
+        if isinstance(other, int):
+            return Rational._raw(other, 1) - self
+        return NotImplemented
+
+    def __mul__(self, other):
+        if isinstance(other, Rational):
+            return Rational._raw(self._num * other._num, self._den * other._den)
+        if isinstance(other, int):
+            return Rational._raw(self._num * other, self._den)
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if isinstance(other, Rational):
+            n2, d2 = other._num, other._den
+        elif isinstance(other, int):
+            n2, d2 = other, 1
+        else:
+            return NotImplemented
+        if n2 == 0:
+            raise ZeroDivisionError(f"{self} / 0")
+        if n2 < 0:
+            return Rational._raw(-self._num * d2, -self._den * n2)
+        return Rational._raw(self._num * d2, self._den * n2)
+
+    def __rtruediv__(self, other):
+        if isinstance(other, int):
+            return Rational._raw(other, 1) / self
+        return NotImplemented
+
+    def __neg__(self):
+        return Rational._raw(-self._num, self._den)
+
+    def __abs__(self):
+        return Rational._raw(abs(self._num), self._den)
+
+    # 比较（交叉相乘，无需约分）
+
+    def _cross(self, other):
+        """返回 (self 的交叉积, other 的交叉积)，无法比较时返回 None"""
+        if isinstance(other, Rational):
+            return self._num * other._den, other._num * self._den
+        if isinstance(other, int):
+            return self._num, other * self._den
+        if hasattr(other, 'numerator') and hasattr(other, 'denominator'):
+            return self._num * other.denominator, other.numerator * self._den
+        return None
+
+    def __eq__(self, other):
+        pair = self._cross(other)
+        if pair is None:
+            return NotImplemented
+        return pair[0] == pair[1]
+
+    def __lt__(self, other):
+        pair = self._cross(other)
+        if pair is None:
+            return NotImplemented
+        return pair[0] < pair[1]
+
+    def __le__(self, other):
+        pair = self._cross(other)
+        if pair is None:
+            return NotImplemented
+        return pair[0] <= pair[1]
+
+    def __gt__(self, other):
+        pair = self._cross(other)
+        if pair is None:
+            return NotImplemented
+        return pair[0] > pair[1]
+
+    def __ge__(self, other):
+        pair = self._cross(other)
+        if pair is None:
+            return NotImplemented
+        return pair[0] >= pair[1]
+
+    def __hash__(self):
+        # 与 int、Fraction 的哈希保持一致
+        self._normalize()
+        try:
+            inverse = pow(self._den, -1, _HASH_MODULUS)
+        except ValueError:
+            result = _HASH_INF
+        else:
+            result = hash(hash(abs(self._num)) * inverse)
+        result = result if self._num >= 0 else -result
+        return -2 if result == -1 else result
+
+    def __bool__(self):
+        return self._num != 0
+
+    def __float__(self):
+        return self._num / self._den
+
+    def __reduce__(self):
+        return (Rational, (self.numerator, self.denominator))
+
+    def __repr__(self):
+        return f"Rational({self.numerator}, {self.denominator})"
+
+    def __str__(self):
+        if self.denominator == 1:
+            return str(self._num)
+        return f"{self._num}/{self._den}"
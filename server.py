@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+常驻的题目生成与批改服务
+基于 asyncio 的本地 HTTP 服务（TCP 或 Unix 套接字），进程常驻，字面量表和表达式编译缓存保持预热：
+  POST /generate  {"n": 20, "r": 10, "seed": 可选}  -> {"exercises": [...], "answers": [...]}
+  POST /grade     {"exercises": [...], "answers": [...], "key": 可选}
+                  -> {"total": ..., "correct": [...], "wrong": [...]}
+  GET  /health、GET /stats
+未指定 seed 的生成请求直接从预先生成的题目池中取题，题目池按最近使用保留少数几个范围，
+r 不能超过服务配置的上限；
+短时间内到达的批改请求合并为一批执行
+计算都在一个工作线程中串行进行，事件循环只负责收发请求
+"""
+
+import argparse
+import asyncio
+import json
+import random
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from myapp_final import MathExerciseGenerator, grade_lines
+
+# 每个范围的题目池大小，低于一半时在后台分批补充（每批不超过 REFILL_CHUNK 道，避免长时间占用工作线程）
+RESERVOIR_SIZE = 20000
+REFILL_CHUNK = 1000
+
+# 请求中 r 的默认上限和同时保留的题目池个数
+MAX_RANGE = 10000
+MAX_RESERVOIRS = 8
+
+# 批改请求的合并窗口（秒）和每批的最大行数
+BATCH_WINDOW = 0.002
+BATCH_MAX_LINES = 200000
+
+# 单个请求的限制
+MAX_COUNT = 100000
+MAX_BODY = 64 << 20
+
+BACKLOG = 1024
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class RequestError(Exception):
+    """请求不合法，返回给客户端的错误"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class ProblemReservoir:
+    """
+    一个数值范围的题目池
+    生成器的查重指纹超过题目池大小时换一个新的生成器，指纹集合不会无限增长；
+    池中题目因此可能重复，取题时再按本次请求去重：同一份题目内不重复，
+    不同请求之间允许出现相同的题目
+    """
+
+    def __init__(self, max_range, size=RESERVOIR_SIZE):
+        self.max_range = max_range
+        self.size = size
+        self.problems = deque()
+        self.generator = None
+
+    def _new_generator(self):
+        self.generator = MathExerciseGenerator(self.max_range, rng=random.Random())
+
+    def refill(self, limit=None):
+        """补充题目池，至多补充 limit 道（在工作线程中调用）"""
+        missing = self.size - len(self.problems)
+        if limit is not None:
+            missing = min(missing, limit)
+        if missing <= 0:
+            return
+        if self.generator is None or len(self.generator.generated) >= self.size:
+            self._new_generator()
+        before = len(self.problems)
+        self.problems.extend(self.generator.iter_keyed_exercises(missing))
+        produced = len(self.problems) - before
+        if produced < missing:
+            # 题目空间已耗尽：下次换一个新的生成器，并缩小题目池，
+            # 避免每次补充都耗尽尝试次数
+            self.generator = None
+            self.size = max(1, (before + produced) // 2)
+
+    def take(self, count):
+        """
+        取出 count 道互不重复的题目 (表达式, 结果)（在工作线程中调用）
+        题目池不够时当场生成，题目空间不足时返回的题目少于 count
+        """
+        taken = []
+        seen = set()
+        while len(taken) < count:
+            if not self.problems:
+                before = len(taken)
+                # 当场生成时换一个新的生成器，只需与本次已取出的题目不重复
+                self._new_generator()
+                for key, expr, result in self.generator.iter_keyed_exercises(count - len(taken)):
+                    if key not in seen:
+                        seen.add(key)
+                        taken.append((expr, result))
+                self.generator = None
+                if len(taken) == before:
+                    break
+                continue
+            key, expr, result = self.problems.popleft()
+            if key not in seen:
+                seen.add(key)
+                taken.append((expr, result))
+        return taken
+
+    @property
+    def low(self):
+        return len(self.problems) < self.size // 2
+
+    @property
+    def full(self):
+        return len(self.problems) >= self.size
+
+
+class ExerciseService:
+    """请求处理：生成题目、批改答案，计算交给单个工作线程"""
+
+    def __init__(self, reservoir_size=RESERVOIR_SIZE, batch_window=BATCH_WINDOW,
+                 batch_max_lines=BATCH_MAX_LINES, max_range=MAX_RANGE, max_reservoirs=MAX_RESERVOIRS,
+                 max_body=MAX_BODY):
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.reservoir_size = reservoir_size
+        self.max_range = max_range
+        self.max_reservoirs = max_reservoirs
+        self.max_body = max_body
+        # 范围 -> 题目池，按最近使用排序，超过 max_reservoirs 个时丢弃最久没用的
+        self.reservoirs = OrderedDict()
+        self.refilling = set()
+        self.batch_window = batch_window
+        self.batch_max_lines = batch_max_lines
+        self.pending = None
+        self.counters = Counter()
+        self.formatter = MathExerciseGenerator(10)
+
+    async def _call(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def warm(self, ranges):
+        """预先构建字面量表并填满题目池"""
+        for max_range in ranges:
+            await self._call(self._reservoir(max_range).refill)
+
+    def _reservoir(self, max_range):
+        reservoir = self.reservoirs.get(max_range)
+        if reservoir is None:
+            reservoir = self.reservoirs[max_range] = ProblemReservoir(max_range, self.reservoir_size)
+            while len(self.reservoirs) > self.max_reservoirs:
+                self.reservoirs.popitem(last=False)
+        else:
+            self.reservoirs.move_to_end(max_range)
+        return reservoir
+
+    def _schedule_refill(self, reservoir):
+        if reservoir.low and reservoir not in self.refilling:
+            self.refilling.add(reservoir)
+            asyncio.ensure_future(self._refill(reservoir))
+
+    async def _refill(self, reservoir):
+        """分批补满题目池，批与批之间其他请求可以使用工作线程"""
+        try:
+            # 题目池被丢弃后不再补充
+            while not reservoir.full and self.reservoirs.get(reservoir.max_range) is reservoir:
+                await self._call(reservoir.refill, REFILL_CHUNK)
+        finally:
+            self.refilling.discard(reservoir)
+
+    # 生成
+
+    def _render(self, problems):
+        format_number = self.formatter.format_number
+        return {
+            'exercises': [expr for expr, _ in problems],
+            'answers': [format_number(result) for _, result in problems],
+        }
+
+    def _generate_seeded(self, count, max_range, seed):
+        generator = MathExerciseGenerator(max_range, rng=random.Random(seed))
+        return self._render(generator.generate_exercises(count))
+
+    def _take(self, reservoir, count):
+        return self._render(reservoir.take(count))
+
+    async def generate(self, params):
+        count = _int_param(params, 'n', 1, MAX_COUNT)
+        max_range = _int_param(params, 'r', 1, self.max_range)
+        seed = _int_param(params, 'seed', 0, None) if params.get('seed') is not None else None
+        self.counters['generate'] += 1
+        if seed is not None:
+            # 指定种子时结果必须可复现，不经过题目池
+            return await self._call(self._generate_seeded, count, max_range, seed)
+        reservoir = self._reservoir(max_range)
+        if len(reservoir.problems) >= count:
+            self.counters['reservoir_hits'] += 1
+        response = await self._call(self._take, reservoir, count)
+        self._schedule_refill(reservoir)
+        return response
+
+    # 批改
+
+    def _grade_batch(self, jobs):
+        """在工作线程中依次批改一批请求"""
+        results = []
+        for exercises, answers, key in jobs:
+            try:
+                result = grade_lines(exercises, answers, key)
+                results.append({
+                    'total': result.total,
+                    'correct': list(result.iter_numbers(True)),
+                    'wrong': list(result.iter_numbers(False)),
+                })
+            except Exception as e:
+                results.append(e)
+        return results
+
+    async def _run_batch(self, batch):
+        # 等待合并窗口内到达的其他请求
+        await asyncio.sleep(self.batch_window)
+        if self.pending is batch:
+            self.pending = None
+        jobs = [job for job, _ in batch['jobs']]
+        self.counters['grade_batches'] += 1
+        try:
+            results = await self._call(self._grade_batch, jobs)
+        except Exception as e:
+            results = [e] * len(jobs)
+        for (_, future), result in zip(batch['jobs'], results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def grade(self, params):
+        exercises = _list_param(params, 'exercises')
+        answers = _list_param(params, 'answers')
+        key = _list_param(params, 'key') if params.get('key') is not None else None
+        self.counters['grade'] += 1
+        future = asyncio.get_running_loop().create_future()
+        lines = len(exercises)
+        batch = self.pending
+        if batch is None or batch['lines'] + lines > self.batch_max_lines:
+            batch = self.pending = {'jobs': [], 'lines': 0}
+            asyncio.ensure_future(self._run_batch(batch))
+        batch['jobs'].append(((exercises, answers, key), future))
+        batch['lines'] += lines
+        return await future
+
+    def stats(self):
+        return {
+            'counters': dict(self.counters),
+            'reservoirs': {str(r): len(reservoir.problems) for r, reservoir in self.reservoirs.items()},
+        }
+
+    # HTTP
+
+    async def dispatch(self, method, path, body):
+        routes = {'/generate': ('POST', self.generate), '/grade': ('POST', self.grade)}
+        if path == '/health':
+            return {'status': 'ok'}
+        if path == '/stats':
+            return self.stats()
+        if path not in routes:
+            raise RequestError(f"未知的路径：{path}", 404)
+        expected_method, handler = routes[path]
+        if method != expected_method:
+            raise RequestError(f"{path} 只支持 {expected_method}", 405)
+        try:
+            params = json.loads(body or b'{}')
+        except ValueError:
+            raise RequestError("请求体不是合法的 JSON")
+        if not isinstance(params, dict):
+            raise RequestError("请求体必须是 JSON 对象")
+        return await handler(params)
+
+    async def handle(self, reader, writer):
+        """处理一个连接，支持 keep-alive"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await _respond(writer, 400, {'error': '请求行不合法'}, False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+
+                try:
+                    length = int(headers.get('content-length') or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await _respond(writer, 400, {'error': 'Content-Length 不合法'}, False)
+                    break
+                if length > self.max_body:
+                    await _respond(writer, 413, {'error': '请求体过大'}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                try:
+                    status, payload = 200, await self.dispatch(method, path.split('?', 1)[0], body)
+                except RequestError as e:
+                    status, payload = e.status, {'error': str(e)}
+                except Exception as e:
+                    status, payload = 500, {'error': f"{type(e).__name__}: {e}"}
+                await _respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+def _int_param(params, name, low, high):
+    value = params.get(name)
+    if not isinstance(value, int) or isinstance(value, bool) or value < low or \
+            (high is not None and value > high):
+        limit = f"{low} 到 {high}" if high is not None else f"不小于 {low}"
+        raise RequestError(f"参数 {name} 必须是{limit}的整数")
+    return value
+
+
+def _list_param(params, name):
+    value = params.get(name)
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise RequestError(f"参数 {name} 必须是字符串列表")
+    return value
+
+
+async def _respond(writer, status, payload, keep_alive):
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode('latin-1') + body)
+    await writer.drain()
+
+
+async def start_server(service, host='127.0.0.1', port=8000, unix=None):
+    """启动服务，返回 asyncio 的 Server 对象"""
+    # 并发连接多时默认的 backlog（100）会让多出的连接等待重传
+    if unix:
+        return await asyncio.start_unix_server(service.handle, path=unix, backlog=BACKLOG)
+    return await asyncio.start_server(service.handle, host, port, backlog=BACKLOG)
+
+
+async def serve(args):
+    service = ExerciseService(reservoir_size=args.reservoir, max_range=args.max_range,
+                              max_reservoirs=args.max_reservoirs, max_body=args.max_body)
+    if args.warm:
+        print(f"正在预热范围：{', '.join(map(str, args.warm))}")
+        await service.warm(args.warm)
+    server = await start_server(service, args.host, args.port, args.unix)
+    address = args.unix or f"http://{args.host}:{args.port}"
+    print(f"服务已启动：{address}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='小学四则运算题目生成与批改服务')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8000, help='监听端口')
+    parser.add_argument('--unix', help='改为监听 Unix 套接字')
+    parser.add_argument('--warm', type=int, nargs='*', default=[10], help='启动时预热的数值范围')
+    parser.add_argument('--reservoir', type=int, default=RESERVOIR_SIZE, help='每个范围的题目池大小')
+    parser.add_argument('--max-range', type=int, default=MAX_RANGE, help='请求中 r 的上限')
+    parser.add_argument('--max-reservoirs', type=int, default=MAX_RESERVOIRS,
+                        help='同时保留的题目池个数，超过时丢弃最久没用的')
+    parser.add_argument('--max-body', type=int, default=MAX_BODY, help='请求体的最大字节数')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
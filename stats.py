@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行统计
+记录各阶段（生成、渲染、写入、解析、求值、批改）的耗时和各类计数，
+生成题目时失败的尝试按异常类型分别计数，结果可以输出为 JSON
+"""
+
+import json
+import sys
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+
+PHASES = ('generate', 'render', 'write', 'parse', 'evaluate', 'grade')
+
+
+class RunStats:
+    """一次运行的统计信息"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = defaultdict(float)
+        self.counters = Counter()
+        self.failures = Counter()
+
+    @contextmanager
+    def phase(self, name):
+        """累计 with 块内的耗时到阶段 name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] += time.perf_counter() - start
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def failure(self, exc):
+        """按异常类型记录一次失败"""
+        self.failures[type(exc).__name__] += 1
+
+    def merge(self, counters, failures=None):
+        """合并子任务（如子进程）的计数"""
+        self.counters.update(counters)
+        if failures:
+            self.failures.update(failures)
+
+    def to_dict(self):
+        wall = time.perf_counter() - self.started
+        items = self.counters.get('accepted', 0) or self.counters.get('graded', 0)
+        return {
+            'wall_seconds': wall,
+            'phases': {name: self.phases[name] for name in PHASES if name in self.phases},
+            'counters': dict(self.counters),
+            'failures': dict(self.failures),
+            'per_second': items / wall if wall else None,
+        }
+
+    def dump(self, path='-'):
+        """输出 JSON，path 为 '-' 时写到标准错误，不与标准输出上的进度信息混在一起"""
+        text = json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+        if path == '-':
+            print(text, file=sys.stderr)
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text + '\n')
+
+
+def timer(stats, name):
+    """stats 为 None 时不计时"""
+    if stats is None:
+        return nullcontext()
+    return stats.phase(name)
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+测试性能基准测试工具
+"""
+
+import copy
+
+from benchmarks import CASES, compare, run_benchmarks
+
+def test_run_small_grid():
+    report = run_benchmarks([50], [10, 20], repeat=1, log=None)
+    assert len(report['results']) == 2 * len(CASES)
+    for record in report['results']:
+        assert record['items'] == 50
+        assert record['per_second'] > 0
+        assert record['peak_bytes'] is not None
+
+def test_compare_thresholds():
+    baseline = {'results': [{'case': 'cli', 'n': 1000, 'r': 10, 'items': 1000,
+                             'seconds': 1.0, 'per_second': 1000.0, 'peak_bytes': 100}]}
+    current = copy.deepcopy(baseline)
+    assert compare(current, baseline) == []
+
+    current['results'][0].update(seconds=1.25, per_second=800.0, peak_bytes=200)
+    metrics = [regression[3] for regression in compare(current, baseline)]
+    assert metrics == ['per_second', 'peak_bytes']
+    assert compare(current, baseline, threshold=0.5, memory_threshold=1.5) == []
+
+    # 基线耗时太短时不比较吞吐量
+    baseline['results'][0]['seconds'] = 0.01
+    metrics = [regression[3] for regression in compare(current, baseline)]
+    assert metrics == ['peak_bytes']
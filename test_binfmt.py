@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+测试二进制题目格式
+"""
+
+import random
+
+import pytest
+
+from binfmt import (BinaryExercises, binary_to_text, encode_expression, render_record,
+                    text_to_binary, write_binary)
+from myapp_final import MathExerciseGenerator, check_answers, write_exercises
+
+def test_encode_render_roundtrip():
+    for expr in ['1 + 2', '3/4 ÷ 5', '1 - 1/2 × 3', '(1/2 + 1) - 3/4', '2 ÷ (1/3 - 1/4)']:
+        shape, op1, op2, operands = encode_expression(expr)
+        assert render_record((shape, op1, op2, 0) + operands + (0, 0)) == expr
+    for expr in ['1 + 2 + 3 + 4', '(1 + 2) × (3 + 4)', '1 +']:
+        with pytest.raises(ValueError):
+            encode_expression(expr)
+
+def test_text_binary_roundtrip(tmp_path):
+    generator = MathExerciseGenerator(20, rng=random.Random(3))
+    exercises = generator.generate_exercises(5000)
+    write_exercises(exercises, generator, tmp_path / 'E.txt', tmp_path / 'A.txt')
+    assert write_binary(exercises, tmp_path / 'direct.bin', 20) == 5000
+    assert text_to_binary(tmp_path / 'E.txt', tmp_path / 'A.txt', tmp_path / 'E.bin', 20) == 5000
+    assert (tmp_path / 'direct.bin').read_bytes() == (tmp_path / 'E.bin').read_bytes()
+
+    binary_to_text(tmp_path / 'E.bin', tmp_path / 'E2.txt', tmp_path / 'A2.txt')
+    assert (tmp_path / 'E2.txt').read_bytes() == (tmp_path / 'E.txt').read_bytes()
+    assert (tmp_path / 'A2.txt').read_bytes() == (tmp_path / 'A.txt').read_bytes()
+
+    with BinaryExercises(tmp_path / 'E.bin') as binary:
+        assert len(binary) == 5000 and binary.max_range == 20
+        assert binary.expression(1234) == exercises[1234][0]
+        assert binary.answer(1234) == exercises[1234][1]
+        assert list(binary.iter_exercises())[4999] == exercises[4999]
+
+def test_grade_binary(tmp_path):
+    generator = MathExerciseGenerator(10, rng=random.Random(8))
+    exercises = generator.generate_exercises(300)
+    write_binary(exercises, tmp_path / 'E.bin', 10)
+    write_exercises(exercises, generator, tmp_path / 'E.txt', tmp_path / 'A.txt')
+    lines = (tmp_path / 'A.txt').read_text(encoding='utf-8').splitlines()
+    lines[9] = '10. 999'
+    (tmp_path / 'S.txt').write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+    expected = check_answers(tmp_path / 'E.txt', tmp_path / 'S.txt')
+    assert expected.wrong_count == 1
+    assert check_answers(tmp_path / 'E.bin', tmp_path / 'S.txt') == expected
+    assert check_answers(tmp_path / 'E.bin', tmp_path / 'E.bin').correct_count == 300
+
+def test_rejects_non_binary(tmp_path):
+    (tmp_path / 'E.txt').write_text('1. 1 + 2 =\n', encoding='utf-8')
+    with pytest.raises(ValueError):
+        BinaryExercises(tmp_path / 'E.txt')
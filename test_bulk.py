@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+测试批量生成练习卷
+"""
+
+import json
+import zipfile
+
+import pytest
+
+from bulk import load_manifest, run_manifest
+from dedup import canonical_key
+from expression import evaluate
+from myapp_final import extract_expression, parse_fraction, extract_answer
+
+def write_manifest(tmp_path, data, name='manifest.json'):
+    path = tmp_path / name
+    path.write_text(json.dumps(data), encoding='utf-8')
+    return str(path)
+
+def read_worksheet(directory):
+    exercises = (directory / 'Exercises.txt').read_text(encoding='utf-8').splitlines()
+    answers = (directory / 'Answers.txt').read_text(encoding='utf-8').splitlines()
+    return exercises, answers
+
+def test_directory_output(tmp_path):
+    manifest = write_manifest(tmp_path, {
+        'defaults': {'n': 15, 'r': 6},
+        'worksheets': [{'name': 'a', 'seed': 1}, {'name': 'b', 'seed': 1},
+                       {'name': 'c/../x', 'count': 5, 'range': 20, 'integer_answers': True}],
+    })
+    summary = run_manifest(manifest, str(tmp_path / 'out'), seed=0)
+    assert summary == [('a', 15, 15), ('b', 15, 15), ('c_.._x', 5, 5)]
+    a = read_worksheet(tmp_path / 'out' / 'a')
+    # 不共享查重指纹时，相同的种子得到相同的练习卷
+    assert a == read_worksheet(tmp_path / 'out' / 'b')
+    for exercise, answer in zip(*a):
+        assert evaluate(extract_expression(exercise)) == parse_fraction(extract_answer(answer))
+    _, answers = read_worksheet(tmp_path / 'out' / 'c_.._x')
+    assert all('/' not in answer for answer in answers)
+
+def test_unique_zip_output(tmp_path):
+    manifest = tmp_path / 'manifest.jsonl'
+    manifest.write_text('\n'.join(json.dumps({'n': 30, 'r': 5, 'seed': i}) for i in range(4)),
+                        encoding='utf-8')
+    output = str(tmp_path / 'out.zip')
+    summary = run_manifest(str(manifest), output, unique=True)
+    assert [name for name, _, _ in summary] == [f'worksheet_{i:04d}' for i in range(1, 5)]
+    keys = []
+    with zipfile.ZipFile(output) as archive:
+        assert len(archive.namelist()) == 8
+        for name, count, _ in summary:
+            lines = archive.read(f'{name}/Exercises.txt').decode('utf-8').splitlines()
+            assert len(lines) == count == 30
+            keys.extend(canonical_key(extract_expression(line)) for line in lines)
+    # 同一范围的练习卷之间也没有重复
+    assert len(set(keys)) == len(keys)
+
+def test_invalid_manifest(tmp_path):
+    with pytest.raises(ValueError):
+        load_manifest(write_manifest(tmp_path, [{'name': 'a', 'n': 1, 'r': 5}, {'name': 'a', 'n': 1, 'r': 5}]))
+    with pytest.raises(ValueError):
+        load_manifest(write_manifest(tmp_path, [{'n': 1, 'r': 5, 'colour': 'red'}]))
+    with pytest.raises(ValueError):
+        load_manifest(write_manifest(tmp_path, [{'n': 1}]))
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+测试按班级批改
+"""
+
+import csv
+import random
+
+import pytest
+
+from class_grading import find_answer_files, grade_class
+from generate_test_answers import generate_test_answers
+from myapp_final import MathExerciseGenerator, check_answers, save_grade, write_exercises
+
+@pytest.fixture
+def class_files(tmp_path):
+    generator = MathExerciseGenerator(10, rng=random.Random(0))
+    exercise_file = tmp_path / 'Exercises.txt'
+    answer_file = tmp_path / 'Answers.txt'
+    write_exercises(generator.iter_exercises(200), generator, exercise_file, answer_file)
+    answers_dir = tmp_path / 'answers'
+    answers_dir.mkdir()
+    for i, ratio in enumerate([1.0, 0.5, 0.2]):
+        generate_test_answers(exercise_file, answers_dir / f'student{i}.txt', ratio, seed=i)
+    # 只交了前 50 题
+    lines = (answers_dir / 'student0.txt').read_text(encoding='utf-8').splitlines(True)
+    (answers_dir / 'late.txt').write_text(''.join(lines[:50]), encoding='utf-8')
+    return exercise_file, answer_file, answers_dir
+
+@pytest.mark.parametrize('workers, use_key', [(1, False), (2, True)])
+def test_grade_class(tmp_path, class_files, workers, use_key):
+    exercise_file, answer_file, answers_dir = class_files
+    answer_files = find_answer_files(str(answers_dir))
+    assert [p.rsplit('/', 1)[1] for p in answer_files] == ['late.txt', 'student0.txt',
+                                                            'student1.txt', 'student2.txt']
+    output_dir = tmp_path / 'Grades'
+    report = grade_class(exercise_file, answer_files, output_dir,
+                         key_file=answer_file if use_key else None, workers=workers)
+    scores = {name: correct for name, _, correct in report.students}
+    assert scores == {'late': 50, 'student0': 200, 'student1': 100, 'student2': 40}
+
+    # 每份成绩文件与单独批改的结果一致（交卷不全的除外）
+    for name in ('student1', 'student2'):
+        expected = (output_dir / f'Grade_{name}.txt').read_text(encoding='utf-8')
+        check = tmp_path / 'Grade.txt'
+        save_grade(check_answers(exercise_file, answers_dir / f'{name}.txt'), check)
+        assert check.read_text(encoding='utf-8') == expected
+
+    with open(output_dir / 'ErrorRates.csv', encoding='utf-8') as f:
+        rows = list(csv.reader(f))[1:]
+    assert len(rows) == 200
+    assert sum(int(row[2]) for row in rows) == sum(200 - c for c in scores.values())
+    assert rows[0][1] == exercise_file.read_text(encoding='utf-8').split('\n')[0][3:-2]
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+测试按约束条件构造题目
+"""
+
+import random
+
+import pytest
+
+from constraints import ConstrainedGenerator, Constraints, get_index
+from dedup import canonical_key
+from expression import evaluate, tokenize
+from rational import Rational
+
+CASES = [
+    Constraints(integer_answer=True, max_answer=10),
+    Constraints(max_answer=Rational(1, 2)),
+    Constraints(max_denominator=4, operators='+-'),
+    Constraints(integer_answer=True, operators='*/'),
+    Constraints(operators=['÷']),
+]
+
+@pytest.mark.parametrize('constraints', CASES)
+def test_exercises_satisfy_constraints(constraints):
+    generator = ConstrainedGenerator(12, constraints, rng=random.Random(0))
+    exercises = generator.generate_exercises(500)
+    assert len(exercises) == 500
+    assert len({canonical_key(expr) for expr, _ in exercises}) == 500
+    shapes = set()
+    for expr, result in exercises:
+        assert evaluate(expr) == result
+        assert result >= 0 and constraints.accepts(result)
+        operators = [token for token in tokenize(expr) if token in '+-×÷']
+        assert set(operators) <= set(constraints.operators)
+        shapes.add(len(operators))
+    # 两个和三个操作数的题目都能构造出来
+    assert shapes == {1, 2}
+
+def test_binary_candidates_are_complete():
+    # 两个操作数、答案为 1 的加法题目全部在候选中
+    index = get_index(6)
+    constraints = Constraints(integer_answer=True, max_answer=1, operators='+')
+    generator = ConstrainedGenerator(6, constraints)
+    expected = {(i, j) for i, x in enumerate(index.values) for j, y in enumerate(index.values)
+                if i <= j and x + y == 1}
+    size = len(index.values)
+    assert {divmod(pair, size) for _, pair in generator.binary} == expected
+
+def test_reproducible():
+    constraints = Constraints(integer_answer=True, max_answer=20)
+    first = ConstrainedGenerator(10, constraints, rng=random.Random(7)).generate_exercises(100)
+    second = ConstrainedGenerator(10, constraints, rng=random.Random(7)).generate_exercises(100)
+    assert first == second
+
+def test_invalid_constraints():
+    with pytest.raises(ValueError):
+        Constraints(operators='%')
+    with pytest.raises(ValueError):
+        Constraints(operators='')
+    with pytest.raises(ValueError):
+        Constraints(max_answer=-1)
+
+@pytest.mark.parametrize('max_range, constraints', [
+    (100, Constraints(integer_answer=True, max_answer=2, operators='×÷')),
+    (100, Constraints(integer_answer=True, operators='+×÷')),
+    (300, Constraints(max_answer=Rational(1, 2))),
+    (36, Constraints(max_denominator=4, operators='+-')),
+])
+def test_solved_without_result_index(max_range, constraints):
+    # 字面量太多时不建结果索引，逐个求解操作数，仍能得到要求的题目数
+    generator = ConstrainedGenerator(max_range, constraints, rng=random.Random(0))
+    assert generator.filter is None and generator.binary is None
+    exercises = generator.generate_exercises(500)
+    assert len(exercises) == 500
+    assert len({canonical_key(expr) for expr, _ in exercises}) == 500
+    shapes = set()
+    for expr, result in exercises:
+        assert evaluate(expr) == result
+        assert result >= 0 and constraints.accepts(result)
+        operators = [token for token in tokenize(expr) if token in '+-×÷']
+        assert set(operators) <= set(constraints.operators)
+        shapes.add(len(operators))
+    assert shapes == {1, 2}
+
+def test_filter_fallback():
+    # 候选答案过多时随机生成后筛选
+    constraints = Constraints(max_denominator=100)
+    generator = ConstrainedGenerator(35, constraints, rng=random.Random(0))
+    assert generator.filter is not None
+    exercises = generator.generate_exercises(200)
+    assert len(exercises) == 200
+    for expr, result in exercises:
+        assert evaluate(expr) == result and constraints.accepts(result)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+测试基于计数器的随机数和按题号生成
+"""
+
+import pytest
+
+from counter_rng import (CounterGenerator, CounterRandom, FeistelPermutation,
+                         iter_counter_exercises, stream_key)
+from dedup import canonical_key
+from expression import evaluate
+from myapp_final import MathExerciseGenerator
+
+def test_counter_random_is_seekable():
+    rng = CounterRandom(12345)
+    values = [rng.random() for _ in range(10)]
+    rng.setstate((12345, 5))
+    assert [rng.random() for _ in range(5)] == values[5:]
+    assert all(0 <= value < 1 for value in values)
+    assert CounterRandom(1).randint(1, 6) in range(1, 7)
+    assert CounterRandom(2).getrandbits(100) < 2 ** 100
+
+@pytest.mark.parametrize('size', [1, 2, 7, 100, 1000])
+def test_feistel_is_permutation(size):
+    perm = FeistelPermutation(size, key=99)
+    assert sorted(perm[i] for i in range(size)) == list(range(size))
+
+@pytest.mark.parametrize('max_range, distinct', [(6, False), (6, True), (40, False)])
+def test_exercise_at_is_pure(max_range, distinct):
+    generator = CounterGenerator(max_range, seed=3, distinct=distinct)
+    exercises = list(generator.exercises(0, 300))
+    # 与顺序无关，另一个实例单独取第 k 道得到相同的题目
+    other = CounterGenerator(max_range, seed=3, distinct=distinct)
+    for k in (299, 0, 150):
+        assert other.exercise_at(k) == exercises[k]
+    for expr, result in exercises:
+        assert evaluate(expr) == result
+    assert list(CounterGenerator(max_range, seed=4, distinct=distinct).exercises(0, 300)) != exercises
+    if generator.distinct:
+        assert len({canonical_key(expr) for expr, _ in exercises}) == 300
+
+def test_stream_mode_matches_generate_exercise():
+    # 流模式与 generate_exercise 的运算符和操作数个数分布相同
+    generator = CounterGenerator(6, seed=5)
+    reference = MathExerciseGenerator(6)
+    for k in range(200):
+        reference.rng = CounterRandom(stream_key(5, 6, k))
+        try:
+            expected = reference.generate_exercise()
+        except ZeroDivisionError:
+            continue
+        assert generator.exercise_at(k) == expected
+
+@pytest.mark.parametrize('distinct', [False, True])
+def test_parallel_slices_match(distinct):
+    sequential = list(iter_counter_exercises(0, 500, 8, seed=11, distinct=distinct))
+    parallel = list(iter_counter_exercises(0, 500, 8, seed=11, workers=2, chunk_size=64,
+                                           distinct=distinct))
+    assert parallel == sequential
+    assert list(iter_counter_exercises(100, 200, 8, seed=11, distinct=distinct)) == sequential[100:200]
+
+def test_too_many_exercises():
+    with pytest.raises(ValueError):
+        iter_counter_exercises(0, 10 ** 6, 3, seed=1, distinct=True)
+
+def test_tiny_ranges():
+    # 范围 2 内只有自然数 1，不会抽取真分数；范围 1 内没有可用的数
+    exercises = list(iter_counter_exercises(0, 20, 2, seed=1))
+    assert len(exercises) == 20
+    assert all(set(expr) <= set("1 +-×÷()") for expr, _ in exercises)
+    with pytest.raises(ValueError):
+        iter_counter_exercises(0, 5, 1, seed=1)
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+测试题目查重
+"""
+
+from dedup import DedupIndex, canonical_key
+from myapp_final import MathExerciseGenerator, generate_parallel
+
+def test_canonical_key():
+    # 交换律
+    assert canonical_key("1 + 2") == canonical_key("2 + 1")
+    assert canonical_key("3/4 × 5") == canonical_key("5 × 3/4")
+    # 结合律
+    assert canonical_key("(1 + 2) + 3") == canonical_key("1 + (2 + 3)")
+    assert canonical_key("1 + 2 + 3") == canonical_key("3 + (2 + 1)")
+    # 多余的括号
+    assert canonical_key("(1 × 2) + 3") == canonical_key("1 × 2 + 3")
+    # 减法和除法不满足交换律
+    assert canonical_key("3 - 1") != canonical_key("1 - 3")
+    assert canonical_key("1 - 2 - 3") != canonical_key("1 - (2 - 3)")
+    assert canonical_key("6 ÷ 2 × 3") != canonical_key("6 ÷ (2 × 3)")
+
+def test_dedup_index():
+    index = DedupIndex(capacity=4)
+    keys = [canonical_key(f"{i} + {i + 1}") for i in range(1, 200)]
+    assert all(index.add(key) for key in keys)
+    assert not any(index.add(key) for key in keys)
+    assert len(index) == len(keys)
+    assert all(key in index for key in keys)
+
+def test_generate_exercises_unique():
+    generator = MathExerciseGenerator(10)
+    exercises = generator.generate_exercises(500)
+    keys = {canonical_key(expr) for expr, _ in exercises}
+    assert len(keys) == len(exercises)
+
+def test_generate_parallel_reproducible():
+    first = list(generate_parallel(300, 10, 2, seed=42, shard_size=50))
+    second = list(generate_parallel(300, 10, 3, seed=42, shard_size=50))
+    assert first == second
+    keys = {canonical_key(expr) for expr, _ in first}
+    assert len(keys) == len(first) == 300
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+测试持久化的查重指纹
+"""
+
+import random
+
+import pytest
+
+from dedup import canonical_key
+from dedup_store import BloomFilter, PersistentDedupIndex
+from myapp_final import MathExerciseGenerator, generate_parallel
+
+def generate_keys(store, count, seed, max_range=10):
+    generator = MathExerciseGenerator(max_range, rng=random.Random(seed), index=store)
+    return [canonical_key(expr) for expr, _ in generator.iter_exercises(count)]
+
+@pytest.mark.parametrize('bloom_capacity', [None, 1000])
+def test_no_repeats_across_runs(tmp_path, bloom_capacity):
+    path = tmp_path / 'seen.db'
+    seen = set()
+    for seed in range(3):
+        # 相同的种子在没有持久指纹时会生成相同的题目
+        with PersistentDedupIndex(path, bloom_capacity=bloom_capacity, flush_size=64) as store:
+            keys = generate_keys(store, 300, seed=0)
+        assert len(keys) == 300
+        assert seen.isdisjoint(keys)
+        seen.update(keys)
+    with PersistentDedupIndex(path, bloom_capacity=bloom_capacity) as store:
+        assert len(store) == 900
+        assert all(key in store for key in seen)
+
+def test_bloom_rebuilt_when_stale(tmp_path):
+    path = tmp_path / 'seen.db'
+    with PersistentDedupIndex(path, bloom_capacity=None) as store:
+        keys = generate_keys(store, 200, seed=1)
+    # 不带过滤器的运行不会更新 .bloom 文件，再次使用过滤器时应从数据库重建
+    with PersistentDedupIndex(path, bloom_capacity=100) as store:
+        assert all(key in store for key in keys)
+        assert store._bloom.size_bits >= BloomFilter.for_capacity(400).size_bits
+        assert store.add(keys[0]) is False
+    bloom, generation = BloomFilter.load(str(path) + '.bloom')
+    assert all(key in bloom for key in keys)
+
+def test_bloom_saved_only_on_checkpoint(tmp_path):
+    path = tmp_path / 'seen.db'
+    bloom_path = str(path) + '.bloom'
+    with PersistentDedupIndex(path, bloom_capacity=1000, flush_size=16) as store:
+        assert 1 not in store
+        saved = BloomFilter.load(bloom_path)[0].bits
+        keys = generate_keys(store, 200, seed=2)
+        # 多次 flush 只写数据库，不重写过滤器文件
+        assert BloomFilter.load(bloom_path)[0].bits == saved
+        store.checkpoint()
+        bloom, generation = BloomFilter.load(bloom_path)
+        assert generation == store._generation
+        assert all(key in bloom for key in keys)
+
+def test_len_counts_inserted_rows(tmp_path):
+    path = tmp_path / 'seen.db'
+    first = PersistentDedupIndex(path, bloom_capacity=None)
+    second = PersistentDedupIndex(path, bloom_capacity=None)
+    try:
+        for key in range(1, 101):
+            assert first.add(key) and second.add(key)
+        first.flush()
+        second.add(101)
+        second.flush()
+        # 另一进程已经写入的指纹不重复计数
+        assert len(second) == 101
+    finally:
+        first.close()
+        second.close()
+    with PersistentDedupIndex(path, bloom_capacity=None) as store:
+        assert len(store) == 101
+
+def test_concurrent_stores_keep_bloom_consistent(tmp_path):
+    path = tmp_path / 'seen.db'
+    with PersistentDedupIndex(path) as store:
+        store.add(1)
+    first = PersistentDedupIndex(path)
+    second = PersistentDedupIndex(path)
+    assert first.add(100) and second.add(200)
+    first.close()
+    second.close()
+    # 两个进程各自的过滤器都缺少对方的指纹，不能当作最新的过滤器
+    with PersistentDedupIndex(path) as store:
+        assert all(key in store for key in (1, 100, 200))
+        assert store.add(100) is False
+        assert len(store) == 3
+
+def test_bloom_false_positive_rate():
+    bloom = BloomFilter.for_capacity(10000, 0.01)
+    rng = random.Random(3)
+    for _ in range(10000):
+        bloom.add(rng.getrandbits(64))
+    false_positives = sum(rng.getrandbits(64) in bloom for _ in range(10000))
+    assert false_positives < 300
+
+def test_parallel_uses_store(tmp_path):
+    path = tmp_path / 'seen.db'
+    with PersistentDedupIndex(path) as store:
+        first = list(generate_parallel(200, 10, 2, seed=5, index=store))
+    with PersistentDedupIndex(path) as store:
+        second = list(generate_parallel(200, 10, 2, seed=5, index=store))
+    assert len(first) == len(second) == 200
+    assert {canonical_key(e) for e, _ in first}.isdisjoint(canonical_key(e) for e, _ in second)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+测试按列存储的题目批
+"""
+
+import random
+
+import pytest
+
+from binfmt import write_binary
+from exercise_batch import ExerciseBatch
+from dedup import canonical_key
+from myapp_final import (MathExerciseGenerator, check_answers, render_structure, structure_key,
+                         write_exercises)
+
+def make_exercises(count=500, seed=6):
+    return MathExerciseGenerator(20, rng=random.Random(seed)).generate_exercises(count)
+
+def test_batch_matches_list():
+    exercises = make_exercises()
+    batch = MathExerciseGenerator(20, rng=random.Random(6)).generate_batch(500)
+    assert len(batch) == 500
+    assert list(batch) == exercises
+    assert batch[17] == exercises[17] and batch[-1] == exercises[-1]
+    assert list(batch[100:110]) == exercises[100:110]
+    assert list(batch[:250] + batch[250:]) == exercises
+    assert ExerciseBatch.concat([batch[:1], batch[1:]]) == batch
+    assert batch.nbytes == 43 * 500
+
+def test_structure_key_matches_canonical_key():
+    generator = MathExerciseGenerator(8, rng=random.Random(3))
+    for _ in range(3000):
+        try:
+            shape, op1, op2, operands, texts, _ = generator.generate_structure()
+        except ZeroDivisionError:
+            continue
+        expr = render_structure(shape, op1, op2, texts)
+        assert structure_key(shape, op1, op2, operands) == canonical_key(expr)
+
+def test_batch_writers_and_grader(tmp_path):
+    exercises = make_exercises()
+    batch = ExerciseBatch.from_exercises(exercises)
+    generator = MathExerciseGenerator(20)
+
+    write_exercises(exercises, generator, tmp_path / 'E.txt', tmp_path / 'A.txt')
+    assert write_exercises(batch, generator, tmp_path / 'E2.txt', tmp_path / 'A2.txt') == 500
+    assert (tmp_path / 'E2.txt').read_bytes() == (tmp_path / 'E.txt').read_bytes()
+    assert (tmp_path / 'A2.txt').read_bytes() == (tmp_path / 'A.txt').read_bytes()
+
+    write_binary(exercises, tmp_path / 'E.bin', 20)
+    batch.write_binary(tmp_path / 'E2.bin', 20)
+    assert (tmp_path / 'E2.bin').read_bytes() == (tmp_path / 'E.bin').read_bytes()
+    assert ExerciseBatch.from_binary(tmp_path / 'E.bin') == batch
+
+    lines = (tmp_path / 'A.txt').read_text(encoding='utf-8').splitlines()
+    lines[0] = '1. 999'
+    (tmp_path / 'S.txt').write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    result = check_answers(batch, tmp_path / 'S.txt')
+    assert result == check_answers(tmp_path / 'E.txt', tmp_path / 'S.txt')
+    assert result.wrong_count == 1
+
+def test_batch_rejects_out_of_range():
+    batch = ExerciseBatch.from_exercises([('1 + 2', 3)])
+    with pytest.raises(ValueError):
+        batch.append('3000000000 + 1', 3000000001)
+    assert len(batch) == 1 and len(batch.n1) == 1
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+测试表达式编译与求值
+"""
+
+import pytest
+
+from expression import compile_expression, evaluate, parse
+from rational import Rational
+
+def test_evaluate_precedence_and_nesting():
+    assert evaluate("1 + 2 × 3") == 7
+    assert evaluate("(1 + 2) × 3") == 9
+    assert evaluate("8 - 2 - 1") == 5
+    assert evaluate("8 ÷ 2 ÷ 2") == 2
+    assert evaluate("((1 + 2) × (3 - 1)) ÷ (1/2 + 1/2)") == 6
+    assert evaluate("1'1/2 × 2 + 3/4 - 1/4 × 3") == 3
+    assert evaluate("6 * 2 / 4") == 3
+
+def test_parse_tree():
+    assert parse("1 + 2 × 3") == ('+', Rational(1), ('×', Rational(2), Rational(3)))
+    assert parse("(1 - 2) - 3") == parse("1 - 2 - 3")
+
+def test_compile_cache_and_errors():
+    assert compile_expression("1 + 2") is compile_expression("1 + 2")
+    for bad in ["", "1 +", "(1 + 2", "1 + 2)", "1 2", "1 + a"]:
+        with pytest.raises(ValueError):
+            evaluate(bad)
+    with pytest.raises(ZeroDivisionError):
+        evaluate("1 ÷ (2 - 2)")
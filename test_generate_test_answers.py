@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+测试测试答案生成器
+"""
+
+import random
+
+from generate_test_answers import generate_test_answers, perturb_answer
+from myapp_final import MathExerciseGenerator, check_answers, count_lines, write_exercises
+from rational import Rational
+
+def write_files(tmp_path, count, seed=0):
+    generator = MathExerciseGenerator(10, rng=random.Random(seed))
+    exercise_file = tmp_path / 'Exercises.txt'
+    answer_file = tmp_path / 'Answers.txt'
+    write_exercises(generator.iter_exercises(count), generator, exercise_file, answer_file)
+    return exercise_file, answer_file
+
+def test_matches_grading(tmp_path):
+    exercise_file, answer_file = write_files(tmp_path, 1000)
+    output = tmp_path / 'TestAnswers.txt'
+    expected = generate_test_answers(exercise_file, output, 0.35, seed=1, chunk_lines=128)
+    assert expected.total == 1000 and expected.correct_count == 350
+    assert check_answers(exercise_file, output) == expected
+
+def test_missing_trailing_newline(tmp_path):
+    exercise_file, answer_file = write_files(tmp_path, 100)
+    exercise_file.write_bytes(exercise_file.read_bytes().rstrip(b'\n'))
+    assert count_lines(exercise_file) == 100
+    output = tmp_path / 'TestAnswers.txt'
+    expected = generate_test_answers(exercise_file, output, 0.5, seed=1)
+    assert expected.total == 100
+    assert check_answers(exercise_file, output) == expected
+
+def test_reproducible_across_workers_and_key(tmp_path):
+    exercise_file, answer_file = write_files(tmp_path, 600)
+    outputs = []
+    for i, (workers, key_file) in enumerate([(1, None), (3, None), (2, answer_file)]):
+        output = tmp_path / f'TestAnswers{i}.txt'
+        generate_test_answers(exercise_file, output, 0.6, key_file=key_file, seed=7,
+                              workers=workers, chunk_lines=64)
+        outputs.append(output.read_text(encoding='utf-8'))
+    assert outputs[0] == outputs[1] == outputs[2]
+    other = tmp_path / 'Other.txt'
+    generate_test_answers(exercise_file, other, 0.6, seed=8, chunk_lines=64)
+    assert other.read_text(encoding='utf-8') != outputs[0]
+
+def test_perturb_answer():
+    rng = random.Random(3)
+    for value in [Rational(0), Rational(1), Rational(7, 3), Rational(1, 2), Rational(12)]:
+        for _ in range(50):
+            answer = perturb_answer(value, rng)
+            assert answer != MathExerciseGenerator(10).format_number(value)
+            assert not answer.startswith('-')
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+测试批改结果缓存
+"""
+
+import random
+
+from grade_cache import GradeCache, pair_key
+from generate_test_answers import generate_test_answers
+from myapp_final import MathExerciseGenerator, check_answers, write_exercises
+from stats import RunStats
+
+def write_files(tmp_path, count=300):
+    generator = MathExerciseGenerator(10, rng=random.Random(0))
+    exercise_file = tmp_path / 'Exercises.txt'
+    answer_file = tmp_path / 'Answers.txt'
+    write_exercises(generator.iter_exercises(count), generator, exercise_file, answer_file)
+    test_answer_file = tmp_path / 'TestAnswers.txt'
+    generate_test_answers(exercise_file, test_answer_file, 0.5, seed=1)
+    return exercise_file, test_answer_file
+
+def test_pair_key_ignores_numbers_and_spacing():
+    assert pair_key("3. 1 + 2 =\n", "3. 3\n") == pair_key("7.  1  +  2 =", "7. 3")
+    assert pair_key("1. 1 + 2 =", "1. 3") != pair_key("1. 1 + 2 =", "1. 4")
+    assert pair_key("1. 1 + 2 =", "1. 3") != pair_key("1. 1 + 2 =", "1. 3", '3')
+
+def test_same_submission_against_two_keys(tmp_path):
+    exercise_file, answer_file = write_files(tmp_path, count=50)
+    right_key = tmp_path / 'Key.txt'
+    wrong_key = tmp_path / 'WrongKey.txt'
+    right_key.write_text((tmp_path / 'Answers.txt').read_text(encoding='utf-8'), encoding='utf-8')
+    wrong_key.write_text(''.join(f"{i}. 12345\n" for i in range(1, 51)), encoding='utf-8')
+    cache_file = tmp_path / 'cache.db'
+    expected = check_answers(exercise_file, answer_file)
+    with GradeCache(cache_file) as cache:
+        assert check_answers(exercise_file, answer_file, right_key, cache=cache) == expected
+    # 换了标准答案文件，缓存中以前的批改结果不会被使用
+    with GradeCache(cache_file) as cache:
+        result = check_answers(exercise_file, answer_file, wrong_key, cache=cache)
+        assert cache.hits == 0
+    assert result == check_answers(exercise_file, answer_file, wrong_key)
+    assert result.correct_count == 0
+
+def test_incremental_regrade(tmp_path):
+    exercise_file, answer_file = write_files(tmp_path)
+    cache_file = tmp_path / 'cache.db'
+    expected = check_answers(exercise_file, answer_file)
+
+    with GradeCache(cache_file) as cache:
+        assert check_answers(exercise_file, answer_file, cache=cache) == expected
+        assert (cache.hits, cache.misses) == (0, 300)
+
+    # 学生改了 10 道题的答案，并在开头多写了一行（题号全部后移）
+    exercises = exercise_file.read_text(encoding='utf-8').splitlines(True)
+    answers = answer_file.read_text(encoding='utf-8').splitlines(True)
+    for i in range(0, 100, 10):
+        answers[i] = f"{i + 1}. 12345\n"
+    exercise_file.write_text("0. 1 + 1 =\n" + ''.join(exercises), encoding='utf-8')
+    answer_file.write_text("0. 2\n" + ''.join(answers), encoding='utf-8')
+
+    stats = RunStats()
+    with GradeCache(cache_file) as cache:
+        result = check_answers(exercise_file, answer_file, cache=cache, stats=stats)
+        assert (cache.hits, cache.misses) == (290, 11)
+    assert result == check_answers(exercise_file, answer_file)
+    assert stats.counters['cache_hits'] == 290 and stats.counters['graded'] == 301
+
+def test_eviction_keeps_recent_entries(tmp_path):
+    cache_file = tmp_path / 'cache.db'
+    with GradeCache(cache_file) as cache:
+        cache.store([(key, True) for key in range(100)])
+    with GradeCache(cache_file, max_entries=60) as cache:
+        # 本次使用过的条目保留，其余按最久未使用淘汰
+        assert len(cache.lookup(list(range(50)))) == 50
+        cache.store([(key, False) for key in range(100, 110)])
+    assert cache.evicted == 50
+    with GradeCache(cache_file) as cache:
+        found = cache.lookup(list(range(110)))
+    assert len(found) == 60
+    assert set(found) == set(range(50)) | set(range(100, 110))
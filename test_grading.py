@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+测试答案检查
+"""
+
+import random
+
+from myapp_final import (GradeResult, MathExerciseGenerator, check_answers,
+                         check_answers_parallel, evaluate_expression, line_offsets,
+                         save_grade, write_exercises)
+
+def make_files(tmp_path, count=200):
+    generator = MathExerciseGenerator(10, rng=random.Random(5))
+    exercise_file = tmp_path / 'Exercises.txt'
+    answer_file = tmp_path / 'Answers.txt'
+    write_exercises(generator.iter_exercises(count), generator, exercise_file, answer_file)
+    return exercise_file, answer_file
+
+def test_generated_answers_match_evaluation():
+    generator = MathExerciseGenerator(10, rng=random.Random(1))
+    for expr, result in generator.generate_exercises(2000):
+        assert result >= 0
+        assert evaluate_expression(expr) == result
+
+def test_check_answers_with_key(tmp_path):
+    exercise_file, answer_file = make_files(tmp_path)
+    student_file = tmp_path / 'Student.txt'
+    lines = answer_file.read_text(encoding='utf-8').splitlines()
+    lines[3] = '4. 12345'
+    student_file.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+    expected = check_answers(exercise_file, student_file)
+    assert expected['wrong'] == [4]
+    assert check_answers(exercise_file, student_file, key_file=answer_file) == expected
+    assert check_answers(exercise_file, student_file, key_file=answer_file,
+                         spot_check=20) == expected
+    # 标准答案文件不存在时回退为计算
+    assert check_answers(exercise_file, student_file,
+                         key_file=tmp_path / 'missing.txt') == expected
+
+def test_spot_check_rejects_bad_key(tmp_path):
+    exercise_file, answer_file = make_files(tmp_path)
+    bad_key = tmp_path / 'BadKey.txt'
+    bad_key.write_text(''.join(f"{i}. 0\n" for i in range(1, 201)), encoding='utf-8')
+
+    expected = check_answers(exercise_file, answer_file)
+    assert len(expected['correct']) == 200
+    assert check_answers(exercise_file, answer_file, key_file=bad_key,
+                         spot_check=5) == expected
+
+def test_grade_result_bitmap(tmp_path):
+    outcomes = [True, False, True, True, False, False, True, True, False, True, True]
+    first = GradeResult()
+    for is_correct in outcomes[:5]:
+        first.add(is_correct)
+    second = GradeResult()
+    for is_correct in outcomes[5:]:
+        second.add(is_correct)
+    first.extend(second)
+    assert list(first) == outcomes
+    assert first['wrong'] == [2, 5, 6, 9]
+    assert first == GradeResult.from_dict({'correct': first['correct'], 'wrong': [2, 5, 6, 9]})
+
+    grade_file = tmp_path / 'Grade.txt'
+    save_grade(first, grade_file)
+    assert grade_file.read_text(encoding='utf-8') == (
+        "Correct: 7 (1, 3, 4, 7, 8, 10, 11)\n"
+        "Wrong: 4 (2, 5, 6, 9)\n"
+    )
+
+def test_line_offsets(tmp_path):
+    path = tmp_path / 'lines.txt'
+    lines = [f"{i}. {'x' * (i % 7)}\n".encode() for i in range(100)]
+    path.write_bytes(b''.join(lines))
+    expected = [sum(len(line) for line in lines[:n]) for n in (0, 1, 8, 50, 99, 100, 120)]
+    assert line_offsets(path, [0, 1, 8, 50, 99, 100, 120], block_size=16) == expected
+
+def test_check_answers_parallel_matches_sequential(tmp_path):
+    exercise_file, answer_file = make_files(tmp_path, count=300)
+    student_file = tmp_path / 'Student.txt'
+    lines = answer_file.read_text(encoding='utf-8').splitlines()
+    for i in range(0, 300, 7):
+        lines[i] = f"{i + 1}. 999"
+    # 没有换行符结尾的最后一行
+    student_file.write_text('\n'.join(lines), encoding='utf-8')
+
+    expected = check_answers(exercise_file, student_file)
+    assert expected.total == 300 and expected.wrong_count == 43
+    assert check_answers_parallel(exercise_file, student_file, 2) == expected
+    assert check_answers_parallel(exercise_file, student_file, 3, key_file=answer_file) == expected
+
+    # 答案文件较短时只批改前面的题目
+    short_file = tmp_path / 'Short.txt'
+    short_file.write_text('\n'.join(lines[:101]) + '\n', encoding='utf-8')
+    expected = check_answers(exercise_file, short_file)
+    assert expected.total == 101
+    assert check_answers_parallel(exercise_file, short_file, 4) == expected
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+测试字面量表
+"""
+
+import random
+
+from literals import LiteralTable
+from rational import Rational
+
+def test_table_layout():
+    table = LiteralTable(5)
+    # 自然数 1..4，然后 1/2, 1/3, 2/3, 1/4, 2/4, 3/4
+    assert table.texts == ['1', '2', '3', '4', '1/2', '1/3', '2/3', '1/4', '1/2', '3/4']
+    assert table.values[8] is table.values[4]
+    assert table.fraction_index(3, 4) == 9
+
+def test_lazy_table_matches_eager():
+    eager = LiteralTable(30)
+    lazy = LiteralTable(30, eager_limit=0)
+    assert lazy.values is None
+    for index in range(eager.size):
+        assert lazy.literal(index) == eager.literal(index)
+    rng = random.Random(0)
+    for _ in range(200):
+        value, text = lazy.draw_literal(rng)
+        assert 0 < value < 30 and text == str(Rational.from_number(value))
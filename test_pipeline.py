@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+测试进程内的完整流程
+"""
+
+import random
+
+from myapp_final import check_answers
+from pipeline import (Batch, generate_batches, grade_batches, run_pipeline, synthesize_answers,
+                      wrong_answer)
+
+def test_pipeline_matches_file_grading(tmp_path):
+    files = {name: tmp_path / f"{name}.txt"
+             for name in ('Exercises', 'Answers', 'TestAnswers', 'Grade')}
+    result = run_pipeline(1000, 10, correct_ratio=0.3, seed=4, batch_size=128,
+                          exercise_file=files['Exercises'], answer_file=files['Answers'],
+                          test_answer_file=files['TestAnswers'], grade_file=files['Grade'])
+    assert result.total == 1000 and result.correct_count == 300
+    assert check_answers(files['Exercises'], files['TestAnswers']) == result
+    assert check_answers(files['Exercises'], files['Answers']).correct_count == 1000
+    assert files['Grade'].read_text(encoding='utf-8').startswith('Correct: 300 (')
+
+def test_grade_batches_uses_real_grader():
+    batch = Batch(1, ['1 + 2', "1/2 × 3", '3 ÷ 4'], [None] * 3)
+    # 随题目传递的标准答案有误，批改时不使用，而是重新计算
+    batch.answers = ['4', '1/2', '3/4']
+    batch.submitted = ['3', "1'1/2", '4/3']
+    result = grade_batches([batch])
+    assert list(result.iter_numbers(True)) == [1, 2]
+    assert list(result.iter_numbers(False)) == [3]
+
+def test_pipeline_reproducible():
+    first = run_pipeline(500, 20, seed=9)
+    assert run_pipeline(500, 20, seed=9) == first
+
+def test_synthesize_exact_ratio():
+    batches = list(generate_batches(250, 10, seed=1, batch_size=64))
+    assert [batch.start for batch in batches] == [1, 65, 129, 193]
+    correct = sum(answer == submitted
+                  for batch in synthesize_answers(batches, 250, 0.6, random.Random(0))
+                  for answer, submitted in zip(batch.answers, batch.submitted))
+    assert correct == 150
+
+def test_wrong_answer_differs():
+    rng = random.Random(0)
+    for correct in ('0', '1', '3/4', "1'1/2"):
+        for _ in range(100):
+            assert wrong_answer(correct, rng) != correct
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+测试题库
+"""
+
+import random
+from collections import Counter
+
+from constraints import Constraints
+from expression import evaluate
+from myapp_final import MathExerciseGenerator, render_structure
+from problem_bank import ProblemBank, parse_mix, problem_row, structure_row
+from rational import Rational
+
+def test_problem_row():
+    row = problem_row(1, "(1/2 + 3) × 1'1/4", Rational(35, 8))
+    assert row == (1, "(1/2 + 3) × 1'1/4", '+×', '(n + n) × n', 3, 5, 35, 8, 5, 7)
+    key, *_, max_range, difficulty = problem_row((1 << 64) - 1, "7 - 2", Rational(5))
+    assert key == -1
+    assert (max_range, difficulty) == (8, 1)
+
+def test_structure_row_matches_problem_row():
+    for max_range in (2, 7, 30):
+        generator = MathExerciseGenerator(max_range, rng=random.Random(max_range))
+        for key, structure in generator.iter_keyed_structures(2000):
+            shape, op1, op2, _, texts, result = structure
+            expr = render_structure(shape, op1, op2, texts)
+            assert structure_row(key, structure) == problem_row(key, expr, result)
+
+def test_bulk_insert_skips_duplicates(tmp_path):
+    generator = MathExerciseGenerator(10, rng=random.Random(0))
+    exercises = generator.generate_exercises(500)
+    with ProblemBank(tmp_path / 'bank.db') as bank:
+        assert bank.add(exercises, batch_size=64) == 500
+        # 交换律意义下相同的题目不会再次入库
+        assert bank.add([("2 + 1", Rational(3)), ("1 + 2", Rational(3))]) <= 1
+        added = bank.fill(300, 10, rng=random.Random(0))
+        assert added == 300
+    with ProblemBank(tmp_path / 'bank.db') as bank:
+        assert len(bank) == len(bank.keys()) >= 800
+
+def test_select_and_assemble(tmp_path):
+    with ProblemBank(tmp_path / 'bank.db') as bank:
+        bank.fill(3000, 12, rng=random.Random(1))
+        rng = random.Random(2)
+        constraints = Constraints(integer_answer=True, max_answer=10, operators='+-×')
+        problems = bank.select(50, constraints=constraints, max_range=8, min_answer=2, rng=rng)
+        assert len(problems) == 50
+        for _, expr, result in problems:
+            assert evaluate(expr) == result
+            assert result.denominator == 1 and 2 <= result <= 10
+            assert '÷' not in expr
+
+        mix = parse_mix('+-:20,×÷:10')
+        first = bank.assemble(mix, class_name='3A', worksheet='w1', rng=rng)
+        assert len(first) == 30
+        assert all(set(expr) & set('×÷') for expr, _ in first[20:])
+        assert not any(set(expr) & set('×÷') for expr, _ in first[:20])
+        # 同一班级不会再取到用过的题目，其他班级不受影响
+        second = bank.assemble(3000, class_name='3A', rng=rng)
+        assert len(second) == len(bank) - 30
+        assert not {expr for expr, _ in first} & {expr for expr, _ in second}
+        assert len(bank.assemble(40, class_name='3B', rng=rng)) == 40
+
+def test_select_is_uniform(tmp_path):
+    with ProblemBank(tmp_path / 'bank.db') as bank:
+        bank.fill(200, 10, rng=random.Random(3))
+        rng = random.Random(4)
+        counts = Counter(key for _ in range(4000) for key, _, _ in bank.select(1, rng=rng))
+    # 每道题目被抽中的机会相同（期望 20 次）；沿主键扫描时紧跟在大间隔后的题目会被抽中上百次
+    assert len(counts) == 200
+    assert max(counts.values()) < 45
+
+def test_select_uses_indexes(tmp_path):
+    with ProblemBank(tmp_path / 'bank.db') as bank:
+        bank.fill(100, 10, rng=random.Random(5))
+        cases = [({'constraints': Constraints(integer_answer=True, max_answer=10)}, 'problems_answer'),
+                 ({'max_range': 5}, 'problems_range'),
+                 ({'operands': 2, 'operators': '+-'}, 'problems_shape')]
+        for criteria, index in cases:
+            query, params = bank._candidate_query(**criteria)
+            plan = ' '.join(row[-1] for row in bank._db.execute(f"EXPLAIN QUERY PLAN {query}", params))
+            assert f"USING COVERING INDEX {index}" in plan
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+测试题目空间的计数与反排名
+"""
+
+import random
+from itertools import product
+
+import pytest
+
+from dedup import canonical_key
+from expression import evaluate
+from problem_space import ProblemSpace
+
+OPERATORS = ['+', '-', '×', '÷']
+
+def brute_force_keys(space):
+    """穷举全部合法题目（不出现负数、除数不为 0）的去重键"""
+    keys = set()
+    texts = space.texts
+    for x, y in product(texts, repeat=2):
+        for op in OPERATORS:
+            expr = f"{x} {op} {y}"
+            try:
+                if evaluate(expr) >= 0:
+                    keys.add(canonical_key(expr))
+            except ZeroDivisionError:
+                pass
+    for x, y, z in product(texts, repeat=3):
+        for op1, op2 in product(OPERATORS, repeat=2):
+            for expr, inner in ((f"({x} {op1} {y}) {op2} {z}", f"{x} {op1} {y}"),
+                                (f"{x} {op1} ({y} {op2} {z})", f"{y} {op2} {z}")):
+                try:
+                    if evaluate(inner) >= 0 and evaluate(expr) >= 0:
+                        keys.add(canonical_key(expr))
+                except ZeroDivisionError:
+                    pass
+    return keys
+
+def test_count_matches_brute_force():
+    space = ProblemSpace(4)
+    problems = [space.unrank(rank) for rank in range(len(space))]
+    keys = {canonical_key(expr) for expr, _ in problems}
+    assert len(keys) == len(space)
+    assert keys == brute_force_keys(space)
+    for expr, result in problems:
+        assert evaluate(expr) == result
+
+def test_sample_distinct():
+    space = ProblemSpace(6)
+    problems = list(space.sample(2000, random.Random(0)))
+    assert len({canonical_key(expr) for expr, _ in problems}) == 2000
+    assert list(space.sample(2000, random.Random(0))) == problems
+
+def test_sample_too_many():
+    space = ProblemSpace(3)
+    assert len(space) == 422
+    with pytest.raises(ValueError, match='422'):
+        space.sample(423, random.Random(0))
+    with pytest.raises(IndexError):
+        space.unrank(422)
+
+def test_binary_only():
+    space = ProblemSpace(5, shapes=('binary',))
+    for rank in range(len(space)):
+        expr, result = space.unrank(rank)
+        assert len(expr.split()) == 3 and evaluate(expr) == result
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+测试轻量有理数类型
+"""
+
+from fractions import Fraction
+
+import pytest
+
+from rational import Rational
+
+def test_arithmetic_matches_fraction():
+    values = [(1, 2), (2, 4), (3, 1), (5, 6), (7, 3)]
+    for n1, d1 in values:
+        for n2, d2 in values:
+            a, b = Rational(n1, d1), Rational(n2, d2)
+            fa, fb = Fraction(n1, d1), Fraction(n2, d2)
+            for op in ('__add__', '__sub__', '__mul__', '__truediv__'):
+                r = getattr(a, op)(b)
+                f = getattr(fa, op)(fb)
+                assert (r.numerator, r.denominator) == (f.numerator, f.denominator)
+                assert r == f and hash(r) == hash(f)
+            assert (a < b) == (fa < fb)
+
+def test_int_operands_and_errors():
+    assert Rational(1, 2) + 1 == Rational(3, 2)
+    assert 1 - Rational(1, 3) == Rational(2, 3)
+    assert 2 / Rational(4) == Rational(1, 2)
+    assert Rational(4, 2) == 2 and hash(Rational(4, 2)) == hash(2)
+    with pytest.raises(ZeroDivisionError):
+        Rational(1) / Rational(0, 5)
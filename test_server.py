@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+测试题目生成与批改服务
+"""
+
+import asyncio
+import json
+
+from expression import evaluate
+from myapp_final import MathExerciseGenerator
+from server import ExerciseService, ProblemReservoir, start_server
+
+async def request(port, method, path, payload=None):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+    writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\n"
+                 f"Connection: close\r\n\r\n".encode('latin-1') + body)
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    head, _, body = data.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(body)
+
+def run_with_server(scenario, **kwargs):
+    async def main():
+        service = ExerciseService(**kwargs)
+        server = await start_server(service, port=0)
+        try:
+            return await scenario(server.sockets[0].getsockname()[1])
+        finally:
+            server.close()
+            service.close()
+    return asyncio.run(main())
+
+def test_generate_and_grade():
+    async def scenario(port):
+        status, generated = await request(port, 'POST', '/generate', {'n': 30, 'r': 10})
+        assert status == 200
+        formatter = MathExerciseGenerator(10)
+        for expr, answer in zip(generated['exercises'], generated['answers']):
+            assert formatter.format_number(evaluate(expr)) == answer
+
+        answers = list(generated['answers'])
+        answers[4] = '12345'
+        results = await asyncio.gather(*[
+            request(port, 'POST', '/grade', {'exercises': generated['exercises'], 'answers': answers})
+            for _ in range(20)])
+        for status, graded in results:
+            assert status == 200 and graded['total'] == 30 and graded['wrong'] == [5]
+
+        _, stats = await request(port, 'GET', '/stats')
+        # 并发的批改请求被合并执行
+        assert stats['counters']['grade_batches'] < 20
+    run_with_server(scenario, reservoir_size=200)
+
+def test_seeded_generate_is_reproducible():
+    async def scenario(port):
+        _, first = await request(port, 'POST', '/generate', {'n': 10, 'r': 20, 'seed': 7})
+        _, second = await request(port, 'POST', '/generate', {'n': 10, 'r': 20, 'seed': 7})
+        return first, second
+    first, second = run_with_server(scenario)
+    assert first == second
+
+def test_bad_requests():
+    async def scenario(port):
+        assert (await request(port, 'POST', '/generate', {'n': 0, 'r': 10}))[0] == 400
+        assert (await request(port, 'POST', '/grade', {'exercises': 'x'}))[0] == 400
+        assert (await request(port, 'GET', '/generate'))[0] == 405
+        assert (await request(port, 'GET', '/missing'))[0] == 404
+    run_with_server(scenario)
+
+def test_reservoir_take_is_distinct():
+    reservoir = ProblemReservoir(3, size=300)
+    reservoir.refill()
+    problems = reservoir.take(1000)
+    # 范围 3 内的题目不足 1000 道，但取出的题目互不相同
+    assert len({expr for expr, _ in problems}) == len(problems) < 1000
+
+async def raw_request(port, head):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(head.encode('latin-1'))
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    return int(data.split()[1])
+
+def test_request_limits():
+    async def scenario(port):
+        assert (await request(port, 'POST', '/generate', {'n': 1, 'r': 101}))[0] == 400
+        assert (await request(port, 'POST', '/generate', {'n': 1, 'r': 10, 'seed': 'x'}))[0] == 400
+        for length in ('abc', '-5'):
+            head = f"POST /generate HTTP/1.1\r\nContent-Length: {length}\r\n\r\n"
+            assert await raw_request(port, head) == 400
+        head = "POST /grade HTTP/1.1\r\nContent-Length: 2000\r\n\r\n"
+        assert await raw_request(port, head) == 413
+        for max_range in range(2, 8):
+            assert (await request(port, 'POST', '/generate', {'n': 1, 'r': max_range}))[0] == 200
+        _, stats = await request(port, 'GET', '/stats')
+        # 只保留最近使用的题目池
+        assert list(stats['reservoirs']) == ['5', '6', '7']
+    run_with_server(scenario, reservoir_size=50, max_range=100, max_reservoirs=3, max_body=1000)
+
+def test_reservoir_dedup_index_is_bounded():
+    reservoir = ProblemReservoir(50, size=100)
+    for _ in range(5):
+        reservoir.refill()
+        reservoir.take(100)
+    reservoir.refill()
+    assert len(reservoir.generator.generated) <= 100
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+测试运行统计
+"""
+
+import json
+import random
+
+from myapp_final import MathExerciseGenerator, check_answers, write_exercises
+from stats import RunStats
+
+def test_generation_counters(tmp_path):
+    stats = RunStats()
+    generator = MathExerciseGenerator(4, rng=random.Random(0), stats=stats)
+    count = write_exercises(generator.iter_exercises(3000), generator,
+                            tmp_path / 'Exercises.txt', tmp_path / 'Answers.txt', stats=stats)
+    counters = stats.counters
+    assert counters['accepted'] == count
+    # 小范围下题目不够，一定有重复
+    assert counters['duplicates'] > 0
+    assert counters['attempts'] == count + counters['duplicates'] + sum(stats.failures.values())
+    assert set(stats.phases) == {'generate', 'render', 'write'}
+
+def test_grading_stats(tmp_path):
+    generator = MathExerciseGenerator(10, rng=random.Random(2))
+    exercise_file = tmp_path / 'Exercises.txt'
+    answer_file = tmp_path / 'Answers.txt'
+    write_exercises(generator.iter_exercises(100), generator, exercise_file, answer_file)
+    lines = exercise_file.read_text(encoding='utf-8').splitlines()
+    lines[0] = '1. 1 ÷ (2 - 2) ='
+    exercise_file.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+    stats = RunStats()
+    result = check_answers(exercise_file, answer_file, stats=stats)
+    assert result.wrong_count == 1
+    assert stats.counters['graded'] == 100
+    assert stats.failures == {'ZeroDivisionError': 1}
+    assert {'parse', 'evaluate', 'grade'} <= set(stats.phases)
+
+    stats_file = tmp_path / 'stats.json'
+    stats.dump(stats_file)
+    report = json.loads(stats_file.read_text(encoding='utf-8'))
+    assert report['counters']['correct'] == 99 and report['per_second'] > 0
+
+def test_dump_to_stderr(capsys):
+    stats = RunStats()
+    stats.count('accepted', 3)
+    stats.dump()
+    captured = capsys.readouterr()
+    # 进度信息在标准输出，报告单独写到标准错误，可以直接解析
+    assert captured.out == ''
+    assert json.loads(captured.err)['counters'] == {'accepted': 3}
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+测试基于 NumPy 的批量生成
+"""
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from dedup import canonical_key
+from myapp_final import evaluate_expression
+from vectorized import generate_batch, iter_vectorized
+
+def test_generate_batch_matches_evaluation():
+    rng = np.random.default_rng(0)
+    for key, expr, result in generate_batch(5000, 10, rng):
+        assert key == canonical_key(expr)
+        assert result >= 0
+        assert evaluate_expression(expr) == result
+
+def test_iter_vectorized_unique_and_reproducible():
+    first = list(iter_vectorized(2000, 20, seed=3))
+    second = list(iter_vectorized(2000, 20, seed=3))
+    assert first == second
+    assert len({canonical_key(expr) for expr, _ in first}) == 2000
+
+def test_templates_follow_binfmt_shapes():
+    from binfmt import BINARY, FLAT, LEFT, RIGHT
+    from vectorized import TEMPLATES
+    assert TEMPLATES[BINARY] == "{a} {o1} {b}"
+    assert TEMPLATES[FLAT] == "{a} {o1} {b} {o2} {c}"
+    assert TEMPLATES[LEFT] == "({a} {o1} {b}) {o2} {c}"
+    assert TEMPLATES[RIGHT] == "{a} {o1} ({b} {o2} {c})"
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基于 NumPy 的批量题目生成
+一次抽取整批的操作数、运算符和括号形式，用整数数组完成分子分母运算，
+负数结果通过掩码交换处理，最后才渲染表达式字符串
+"""
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 为可选依赖
+    np = None
+
+from binfmt import BINARY, FLAT, LEFT, RIGHT
+from dedup import COMMUTATIVE_OPERATORS, DedupIndex, form_key
+from rational import Rational
+
+OPERATORS = ['+', '-', '×', '÷']
+ADD, SUB, MUL, DIV = range(4)
+
+# 渲染模板，前四个按 binfmt 的括号形式编号（BINARY、FLAT、LEFT、RIGHT）排列，
+# 后四个是结果为负时交换减法两侧后的形式
+TEMPLATES = [
+    "{a} {o1} {b}",
+    "{a} {o1} {b} {o2} {c}",
+    "({a} {o1} {b}) {o2} {c}",
+    "{a} {o1} ({b} {o2} {c})",
+    "{c} - ({a} {o1} {b})",
+    "({b} {o2} {c}) - {a}",
+    "{b} {o2} {c} - {a}",
+    "{c} - {a} {o1} {b}",
+]
+
+# 三个操作数的分子分母之积不超过 int64 的数值范围
+MAX_RANGE = 10 ** 6
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("批量生成需要安装 NumPy：pip install numpy")
+
+
+def _reduce(n, d):
+    """按最大公约数约分"""
+    g = np.gcd(n, d)
+    g[g == 0] = 1
+    return n // g, d // g
+
+
+def _apply(op, n1, d1, n2, d2):
+    """逐元素计算 (n1/d1) op (n2/d2)，返回约分后的分子、分母和除零掩码"""
+    n = np.select(
+        [op == ADD, op == SUB, op == MUL],
+        [n1 * d2 + n2 * d1, n1 * d2 - n2 * d1, n1 * n2],
+        default=n1 * d2,
+    )
+    d = np.where(op == DIV, d1 * n2, d1 * d2)
+    zero = d == 0
+    d[zero] = 1
+    n, d = _reduce(n, d)
+    return n, d, zero
+
+
+def _draw_numbers(rng, size, max_range):
+    """抽取一批自然数或真分数，返回约分后的分子和分母"""
+    is_natural = rng.integers(0, 2, size).astype(bool)
+    if max_range < 3:
+        # 没有可用的真分数
+        is_natural[:] = True
+    natural = rng.integers(1, max_range, size)
+    denominator = rng.integers(2, max(max_range, 3), size)
+    numerator = rng.integers(1, denominator)
+    n = np.where(is_natural, natural, numerator)
+    d = np.where(is_natural, 1, denominator)
+    return _reduce(n, d)
+
+
+def _swap(mask, x, y):
+    """按掩码交换两个数组的元素"""
+    return np.where(mask, y, x), np.where(mask, x, y)
+
+
+def generate_batch(size, max_range, rng):
+    """
+    生成一批题目（可能包含重复）
+    返回 (指纹, 表达式, Rational 结果) 列表，除零的题目被丢弃
+    """
+    _require_numpy()
+    if not 2 <= max_range <= MAX_RANGE:
+        raise ValueError(f"数值范围必须在 2 到 {MAX_RANGE} 之间")
+
+    op_count = rng.integers(1, 4, size)
+    use_parentheses = rng.integers(0, 2, size).astype(bool)
+    left_parentheses = rng.integers(0, 2, size).astype(bool)
+    shape = np.where(op_count == 1, BINARY,
+                     np.where(use_parentheses,
+                              np.where(left_parentheses, LEFT, RIGHT), FLAT))
+    op1 = rng.integers(0, 4, size)
+    op2 = rng.integers(0, 4, size)
+    an, ad = _draw_numbers(rng, size, max_range)
+    bn, bd = _draw_numbers(rng, size, max_range)
+    cn, cd = _draw_numbers(rng, size, max_range)
+
+    # op1 为减法时保证 a >= b
+    swap = (op1 == SUB) & (an * bd < bn * ad)
+    an, bn = _swap(swap, an, bn)
+    ad, bd = _swap(swap, ad, bd)
+
+    # 先算 b op2 c 的情况：右括号形式，以及 a + b × c 这类优先级
+    is_binary = shape == BINARY
+    high1 = op1 >= MUL
+    high2 = op2 >= MUL
+    inner_right = (shape == RIGHT) | ((shape == FLAT) & high2 & ~high1)
+
+    # 括号内为减法时保证 b >= c
+    swap = inner_right & (op2 == SUB) & (bn * cd < cn * bd)
+    bn, cn = _swap(swap, bn, cn)
+    bd, cd = _swap(swap, bd, cd)
+
+    # 先算的一步
+    tn, td, zero1 = _apply(np.where(inner_right, op2, op1),
+                           np.where(inner_right, bn, an), np.where(inner_right, bd, ad),
+                           np.where(inner_right, cn, bn), np.where(inner_right, cd, bd))
+
+    # 后算的一步
+    outer_op = np.where(inner_right, op1, op2)
+    rn, rd, zero2 = _apply(outer_op,
+                           np.where(inner_right, an, tn), np.where(inner_right, ad, td),
+                           np.where(inner_right, tn, cn), np.where(inner_right, td, cd))
+    rn = np.where(is_binary, tn, rn)
+    rd = np.where(is_binary, td, rd)
+    valid = ~(zero1 | (zero2 & ~is_binary))
+
+    # 结果为负时交换减法两侧
+    flip = ~is_binary & (outer_op == SUB) & (rn < 0)
+    rn = np.abs(rn)
+
+    template = np.where(flip,
+                        np.where(shape == RIGHT, 5,
+                                 np.where(shape == LEFT, 4,
+                                          np.where(inner_right, 6, np.where(high1, 7, 4)))),
+                        shape)
+
+    rows = np.flatnonzero(valid)
+    return _render(rows, shape, inner_right, flip, template, op1, op2,
+                   an, ad, bn, bd, cn, cd, rn, rd)
+
+
+def _canonical(inner_op, x, y, outer_op, z, inner_first):
+    """
+    直接拼出两步运算的规范化字符串，与 dedup.canonical_form 的结果一致
+    x、y、z 为叶子的规范化字符串，inner_first 表示先算的一步在左侧
+    """
+    if inner_op in COMMUTATIVE_OPERATORS:
+        if outer_op == inner_op:
+            return f"{outer_op}({','.join(sorted((x, y, z)))})"
+        inner = f"{inner_op}({','.join(sorted((x, y)))})"
+    else:
+        inner = f"{inner_op}({x},{y})"
+    if outer_op in COMMUTATIVE_OPERATORS:
+        return f"{outer_op}({','.join(sorted((inner, z)))})"
+    if inner_first:
+        return f"{outer_op}({inner},{z})"
+    return f"{outer_op}({z},{inner})"
+
+
+def _render(rows, shape, inner_right, flip, template, op1, op2,
+            an, ad, bn, bd, cn, cd, rn, rd):
+    """渲染表达式字符串并计算查重指纹"""
+    columns = [x[rows].tolist() for x in (shape, inner_right, flip, template, op1, op2,
+                                          an, ad, bn, bd, cn, cd, rn, rd)]
+    # 字面量缓存：(渲染字符串, 规范化字符串)，同一取值范围内的字面量很少
+    literals = {}
+
+    def literal(n, d):
+        key = (n, d)
+        if key not in literals:
+            literals[key] = (str(n) if d == 1 else f"{n}/{d}", f"{n}/{d}")
+        return literals[key]
+
+    result = []
+    for (s, right, flipped, t, o1, o2,
+         n1, d1, n2, d2, n3, d3, n, d) in zip(*columns):
+        a_str, a = literal(n1, d1)
+        b_str, b = literal(n2, d2)
+        c_str, c = literal(n3, d3)
+        o1 = OPERATORS[o1]
+        o2 = OPERATORS[o2]
+
+        if s == BINARY:
+            if o1 in COMMUTATIVE_OPERATORS:
+                form = f"{o1}({','.join(sorted((a, b)))})"
+            else:
+                form = f"{o1}({a},{b})"
+        elif right:
+            # b o2 c 先算
+            if flipped:
+                form = _canonical(o2, b, c, '-', a, True)
+            else:
+                form = _canonical(o2, b, c, o1, a, False)
+        else:
+            # a o1 b 先算
+            if flipped:
+                form = _canonical(o1, a, b, '-', c, False)
+            else:
+                form = _canonical(o1, a, b, o2, c, True)
+
+        expr = TEMPLATES[t].format(a=a_str, b=b_str, c=c_str, o1=o1, o2=o2)
+        result.append((form_key(form), expr, Rational(n, d)))
+    return result
+
+
+def iter_vectorized(count, max_range, seed=None, batch_size=65536, index=None):
+    """
+    按批生成不重复的题目（生成器），产出 (表达式, Rational 结果)
+    与逐题生成一样最多尝试 count * 10 次
+    """
+    _require_numpy()
+    rng = np.random.default_rng(seed)
+    index = index if index is not None else DedupIndex()
+    produced = 0
+    attempts = 0
+    max_attempts = count * 10
+
+    while produced < count and attempts < max_attempts:
+        size = min(batch_size, max_attempts - attempts, max(2 * (count - produced), 1024))
+        attempts += size
+        for key, expr, result in generate_batch(size, max_range, rng):
+            if index.add(key):
+                produced += 1
+                yield expr, result
+                if produced == count:
+                    return